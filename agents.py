@@ -1,26 +1,54 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_community.vectorstores import Chroma
-from typing import List, Dict, Any
-from vector_store import search_similar_chunks
-from config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_TEMPERATURE
+from langchain_core.documents import Document
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from chunk_store import ChunkStore
+from vector_store import search_similar_chunks, asearch_similar_chunks, chunk_to_document
+from risk_scanner import rank_risky_chunks
+from summary_pipeline import summary_windows, map_reduce_partials, amap_reduce_partials
+from events import emit_event
+from context_builder import build_context, format_context, passages_from_chunks, passages_from_results
+from metrics import get_metrics, timed, record_retrieval, record_cache
+from config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_TEMPERATURE, RISK_CONTEXT_CHUNKS, SUMMARY_MODE
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 def create_agent_llm():
     """Create LLM for agents"""
+    from langchain_openai import ChatOpenAI  # slow to import; loaded on the first agent call
     return ChatOpenAI(
         model=OPENAI_MODEL,
         api_key=OPENAI_API_KEY,
-        temperature=OPENAI_TEMPERATURE
+        temperature=OPENAI_TEMPERATURE,
+        stream_usage=True,  # token counts for instrumentation, also when streaming
+        callbacks=[get_metrics().llm_callback]
     )
 
-def summariser_agent(chunks: List[Dict[str, Any]]) -> str:
-    """Generate executive summary"""
-    llm = create_agent_llm()
-    
-    # Use first 10 chunks for context
-    context = "\n".join([chunk['content'] for chunk in chunks[:10]])
-    
-    system_prompt = """You are a contract summarisation specialist. 
+# Chunks retrieved per query by the retrieval-based agents
+RAG_QA_K = 5
+CLAUSE_FINDER_K = 8
+
+# Bump when an agent prompt changes so cached responses are not reused
+AGENT_PROMPT_VERSION = "2"
+
+# Agents whose answer depends only on the contract, not on the wording of the question
+QUERY_INDEPENDENT_AGENTS = {'summariser', 'risk_checker'}
+
+@lru_cache(maxsize=1)
+def get_agent_llm() -> "ChatOpenAI":
+    """Shared agent LLM client, so HTTP connections are pooled across queries"""
+    return create_agent_llm()
+
+def format_pages(metadata: Dict[str, Any]) -> str:
+    """Human-readable page span for a chunk"""
+    page_start = metadata.get('page_start', metadata.get('page_number'))
+    page_end = metadata.get('page_end', page_start)
+    if page_end != page_start:
+        return f"Pages {page_start}-{page_end}"
+    return f"Page {page_start}"
+
+SUMMARISER_PROMPT = """You are a contract summarisation specialist. 
     Create a bullet-point executive summary covering:
     - Parties involved
     - Scope of work/purpose  
@@ -29,44 +57,102 @@ def summariser_agent(chunks: List[Dict[str, Any]]) -> str:
     - Key risks
     
     Use ONLY bullet points, be concise and factual."""
+
+RAG_QA_PROMPT = """You are a contract Q&A specialist. Answer questions based on the provided contract context.
+    Always cite your sources using the chunk IDs in square brackets [chunk_id].
+    If you cannot find relevant information, say so clearly."""
+
+RISK_CHECKER_PROMPT = """You are a contract risk assessment specialist.
+    Analyze the provided clauses and identify risks. For each risk:
+    - Identify the clause ID
+    - Categorize risk type (financial, legal, operational, compliance)
+    - Assess severity (LOW/MEDIUM/HIGH/CRITICAL)
+    - Provide description and mitigation advice
     
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Summarise this contract:\n\n{context}")
+    Focus on compliance and commercial risks."""
+
+RISK_HEADER = "**RISK ASSESSMENT**\n\n"
+
+def _summary_request(chunks: ChunkStore) -> Tuple[Optional[str], List[str]]:
+    """(request, windows); request is None when the windows must be map-reduced first"""
+    if SUMMARY_MODE == "head":
+        # Use first 10 chunks for context, without their overlap
+        passages = build_context(passages_from_chunks(chunks[:10]), 'summariser')
+        context = "\n".join(passage.text for passage in passages)
+        return f"Summarise this contract:\n\n{context}", []
+    windows = summary_windows(chunks)
+    if len(windows) <= 1:
+        # Whole contract fits in one call
+        return f"Summarise this contract:\n\n{windows[0] if windows else ''}", windows
+    emit_event("stage", stage="summarising sections", windows=len(windows))
+    return None, windows
+
+def _merged_summary_request(partials: List[str]) -> str:
+    context = "\n\n".join(partials)
+    return f"Summarise this contract from these summaries of its sections, in order:\n\n{context}"
+
+def _summary_messages(request: str) -> List:
+    return [
+        SystemMessage(content=SUMMARISER_PROMPT),
+        HumanMessage(content=request)
     ]
+
+def summariser_agent(chunks: ChunkStore) -> str:
+    """Generate executive summary"""
+    llm = get_agent_llm()
+    request, windows = _summary_request(chunks)
+    if request is None:
+        # Map-reduce over the whole contract; partials are cached by window content
+        request = _merged_summary_request(map_reduce_partials(llm, windows))
     
-    response = llm.invoke(messages)
+    response = llm.invoke(_summary_messages(request))
     return response.content
 
-def rag_qa_agent(query: str, vector_store: Chroma) -> str:
-    """Answer questions using RAG"""
-    llm = create_agent_llm()
-    
-    # Search for relevant chunks
-    results = search_similar_chunks(vector_store, query, k=5)
-    
-    context = ""
-    citations = []
-    for doc, score in results:
-        context += f"\n[{doc.metadata['chunk_id']}] {doc.page_content}\n"
-        citations.append(doc.metadata['chunk_id'])
+async def asummariser_agent(chunks: ChunkStore) -> str:
+    """Async summariser_agent"""
+    llm = get_agent_llm()
+    request, windows = _summary_request(chunks)
+    if request is None:
+        request = _merged_summary_request(await amap_reduce_partials(llm, windows))
+    
+    response = await llm.ainvoke(_summary_messages(request))
+    return response.content
+
+def _rag_qa_messages(query: str, results: List[Tuple[Document, float]],
+                     chunks: Optional[ChunkStore]) -> List:
+    emit_event("retrieval", chunk_ids=[doc.metadata['chunk_id'] for doc, _ in results])
+    record_retrieval(len(results))
     
-    system_prompt = """You are a contract Q&A specialist. Answer questions based on the provided contract context.
-    Always cite your sources using the chunk IDs in square brackets [chunk_id].
-    If you cannot find relevant information, say so clearly."""
+    context = format_context(build_context(passages_from_results(results, chunks), 'rag_qa'))
     
-    messages = [
-        SystemMessage(content=system_prompt),
+    return [
+        SystemMessage(content=RAG_QA_PROMPT),
         HumanMessage(content=f"Context:\n{context}\n\nQuestion: {query}")
     ]
+
+def rag_qa_agent(query: str, vector_store: Any, chunks: Optional[ChunkStore] = None) -> str:
+    """Answer questions using RAG; chunks (the whole contract) let overlapping results be merged"""
+    llm = get_agent_llm()
+    
+    # Search for relevant chunks
+    with timed("retrieve"):
+        results = search_similar_chunks(vector_store, query, k=RAG_QA_K)
     
-    response = llm.invoke(messages)
+    response = llm.invoke(_rag_qa_messages(query, results, chunks))
+    return response.content
+
+async def arag_qa_agent(query: str, vector_store: Any, chunks: Optional[ChunkStore] = None) -> str:
+    """Async rag_qa_agent"""
+    llm = get_agent_llm()
+    with timed("retrieve"):
+        results = await asearch_similar_chunks(vector_store, query, k=RAG_QA_K)
+    response = await llm.ainvoke(_rag_qa_messages(query, results, chunks))
     return response.content
 
-def clause_finder_agent(topic: str, vector_store: Chroma) -> str:
-    """Find clauses matching the topic"""
-    # Search for relevant clauses
-    results = search_similar_chunks(vector_store, topic, k=8)
+def _format_clauses(topic: str, results: List[Tuple[Document, float]], indexed: bool = False) -> str:
+    """Clause finder answer; indexed results are exact section matches and carry no relevance score"""
+    emit_event("retrieval", chunk_ids=[doc.metadata['chunk_id'] for doc, _ in results])
+    record_retrieval(len(results))
     
     if not results:
         return f"No clauses found matching '{topic}'"
@@ -74,49 +160,85 @@ def clause_finder_agent(topic: str, vector_store: Chroma) -> str:
     # Format results
     output = f"**CLAUSES MATCHING '{topic.upper()}'**\n\n"
     
+    # No score cutoff: fused hybrid scores rise with relevance while vector distances fall,
+    # so the top k from the retriever is the only filter that holds for every backend
     for i, (doc, score) in enumerate(results):
-        if score > 0.3:  # Relevance threshold
-            output += f"**Match {i+1}:** {doc.metadata['chunk_id']} (Page {doc.metadata['page_number']})\n"
-            output += f"**Relevance Score:** {score:.2f}\n"
-            output += f"**Content:** {doc.page_content}\n\n---\n\n"
+        output += f"**Match {i+1}:** {doc.metadata['chunk_id']} ({format_pages(doc.metadata)})\n"
+        if doc.metadata.get('section_path'):
+            output += f"**Section:** {doc.metadata['section_path']}\n"
+        output += "**Matched:** section index\n" if indexed else f"**Relevance Score:** {score:.2f}\n"
+        output += f"**Content:** {doc.page_content}\n\n---\n\n"
     
     return output.strip()
 
-def risk_checker_agent(chunks: List[Dict[str, Any]]) -> str:
-    """Identify risky clauses"""
-    llm = create_agent_llm()
-    
-    risk_keywords = [
-        'penalty', 'terminate', 'breach', 'default', 'liability', 
-        'indemnify', 'force majeure', 'confidential', 'non-compete',
-        'intellectual property', 'warranty', 'guarantee', 'damages'
-    ]
-    
-    risky_chunks = []
-    for chunk in chunks:
-        if any(keyword in chunk['content'].lower() for keyword in risk_keywords):
-            risky_chunks.append(chunk)
-    
-    if not risky_chunks:
-        return "No significant risks identified in the contract."
-    
+def _indexed_clauses(topic: str, chunks: Optional[ChunkStore],
+                     section_index: Optional[Any]) -> List[Tuple[Document, float]]:
+    """Clauses the topic names by section number or heading; empty when search is needed"""
+    if not chunks or not section_index:
+        return []
+    positions = section_index.lookup(topic)
+    record_cache("section_index", "hit" if positions else "miss")
+    return [(chunk_to_document(chunks[position]), 1.0) for position in positions[:CLAUSE_FINDER_K]]
+
+def clause_finder_agent(topic: str, vector_store: Any, chunks: Optional[ChunkStore] = None,
+                        section_index: Optional[Any] = None) -> str:
+    """Find clauses matching the topic: section numbers and headings from the index, otherwise by search"""
+    with timed("retrieve"):
+        results = _indexed_clauses(topic, chunks, section_index)
+        indexed = bool(results)
+        if not indexed:
+            # Search for relevant clauses
+            results = search_similar_chunks(vector_store, topic, k=CLAUSE_FINDER_K)
+    return _format_clauses(topic, results, indexed)
+
+async def aclause_finder_agent(topic: str, vector_store: Any, chunks: Optional[ChunkStore] = None,
+                               section_index: Optional[Any] = None) -> str:
+    """Async clause_finder_agent"""
+    with timed("retrieve"):
+        results = _indexed_clauses(topic, chunks, section_index)
+        indexed = bool(results)
+        if not indexed:
+            results = await asearch_similar_chunks(vector_store, topic, k=CLAUSE_FINDER_K)
+    return _format_clauses(topic, results, indexed)
+
+def _risk_messages(chunks: ChunkStore, risk_ranking: Optional[List[int]]) -> Optional[List]:
+    """Prompt for the riskiest chunks, or None when nothing risky was found"""
+    # Chunks are scanned for risk terms at ingestion; rank by risk density
+    if risk_ranking is None:
+        risk_ranking = rank_risky_chunks(chunks)
+    
+    if not risk_ranking:
+        return None
+    
+    riskiest = [chunks[position] for position in risk_ranking[:RISK_CONTEXT_CHUNKS]]
+    emit_event("retrieval", chunk_ids=[chunk['chunk_id'] for chunk in riskiest])
+    record_retrieval(len(riskiest))
+    risk_terms = {chunk['chunk_id']: chunk['risk_terms'] for chunk in riskiest}
     context = ""
-    for chunk in risky_chunks[:5]:
-        context += f"[{chunk['chunk_id']}] {chunk['content']}\n\n"
-    
-    system_prompt = """You are a contract risk assessment specialist.
-    Analyze the provided clauses and identify risks. For each risk:
-    - Identify the clause ID
-    - Categorize risk type (financial, legal, operational, compliance)
-    - Assess severity (LOW/MEDIUM/HIGH/CRITICAL)
-    - Provide description and mitigation advice
+    for passage in build_context(passages_from_chunks(riskiest), 'risk_checker'):
+        terms = sorted(set().union(*(risk_terms[chunk_id] for chunk_id in passage.chunk_ids)))
+        context += f"{passage.citation} (risk terms: {', '.join(terms)}) {passage.text}\n\n"
     
-    Focus on compliance and commercial risks."""
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+    emit_event("token", text=RISK_HEADER)  # streamed ahead of the model's tokens
+    return [
+        SystemMessage(content=RISK_CHECKER_PROMPT),
         HumanMessage(content=f"Analyze these clauses for risks:\n\n{context}")
     ]
+
+def risk_checker_agent(chunks: ChunkStore, risk_ranking: Optional[List[int]] = None) -> str:
+    """Identify risky clauses"""
+    messages = _risk_messages(chunks, risk_ranking)
+    if messages is None:
+        return "No significant risks identified in the contract."
+    
+    response = get_agent_llm().invoke(messages)
+    return f"{RISK_HEADER}{response.content}"
+
+async def arisk_checker_agent(chunks: ChunkStore, risk_ranking: Optional[List[int]] = None) -> str:
+    """Async risk_checker_agent"""
+    messages = _risk_messages(chunks, risk_ranking)
+    if messages is None:
+        return "No significant risks identified in the contract."
     
-    response = llm.invoke(messages)
-    return f"**RISK ASSESSMENT**\n\n{response.content}"
\ No newline at end of file
+    response = await get_agent_llm().ainvoke(messages)
+    return f"{RISK_HEADER}{response.content}"
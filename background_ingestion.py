@@ -0,0 +1,120 @@
+"""Ingest uploaded contracts in background threads and keep the sessions for reuse"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from config import APP_CONTRACT_CACHE_MB, APP_INGEST_WORKERS
+from ingestion import document_id_from_filename, forget_contract
+from progress import progress_listener
+from session import ContractSession
+
+# Share of the progress bar each ingestion stage covers
+STAGE_RANGES: Dict[str, Tuple[float, float]] = {
+    'parse': (0.0, 0.5),
+    'split': (0.5, 0.55),
+    'embed': (0.55, 1.0),
+}
+STAGE_LABELS = {'queued': "Waiting to start", 'parse': "Reading pages", 'split': "Splitting into clauses",
+                'embed': "Embedding chunks", 'ready': "Ready"}
+
+@dataclass
+class IngestionJob:
+    """One uploaded contract being ingested, or ready"""
+    content_hash: str
+    name: str
+    stage: str = "queued"
+    done_units: int = 0
+    total_units: int = 0
+    fraction: float = 0.0
+    memory_bytes: int = 0
+    session: Optional[ContractSession] = None
+    error: Optional[str] = None
+    future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    @property
+    def message(self) -> str:
+        label = STAGE_LABELS.get(self.stage, self.stage)
+        if self.total_units > 1 and self.stage != "ready":
+            return f"{label} ({self.done_units}/{self.total_units})"
+        return label
+
+    def on_progress(self, stage: str, done: int, total: int) -> None:
+        low, high = STAGE_RANGES.get(stage, (self.fraction, self.fraction))
+        self.stage, self.done_units, self.total_units = stage, done, total
+        self.fraction = max(self.fraction, low + (high - low) * done / max(total, 1))
+
+def estimate_session_bytes(session: ContractSession, file_size: int) -> int:
+    """Rough in-process footprint: the chunk store plus indexes proportional to the file"""
+    return session.chunks.nbytes + file_size
+
+class IngestionJobs:
+    """Background ingestion keyed by content hash, with memory-bounded eviction of finished sessions"""
+
+    def __init__(self, max_bytes: int = APP_CONTRACT_CACHE_MB * 1024 * 1024,
+                 max_workers: int = APP_INGEST_WORKERS):
+        self.max_bytes = max_bytes
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def start(self, file_bytes: bytes, name: str, retry: bool = False) -> IngestionJob:
+        """The job for this upload, starting ingestion unless it is running or done (failed jobs only with retry)"""
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        with self.lock:
+            job = self.jobs.get(content_hash)
+            if job is not None and (job.error is None or not retry):
+                self.jobs.move_to_end(content_hash)
+                return job
+            job = IngestionJob(content_hash, name)
+            self.jobs[content_hash] = job
+            job.future = self.executor.submit(self._run, job, file_bytes)
+            return job
+
+    def get(self, content_hash: str) -> Optional[IngestionJob]:
+        with self.lock:
+            job = self.jobs.get(content_hash)
+            if job is not None:
+                self.jobs.move_to_end(content_hash)
+            return job
+
+    def _run(self, job: IngestionJob, file_bytes: bytes) -> None:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+            tmp_file.write(file_bytes)
+            tmp_file_path = tmp_file.name
+        try:
+            with progress_listener(job.on_progress):
+                # Re-uploads under the same file name are revisions: only changed clauses are embedded
+                session = ContractSession(tmp_file_path, document_id=document_id_from_filename(job.name))
+            job.memory_bytes = estimate_session_bytes(session, len(file_bytes))
+            job.session = session
+            job.stage, job.fraction = "ready", 1.0
+        except Exception as e:
+            job.error = str(e)
+            raise
+        finally:
+            # The session keeps the parsed contract; the upload itself is not stored
+            os.unlink(tmp_file_path)
+        self._evict(keep=job.content_hash)
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used finished sessions until the rest fit in max_bytes"""
+        with self.lock:
+            total = sum(job.memory_bytes for job in self.jobs.values())
+            for content_hash in list(self.jobs):
+                if total <= self.max_bytes:
+                    break
+                job = self.jobs[content_hash]
+                if content_hash == keep or job.session is None:
+                    continue
+                del self.jobs[content_hash]
+                total -= job.memory_bytes
+                forget_contract(job.session.contract_id)
+                print(f"Evicted {job.name} from the contract cache ({job.memory_bytes / 1e6:.1f} MB)")
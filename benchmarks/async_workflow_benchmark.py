@@ -0,0 +1,67 @@
+"""Throughput of the async workflow as concurrency grows, using fake backends.
+
+The chat model and retriever are offline stand-ins that only sleep, so the
+numbers show how well one event loop overlaps network waits. Throughput should
+grow almost linearly with concurrency until the loop itself is the bottleneck.
+
+Run from the repository root:
+    python -m benchmarks.async_workflow_benchmark --requests 64 --llm-latency 0.1
+"""
+import argparse
+import asyncio
+from typing import List
+from langchain_core.documents import Document
+from benchmarks.fakes import FakeChatModel, FakeRetriever, use_fake_llm
+from chunk_store import ChunkStore
+from ingestion import IngestedContract, register_contract
+from queue_runner import AnalysisRequest, process_requests
+from workflow import get_async_workflow, ContractState
+
+def make_state(query: str, contract: IngestedContract) -> ContractState:
+    return ContractState(
+        user_query=query,
+        agent_type="rag_qa",
+        contract_id=contract.contract_id,
+        retriever=None,
+        response=None,
+        messages=[]
+    )
+
+async def measure(concurrency: int, requests: List[AnalysisRequest], contract: IngestedContract) -> float:
+    app = get_async_workflow()
+
+    async def handle(request: AnalysisRequest) -> str:
+        result = await app.ainvoke(make_state(request.query, contract))
+        return result["response"]
+
+    stats = await process_requests(requests, handle, lambda result: None, max_concurrency=concurrency)
+    if stats.failed:
+        raise RuntimeError(f"{stats.failed} requests failed")
+    return stats.requests_per_second
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="seconds per fake LLM call")
+    parser.add_argument("--retrieval-latency", type=float, default=0.02, help="seconds per fake search")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    use_fake_llm(FakeChatModel(latency=args.llm_latency))
+    documents = [Document(page_content=f"Clause {i} text.", metadata={'chunk_id': f"chunk_{i}"}) for i in range(10)]
+    retriever = FakeRetriever(documents, latency=args.retrieval_latency)
+    contract = IngestedContract("fake-contract", "", ChunkStore.from_chunks([]), retriever)
+    register_contract(contract)
+    requests = [AnalysisRequest(str(i), "fake.pdf", f"What does clause {i} say?") for i in range(args.requests)]
+
+    print(f"{args.requests} rag_qa requests, LLM {args.llm_latency * 1000:.0f}ms, "
+          f"retrieval {args.retrieval_latency * 1000:.0f}ms")
+    baseline = None
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        throughput = asyncio.run(measure(concurrency, requests, contract))
+        baseline = baseline or throughput
+        print(f"concurrency {concurrency:3d}: {throughput:7.1f} requests/sec "
+              f"(speed-up {throughput / baseline:5.1f}x, efficiency {throughput / baseline / concurrency:5.0%})")
+
+if __name__ == "__main__":
+    main()
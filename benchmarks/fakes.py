@@ -0,0 +1,122 @@
+"""Offline stand-ins for the chat model, embeddings and retriever, with configurable latency."""
+import asyncio
+import hashlib
+import re
+import time
+from typing import List, Any, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from metrics import get_metrics, record_embedding
+
+class FakeChatModel(BaseChatModel):
+    """Returns a canned answer after a fixed delay; the async path sleeps without blocking the loop"""
+    latency: float = 0.05
+    response: str = "- Fake answer citing [chunk_0]"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        # Rough word counts stand in for the usage report, so token and cost metrics are exercised
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        completion_tokens = len(self.response.split())
+        message = AIMessage(content=self.response, usage_metadata={
+            'input_tokens': prompt_tokens,
+            'output_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words vectors; every call sleeps latency like one embedding request
+
+    Texts sharing words get similar vectors, so retrieval results stay meaningful
+    and identical across runs and machines.
+    """
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            bucket = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little")
+            vector[bucket % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _embed(self, texts: List[str], started: float) -> List[List[float]]:
+        vectors = [self._vector(text) for text in texts]
+        self.calls += 1
+        self.texts += len(texts)
+        record_embedding("fake-embedding", len(texts), 0, time.perf_counter() - started)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        time.sleep(self.latency)
+        return self._embed(texts, started)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency)
+        return self._embed(texts, started)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class FakeRetriever:
+    """Fixed search results after a delay standing in for the query-embedding request"""
+
+    def __init__(self, documents: List[Document], latency: float = 0.01):
+        self.documents = documents
+        self.latency = latency
+
+    @property
+    def embeddings(self) -> Any:
+        return None
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        time.sleep(self.latency)
+        return [(doc, 1.0) for doc in self.documents[:k]]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        await asyncio.sleep(self.latency)
+        return [(doc, 1.0) for doc in self.documents[:k]]
+
+def use_fake_llm(llm: BaseChatModel) -> None:
+    """Route every agent and router LLM call in this process to llm"""
+    import agents
+    import router
+    llm.callbacks = [get_metrics().llm_callback]  # as the real clients are built
+    agents.get_agent_llm = lambda: llm
+    router.get_router_llm = lambda: llm
+
+def use_fake_embeddings(embeddings: Embeddings) -> None:
+    """Route every ingestion and query embedding in this process to embeddings"""
+    import ingestion
+    import vector_store
+    vector_store.get_embeddings = lambda: embeddings
+    ingestion.get_embeddings = lambda: embeddings
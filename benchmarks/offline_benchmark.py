@@ -0,0 +1,197 @@
+"""End-to-end benchmark suite that runs offline on synthetic contracts.
+
+Synthetic PDFs of each requested size are generated and ingested. Chat and
+embedding calls go to deterministic fakes that sleep for a configurable time
+instead of calling OpenAI, so runs cost nothing and are repeatable. The suite
+measures:
+
+- ingestion throughput (pages and chunks per second, with a per-stage breakdown)
+- retrieval latency percentiles
+- end-to-end latency percentiles per agent type (routing plus workflow)
+
+The response cache is bypassed, and cached summary partials are cleared before
+every summary, so each run pays the full pipeline cost. Results are written as
+JSON. Given a baseline results file, the suite exits with status 1 if any
+throughput or p95 latency is worse than the baseline by more than --tolerance.
+
+Run from the repository root:
+    python -m benchmarks.offline_benchmark --pages 10,50 --output benchmark_results.json
+    python -m benchmarks.offline_benchmark --baseline benchmark_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+import numpy as np
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, use_fake_llm, use_fake_embeddings
+from benchmarks.synthetic_contract import generate_contract, HEADINGS
+from config import TOP_K_RESULTS, SUMMARY_CACHE_PATH
+from ingestion import ingest_contract
+from metrics import capture, stage_breakdown
+from router import route_query
+from session import ContractSession
+
+# Questions the local router sends to each agent; cycled over the runs
+AGENT_QUERIES = {
+    'summariser': ["Give me an executive summary of this contract", "Summarize the key terms"],
+    'rag_qa': ["What are the payment terms?", "Who is responsible for insurance?",
+               "How are disputes resolved?"],
+    'clause_finder': ["Find section 3", "Show me the termination clause", "Locate the confidentiality clause"],
+    'risk_checker': ["What are the main risks in this contract?", "Identify potential legal risks"],
+}
+
+def percentiles(seconds: List[float]) -> Dict[str, float]:
+    ms = np.array(seconds) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)}
+
+def bench_ingestion(path: str, pages: int) -> Dict[str, Any]:
+    with capture() as events:
+        started = time.perf_counter()
+        contract = ingest_contract(path)
+        seconds = time.perf_counter() - started
+    return {
+        'pages': pages,
+        'chunks': len(contract.chunks),
+        'seconds': round(seconds, 4),
+        'pages_per_second': round(pages / seconds, 2),
+        'chunks_per_second': round(len(contract.chunks) / seconds, 2),
+        'stages': stage_breakdown(events)['stages']
+    }
+
+def bench_retrieval(session: ContractSession, pages: int, queries: int) -> Dict[str, Any]:
+    samples = []
+    for i in range(queries):
+        query = f"What does the {HEADINGS[i % len(HEADINGS)].lower()} clause say about item {i}?"
+        started = time.perf_counter()
+        session.vector_store.similarity_search_with_score(query, k=TOP_K_RESULTS)
+        samples.append(time.perf_counter() - started)
+    return {'pages': pages, 'chunks': len(session.chunks), 'queries': queries, **percentiles(samples)}
+
+def bench_agents(session: ContractSession, runs: int) -> Dict[str, Dict[str, Any]]:
+    samples: Dict[str, List[float]] = {}
+    llm_calls: Dict[str, int] = {}
+    for agent, queries in AGENT_QUERIES.items():
+        for i in range(runs):
+            shutil.rmtree(SUMMARY_CACHE_PATH, ignore_errors=True)
+            with capture() as events:
+                started = time.perf_counter()
+                routed = route_query(queries[i % len(queries)])
+                session.app.invoke(session.initial_state(queries[i % len(queries)], routed))
+                seconds = time.perf_counter() - started
+            samples.setdefault(routed, []).append(seconds)
+            llm_calls[routed] = llm_calls.get(routed, 0) + stage_breakdown(events)['llm_calls']
+    return {agent: {'runs': len(seconds), 'llm_calls_per_run': round(llm_calls[agent] / len(seconds), 2),
+                    **percentiles(seconds)}
+            for agent, seconds in samples.items()}
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    use_fake_llm(FakeChatModel(latency=args.llm_latency))
+    use_fake_embeddings(FakeEmbeddings(latency=args.embedding_latency))
+    results: Dict[str, Any] = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'environment': {'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'ingestion': [],
+        'retrieval': [],
+        'agents': {}
+    }
+    for pages in [int(value) for value in args.pages.split(",")]:
+        path = f"synthetic_{pages}p.pdf"
+        contract = generate_contract(path, pages, max(1, round(pages * args.clauses_per_page)),
+                                     args.risk_density, args.seed)
+        print(f"{pages} pages, {contract.clauses} clauses, {contract.risk_sentences} risk sentences")
+        results['ingestion'].append(bench_ingestion(path, pages))
+        session = ContractSession(path)  # already ingested: served from memory
+        results['retrieval'].append(bench_retrieval(session, pages, args.retrieval_queries))
+        results['agents'][str(pages)] = bench_agents(session, args.agent_runs)
+    return results
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics worse than the baseline by more than tolerance (a fraction); sizes missing from either side are skipped"""
+    regressions = []
+
+    def check(label: str, now: float, before: float, higher_is_better: bool) -> None:
+        worse = now < before * (1 - tolerance) if higher_is_better else now > before * (1 + tolerance)
+        if worse:
+            regressions.append(f"{label}: {now} vs baseline {before}")
+
+    before_ingestion = {entry['pages']: entry for entry in baseline.get('ingestion', [])}
+    for entry in current['ingestion']:
+        if entry['pages'] in before_ingestion:
+            check(f"ingestion {entry['pages']}p pages/sec", entry['pages_per_second'],
+                  before_ingestion[entry['pages']]['pages_per_second'], higher_is_better=True)
+    before_retrieval = {entry['pages']: entry for entry in baseline.get('retrieval', [])}
+    for entry in current['retrieval']:
+        if entry['pages'] in before_retrieval:
+            check(f"retrieval {entry['pages']}p p95", entry['p95_ms'],
+                  before_retrieval[entry['pages']]['p95_ms'], higher_is_better=False)
+    for pages, agents in current['agents'].items():
+        for agent, entry in agents.items():
+            before = baseline.get('agents', {}).get(pages, {}).get(agent)
+            if before:
+                check(f"{agent} {pages}p p95", entry['p95_ms'], before['p95_ms'], higher_is_better=False)
+    return regressions
+
+def print_report(results: Dict[str, Any]) -> None:
+    for entry in results['ingestion']:
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in entry['stages'].items())
+        print(f"ingest {entry['pages']:4d} pages: {entry['pages_per_second']:8.1f} pages/sec, "
+              f"{entry['chunks_per_second']:8.1f} chunks/sec ({stages})")
+    for entry in results['retrieval']:
+        print(f"retrieve {entry['chunks']:5d} chunks: p50 {entry['p50_ms']:.2f}ms, "
+              f"p95 {entry['p95_ms']:.2f}ms, p99 {entry['p99_ms']:.2f}ms")
+    for pages, agents in results['agents'].items():
+        for agent, entry in agents.items():
+            print(f"{agent:>13} {pages:>4} pages: p50 {entry['p50_ms']:.1f}ms, p95 {entry['p95_ms']:.1f}ms, "
+                  f"p99 {entry['p99_ms']:.1f}ms ({entry['llm_calls_per_run']} LLM calls/run)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="10,50", help="comma-separated contract sizes")
+    parser.add_argument("--clauses-per-page", type=float, default=2.0)
+    parser.add_argument("--risk-density", type=float, default=0.1, help="fraction of sentences with a risk term")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="seconds per fake embedding request")
+    parser.add_argument("--retrieval-queries", type=int, default=200)
+    parser.add_argument("--agent-runs", type=int, default=10, help="runs per agent and contract size")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (fraction)")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    # Caches, Chroma and metrics all use relative paths: keep them in a scratch directory
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="contract_bench_")
+    os.chdir(work_dir)
+    try:
+        results = run_suite(args)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output_path}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
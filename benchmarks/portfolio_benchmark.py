@@ -0,0 +1,102 @@
+"""Latency of portfolio search as the number of contracts grows.
+
+Writes random unit vectors as shards for --contracts contracts, catalogues them
+with a counterparty field, and measures the first (cold) query and warm query
+latency for each worker count, unfiltered and filtered to a tenth of the
+portfolio. The merged top k is checked against brute force over all vectors.
+
+Run from the repository root:
+    python -m benchmarks.portfolio_benchmark --contracts 2000 --chunks 300 --dim 1536
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+import numpy as np
+from vector_index import MmapVectorIndex
+
+def percentiles(samples: List[float]) -> str:
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):.1f}ms p95 {np.percentile(ms, 95):.1f}ms"
+
+def build_portfolio(contracts: int, chunks: int, dim: int, dtype: str, rng: np.random.Generator) -> List[str]:
+    """Shards and catalogue in the current directory; returns the shard directories"""
+    from ingestion import mmap_index_path
+    from portfolio import ContractRecord, add_to_catalog
+    paths = []
+    records = []
+    for i in range(contracts):
+        key = f"{i:064x}"
+        vectors = rng.standard_normal((chunks, dim)).astype(np.float32)
+        ids = [f"{key}-{row}" for row in range(chunks)]
+        metadatas = [{'chunk_id': f"chunk_{row}", 'page_number': 1} for row in range(chunks)]
+        MmapVectorIndex.build(mmap_index_path(key), ids, [""] * chunks, metadatas, vectors, dtype=dtype)
+        paths.append(mmap_index_path(key))
+        records.append(ContractRecord(key, f"contract_{i}.pdf", "", {'counterparty': f"party {i % 10}"}))
+    add_to_catalog(records)
+    return paths
+
+def brute_force_top(paths: List[str], query: np.ndarray, k: int) -> np.ndarray:
+    """Best k similarities over every shard, one shard in memory at a time"""
+    best = np.empty(0, dtype=np.float32)
+    for path in paths:
+        similarities = np.asarray(MmapVectorIndex(path).vectors, dtype=np.float32) @ query
+        best = np.sort(np.concatenate([best, similarities]))[::-1][:k]
+    return best
+
+def time_queries(index, queries: np.ndarray, k: int, filters=None) -> List[float]:
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search_by_vector(query, k, filters)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=2000)
+    parser.add_argument("--chunks", type=int, default=300, help="chunks per contract")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--workers", default="1,4,8")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix="portfolio_benchmark_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)  # shards and catalogue live under the relative cache paths from config
+        started = time.perf_counter()
+        paths = build_portfolio(args.contracts, args.chunks, args.dim, args.dtype, rng)
+        print(f"{args.contracts} contracts x {args.chunks} chunks x {args.dim} dims ({args.dtype}), "
+              f"built in {time.perf_counter() - started:.1f}s")
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        from portfolio import PortfolioIndex
+        for workers in [int(value) for value in args.workers.split(",")]:
+            index = PortfolioIndex(workers=workers)
+            started = time.perf_counter()
+            index.search_by_vector(queries[0], args.k)
+            cold = time.perf_counter() - started
+            print(f"workers {workers:2d}: cold {cold * 1000:.0f}ms, "
+                  f"all {percentiles(time_queries(index, queries, args.k))}, "
+                  f"filtered {percentiles(time_queries(index, queries, args.k, {'counterparty': 'party 3'}))}")
+
+        # The merged heap must equal brute-force top k over every vector
+        normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        exact = 0
+        for query in normalized[:5]:
+            expected = brute_force_top(paths, query, args.k)
+            found = [hit.similarity for hit in index.search_by_vector(query, args.k)]
+            exact += np.allclose(found, expected, atol=1e-3)
+        print(f"Merged top-{args.k} matches brute force on {exact}/5 queries")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Tune the local router's escalation settings against labelled queries.
+
+The queries below are not in router.ROUTER_EXAMPLES. For each confidence
+threshold and top-two margin, the report shows how many queries the local
+classifier answers itself, how many of those it gets wrong, and how many
+go to the LLM router.
+
+Run from the repository root:
+    python -m benchmarks.router_benchmark
+"""
+import argparse
+from typing import List, Tuple
+from config import ROUTER_CONFIDENCE_THRESHOLD, ROUTER_MIN_MARGIN
+from router import rank_agents
+
+LABELLED_QUERIES: List[Tuple[str, str]] = [
+    ("Summarise this agreement in a few bullet points", 'summariser'),
+    ("Can you give me the gist of the contract?", 'summariser'),
+    ("High level overview please", 'summariser'),
+    ("Write an executive summary for the board", 'summariser'),
+    ("What does this document cover overall?", 'summariser'),
+    ("Summarize the contract for a non-lawyer", 'summariser'),
+    ("TL;DR of the agreement", 'summariser'),
+    ("Give me a one-paragraph synopsis", 'summariser'),
+    ("What is the notice period for termination?", 'rag_qa'),
+    ("Who signs on behalf of the supplier?", 'rag_qa'),
+    ("When is the effective date?", 'rag_qa'),
+    ("How long is the warranty period?", 'rag_qa'),
+    ("What currency are payments made in?", 'rag_qa'),
+    ("Is there an automatic renewal?", 'rag_qa'),
+    ("What happens if an invoice is paid late?", 'rag_qa'),
+    ("Where will disputes be heard?", 'rag_qa'),
+    ("What is the fee for additional services?", 'rag_qa'),
+    ("Are there penalties for late delivery?", 'rag_qa'),
+    ("Summarize section 5", 'rag_qa'),
+    ("What does section 8 say about audits?", 'rag_qa'),
+    ("Can the customer assign the contract?", 'rag_qa'),
+    ("How are price increases handled?", 'rag_qa'),
+    ("Find the limitation of liability clause", 'clause_finder'),
+    ("Show me clause 4.2", 'clause_finder'),
+    ("Locate the non-compete provision", 'clause_finder'),
+    ("Which section covers data protection?", 'clause_finder'),
+    ("Find every clause that mentions subcontractors", 'clause_finder'),
+    ("Show me the dispute resolution section", 'clause_finder'),
+    ("Where are the warranties?", 'clause_finder'),
+    ("Pull up article IV", 'clause_finder'),
+    ("Find the assignment clause", 'clause_finder'),
+    ("Show the payment schedule section", 'clause_finder'),
+    ("What are the biggest risks for us here?", 'risk_checker'),
+    ("Flag anything dangerous in this agreement", 'risk_checker'),
+    ("Is this contract one-sided?", 'risk_checker'),
+    ("Review the contract for compliance problems", 'risk_checker'),
+    ("Which clauses expose us to unlimited liability?", 'risk_checker'),
+    ("What should legal worry about in this contract?", 'risk_checker'),
+    ("Any red flags?", 'risk_checker'),
+    ("Rate the risk level of this agreement", 'risk_checker'),
+]
+
+def evaluate(threshold: float, margin: float) -> Tuple[int, int, int, List[str]]:
+    """(answered locally, wrong among those, escalated, wrong queries)"""
+    local = wrong = escalated = 0
+    mistakes = []
+    for query, expected in LABELLED_QUERIES:
+        ranked = rank_agents(query)
+        (best, confidence), (_, runner_up) = ranked[0], ranked[1]
+        if confidence < threshold or confidence - runner_up < margin:
+            escalated += 1
+            continue
+        local += 1
+        if best != expected:
+            wrong += 1
+            mistakes.append(f"{query!r}: {best} ({confidence:.2f}), expected {expected}")
+    return local, wrong, escalated, mistakes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8")
+    parser.add_argument("--margins", default="0.0,0.2,0.35,0.5")
+    args = parser.parse_args()
+
+    print(f"{len(LABELLED_QUERIES)} labelled queries; configured threshold {ROUTER_CONFIDENCE_THRESHOLD}, "
+          f"margin {ROUTER_MIN_MARGIN}")
+    for threshold in [float(value) for value in args.thresholds.split(",")]:
+        for margin in [float(value) for value in args.margins.split(",")]:
+            local, wrong, escalated, _ = evaluate(threshold, margin)
+            print(f"threshold {threshold:.2f} margin {margin:.2f}: {local:3d} local ({wrong} wrong), "
+                  f"{escalated:3d} escalated ({escalated / len(LABELLED_QUERIES):.0%})")
+    _, _, _, mistakes = evaluate(ROUTER_CONFIDENCE_THRESHOLD, ROUTER_MIN_MARGIN)
+    for mistake in mistakes:
+        print(f"  wrong at configured settings: {mistake}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Synthetic contracts as real PDFs, for benchmarks that must not depend on client documents.
+
+Numbered clauses with sub-clauses are laid out over the requested number of
+pages. A chosen fraction of sentences carries a term from config.RISK_TAXONOMY,
+so the risk scanner has work to do. The same seed always gives the same bytes.
+
+    python -m benchmarks.synthetic_contract contract.pdf --pages 50 --clauses 120 --risk-density 0.1
+"""
+import argparse
+import random
+import textwrap
+from dataclasses import dataclass
+from typing import List, Tuple
+from config import RISK_TAXONOMY
+
+LINES_PER_PAGE = 60
+LINE_WIDTH = 95
+
+HEADINGS = [
+    "Definitions", "Scope of Services", "Fees and Payment", "Term", "Termination",
+    "Confidentiality", "Limitation of Liability", "Indemnification", "Warranties",
+    "Force Majeure", "Intellectual Property", "Governing Law", "Notices", "Assignment",
+    "Insurance", "Audit Rights", "Data Protection", "Dispute Resolution", "Subcontracting",
+    "Service Levels"
+]
+
+SUBJECTS = ["The Supplier", "The Customer", "Each party", "The Contractor", "Neither party"]
+VERBS = ["shall provide", "shall maintain", "shall deliver", "may request", "shall review", "shall keep"]
+OBJECTS = ["written reports", "the deliverables", "accurate records", "reasonable assistance",
+           "all required approvals", "the agreed documentation"]
+QUALIFIERS = ["within thirty (30) days", "on a monthly basis", "at its own cost",
+              "in accordance with Schedule A", "during the Term", "upon reasonable notice"]
+RISK_TEMPLATES = [
+    "Any {term} arising under this clause shall be borne by the Supplier.",
+    "The Customer may invoke {term} provisions if service levels are missed.",
+    "Obligations relating to {term} survive expiry of this Agreement.",
+]
+
+@dataclass
+class SyntheticContract:
+    """What was generated, for sanity checks and result labels"""
+    path: str
+    pages: int
+    clauses: int
+    sentences: int
+    risk_sentences: int
+
+def _sentence(rng: random.Random, risk_terms: List[str], risk_density: float) -> Tuple[str, bool]:
+    """(sentence, mentions a risk term)"""
+    if rng.random() < risk_density:
+        return rng.choice(RISK_TEMPLATES).format(term=rng.choice(risk_terms)), True
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}.", False
+
+def _pdf_text(line: str) -> str:
+    """Escape a line for a PDF string literal; the standard fonts only cover Latin-1"""
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Write lines of plain text as a minimal PDF, one list of lines per page"""
+    objects: List[bytes] = []
+    pages_id = 2 + 2 * len(pages)  # font, then a content stream and page per page
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in pages:
+        operations = ["BT /F1 10 Tf 50 780 Td 12 TL"] + [f"({_pdf_text(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(operations).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    with open(path, "wb") as file:
+        file.write(output)
+
+def generate_contract(path: str, pages: int = 10, clauses: int = 20,
+                      risk_density: float = 0.1, seed: int = 0) -> SyntheticContract:
+    """Write a synthetic contract of `pages` pages with `clauses` numbered clauses
+
+    risk_density is the fraction of sentences that mention a risk term.
+    """
+    rng = random.Random(seed)
+    risk_terms = [term for terms in RISK_TAXONOMY.values() for term in terms]
+    clauses = max(1, clauses)
+    budget = max(3, (pages * LINES_PER_PAGE - 2) // clauses)  # lines per clause
+
+    lines = [f"MASTER SERVICES AGREEMENT (synthetic contract {seed})", ""]
+    sentences = risk_sentences = 0
+    for number in range(1, clauses + 1):
+        heading = HEADINGS[(number - 1) % len(HEADINGS)]
+        clause_lines = [f"{number}. {heading.upper()}"]
+        for sub in range(1, budget):
+            paragraph = [_sentence(rng, risk_terms, risk_density) for _ in range(3)]
+            wrapped = textwrap.wrap(f"{number}.{sub} " + " ".join(text for text, _ in paragraph), LINE_WIDTH)
+            if len(clause_lines) + len(wrapped) > budget - 1:
+                break
+            clause_lines += wrapped
+            sentences += len(paragraph)
+            risk_sentences += sum(risky for _, risky in paragraph)
+        lines += clause_lines + [""]
+
+    page_lines = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)][:pages]
+    page_lines += [[""]] * (pages - len(page_lines))
+    write_pdf(path, page_lines)
+    return SyntheticContract(path, pages, clauses, sentences, risk_sentences)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="PDF path to write")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--clauses", type=int, default=20)
+    parser.add_argument("--risk-density", type=float, default=0.1, help="fraction of sentences with a risk term")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    contract = generate_contract(args.output, args.pages, args.clauses, args.risk_density, args.seed)
+    print(f"Wrote {contract.path}: {contract.pages} pages, {contract.clauses} clauses, "
+          f"{contract.risk_sentences}/{contract.sentences} sentences with risk terms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare Chroma and the memory-mapped index for per-contract top-k search.
+
+Run from the repository root:
+    python -m benchmarks.vector_index_benchmark --chunks 2000 --dim 1536
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from vector_index import MmapVectorIndex
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors so the benchmark measures search, not embedding"""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+def percentiles(samples: List[float]) -> str:
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):.2f}ms  p95 {np.percentile(ms, 95):.2f}ms  p99 {np.percentile(ms, 99):.2f}ms"
+
+def time_calls(fn: Callable[[str], object], queries: List[str]) -> List[float]:
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks + args.queries, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+    queries = [f"query {i}" for i in range(args.queries)]
+    embeddings = LookupEmbeddings(dict(zip(texts + queries, vectors.tolist())))
+    ids = [str(i) for i in range(args.chunks)]
+    metadatas = [{'chunk_id': f"chunk_{i}", 'page_number': 1} for i in range(args.chunks)]
+
+    workdir = tempfile.mkdtemp(prefix="vector_index_bench_")
+    try:
+        chroma = Chroma.from_texts(texts, embeddings, metadatas=metadatas, ids=ids,
+                                   collection_name="bench", persist_directory=os.path.join(workdir, "chroma"))
+        index_path = os.path.join(workdir, "mmap")
+        MmapVectorIndex.build(index_path, ids, texts, metadatas, vectors[:args.chunks], dtype=args.dtype)
+
+        started = time.perf_counter()
+        Chroma(embedding_function=embeddings, collection_name="bench",
+               persist_directory=os.path.join(workdir, "chroma"))
+        chroma_load = time.perf_counter() - started
+        started = time.perf_counter()
+        index = MmapVectorIndex(index_path, embedding_function=embeddings)
+        mmap_load = time.perf_counter() - started
+
+        chroma_samples = time_calls(lambda q: chroma.similarity_search_with_score(q, k=args.k), queries)
+        mmap_samples = time_calls(lambda q: index.similarity_search_with_score(q, k=args.k), queries)
+        started = time.perf_counter()
+        index.batch_similarity_search_with_score(queries, k=args.k)
+        batch_seconds = time.perf_counter() - started
+
+        # The mmap index is exact; Chroma's HNSW is approximate, so it can miss on random vectors
+        agree = sum(
+            chroma.similarity_search_with_score(q, k=1)[0][0].page_content
+            == index.similarity_search_with_score(q, k=1)[0][0].page_content
+            for q in queries[:50]
+        )
+
+        print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}, mmap {args.dtype}")
+        print(f"load    chroma {chroma_load * 1000:.1f}ms   mmap {mmap_load * 1000:.1f}ms")
+        print(f"chroma  {percentiles(chroma_samples)}")
+        print(f"mmap    {percentiles(mmap_samples)}")
+        print(f"mmap batched: {args.queries} queries in {batch_seconds * 1000:.1f}ms "
+              f"({batch_seconds / args.queries * 1000:.3f}ms/query)")
+        print(f"Chroma top-1 matches exact top-1 on {agree}/50 queries")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
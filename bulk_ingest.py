@@ -0,0 +1,196 @@
+"""Ingest every PDF under a directory into the ingestion cache and vector store.
+
+Parsing runs in a process pool; parsed contracts are embedded on a separate
+thread while later files are still being parsed. Progress is appended to a
+JSONL manifest, so an interrupted run resumes without redoing finished files.
+With --document-id-from-name, files with the same name (e.g. revisions in
+dated folders) share one collection, so later revisions embed only changes.
+
+    python bulk_ingest.py ./contracts --workers 8
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Any, Iterator, Optional, Set
+from config import BULK_MANIFEST_PATH, BULK_MAX_PENDING_EMBEDS
+from document_processor import count_pages
+from ingestion import (
+    hash_file, ingestion_key, collection_name_for, document_id_from_filename, load_cached_chunks,
+    parse_contract, store_contract
+)
+
+@dataclass
+class BulkStats:
+    """Running totals for the throughput report"""
+    files: int = 0
+    skipped: int = 0
+    failed: int = 0
+    pages: int = 0
+    chunks: int = 0
+    started: float = 0.0
+
+    def report(self) -> str:
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        return (f"{self.files} files ingested, {self.skipped} skipped, {self.failed} failed in {seconds:.1f}s: "
+                f"{self.files / seconds * 60:.1f} files/min, {self.pages / seconds:.1f} pages/sec, "
+                f"{self.chunks / seconds:.1f} chunks/sec")
+
+def find_pdfs(root: str) -> Iterator[str]:
+    """PDF paths under root, in a stable order"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(directory, name)
+
+def file_signature(path: str) -> str:
+    """Cheap change detector used to skip finished files without re-hashing them"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+def read_finished(manifest_path: str) -> Set[str]:
+    """Signatures of files the manifest records as done"""
+    finished = set()
+    if not os.path.exists(manifest_path):
+        return finished
+    with open(manifest_path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if entry.get('status') == 'done':
+                finished.add(entry['signature'])
+    return finished
+
+def parse_file(path: str) -> Dict[str, Any]:
+    """Hash and parse one PDF; runs in a worker process"""
+    started = time.perf_counter()
+    content_hash = hash_file(path)
+    key = ingestion_key(content_hash)
+    result = {'path': path, 'content_hash': content_hash, 'key': key, 'pages': count_pages(path)}
+    if load_cached_chunks(key) is not None:
+        # Same bytes already ingested (e.g. a duplicate file): nothing to parse or embed
+        result['chunks'] = None
+    else:
+        # One process per file already saturates the cores; no nested page pool
+        result['chunks'] = parse_contract(path, max_workers=1)
+    result['parse_seconds'] = time.perf_counter() - started
+    return result
+
+class Manifest:
+    """Append-only JSONL checkpoint, safe to write from several threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self.lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+def bulk_ingest(root: str, workers: Optional[int] = None, manifest_path: str = BULK_MANIFEST_PATH,
+                max_pending_embeds: int = BULK_MAX_PENDING_EMBEDS, document_id_from_name: bool = False) -> BulkStats:
+    """Ingest all PDFs under root, resuming from the manifest"""
+    stats = BulkStats(started=time.perf_counter())
+    manifest = Manifest(manifest_path)
+    finished = read_finished(manifest_path)
+
+    todo = []
+    for path in find_pdfs(root):
+        signature = file_signature(path)
+        if signature in finished:
+            stats.skipped += 1
+        else:
+            todo.append((path, signature))
+    print(f"Found {len(todo) + stats.skipped} PDFs, {stats.skipped} already done, {len(todo)} to ingest")
+
+    stored: Set[str] = set()
+
+    def embed(parsed: Dict[str, Any], signature: str) -> None:
+        # Runs on the single embedding thread, overlapping with parsing in the pool
+        chunks = parsed['chunks']
+        document_id = document_id_from_filename(parsed['path']) if document_id_from_name else None
+        if chunks is not None and parsed['key'] not in stored:
+            stored.add(parsed['key'])
+            store_contract(parsed['key'], parsed['content_hash'], chunks,
+                           collection_name_for(parsed['key'], document_id))
+        manifest.record({
+            'signature': signature, 'path': parsed['path'], 'status': 'done', 'document_id': document_id,
+            'content_hash': parsed['content_hash'], 'pages': parsed['pages'],
+            'chunks': len(chunks) if chunks is not None else None,
+            'parse_seconds': round(parsed['parse_seconds'], 3)
+        })
+        stats.files += 1
+        stats.pages += parsed['pages']
+        stats.chunks += len(chunks) if chunks is not None else 0
+        if stats.files % 25 == 0:
+            print(stats.report())
+
+    workers = workers or os.cpu_count() or 1
+    pending_embeds: List[Future] = []
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=1) as embed_pool:
+        # Keep a bounded window of files in flight so memory stays flat on huge archives
+        window = workers * 2
+        queue = iter(todo)
+        in_flight: Dict[Future, tuple] = {}
+
+        def submit_next() -> None:
+            item = next(queue, None)
+            if item is not None:
+                in_flight[parse_pool.submit(parse_file, item[0])] = item
+
+        for _ in range(window):
+            submit_next()
+
+        while in_flight:
+            future = next(as_completed(in_flight))
+            path, signature = in_flight.pop(future)
+            submit_next()
+            try:
+                parsed = future.result()
+            except Exception as e:
+                stats.failed += 1
+                manifest.record({'signature': signature, 'path': path, 'status': 'failed', 'error': str(e)})
+                print(f"❌ {path}: {e}")
+                continue
+
+            pending_embeds = [f for f in pending_embeds if not f.done()]
+            if len(pending_embeds) >= max_pending_embeds:
+                # Embedding is the bottleneck: wait instead of piling parsed chunks up in memory
+                pending_embeds.pop(0).exception()  # failures are recorded by _report_embed
+            embed_future = embed_pool.submit(embed, parsed, signature)
+            embed_future.add_done_callback(lambda f, path=path, signature=signature: _report_embed(f, path, signature, manifest, stats))
+            pending_embeds.append(embed_future)
+
+    print(stats.report())
+    return stats
+
+def _report_embed(future: Future, path: str, signature: str, manifest: Manifest, stats: BulkStats) -> None:
+    error = future.exception()
+    if error is not None:
+        stats.failed += 1
+        manifest.record({'signature': signature, 'path': path, 'status': 'failed', 'error': str(error)})
+        print(f"❌ {path}: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="directory to scan for PDFs")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU)")
+    parser.add_argument("--manifest", default=BULK_MANIFEST_PATH, help="JSONL checkpoint file")
+    parser.add_argument("--document-id-from-name", action="store_true",
+                        help="use each file name (without extension) as its document ID")
+    args = parser.parse_args()
+    bulk_ingest(args.root, workers=args.workers, manifest_path=args.manifest,
+                document_id_from_name=args.document_id_from_name)
+
+if __name__ == "__main__":
+    main()
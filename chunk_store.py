@@ -0,0 +1,232 @@
+"""Compact in-memory storage for a contract's chunks"""
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Fields with their own columns; any other chunk field is stored in a CodedColumn
+CORE_FIELDS = frozenset({'content', 'chunk_id', 'page_number', 'page_start', 'page_end', 'start_index', 'risk_score'})
+
+def _freeze(value: Any) -> Any:
+    """Hashable form of a field value, so equal values are stored once"""
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+def _thaw(value: Any, kind: type) -> Any:
+    if kind is dict:
+        return dict(value)
+    if kind is list:
+        return list(value)
+    return value
+
+class CodedColumn:
+    """Distinct values of one field, referenced per chunk by code (code 0 is None)"""
+    __slots__ = ('values', 'codes', 'kind', '_codes_by_value')
+
+    def __init__(self, padding: int = 0):
+        self.values: List[Any] = [None]
+        self.codes = array('I', bytes(4 * padding))
+        self.kind: Optional[type] = None
+        self._codes_by_value: Optional[Dict[Any, int]] = {}
+
+    def append(self, value: Any) -> None:
+        if value is None:
+            self.codes.append(0)
+            return
+        if self.kind is None:
+            self.kind = type(value)
+        frozen = _freeze(value)
+        code = self._codes_by_value.get(frozen)
+        if code is None:
+            code = self._codes_by_value[frozen] = len(self.values)
+            self.values.append(frozen)
+        self.codes.append(code)
+
+    def seal(self) -> None:
+        """Drop the lookup table once all chunks are added"""
+        self._codes_by_value = None
+
+    def get(self, position: int) -> Any:
+        value = self.values[self.codes[position]]
+        return None if value is None else _thaw(value, self.kind)
+
+class ChunkView(Mapping):
+    """One chunk of a ChunkStore, read like the chunk dict it was built from"""
+    __slots__ = ('store', 'position')
+
+    def __init__(self, store: "ChunkStore", position: int):
+        self.store = store
+        self.position = position
+
+    def __getitem__(self, key: str) -> Any:
+        return self.store.field(self.position, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.fields(self.position))
+
+    def __len__(self) -> int:
+        return len(self.store.fields(self.position))
+
+    def __repr__(self) -> str:
+        return f"ChunkView({dict(self)!r})"
+
+class ChunkStore:
+    """A contract's chunks: one text buffer, offset and page arrays, and coded metadata columns"""
+    __slots__ = ('text', 'offsets', 'lengths', 'start_index', 'page_start', 'page_end', 'risk_score',
+                 'columns', '_ids', '_positions')
+
+    def __init__(self):
+        self.text = ""
+        self.offsets = array('q')  # where each chunk's text starts in self.text
+        self.lengths = array('I')
+        self.start_index = array('q')  # offset in the contract, -1 when unknown
+        self.page_start = array('I')
+        self.page_end = array('I')
+        self.risk_score = array('d')  # NaN for chunks never scanned for risk terms
+        self.columns: Dict[str, CodedColumn] = {}
+        self._ids: Optional[List[str]] = None  # None while chunk i is "chunk_{i}"
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Mapping]) -> "ChunkStore":
+        """Pack chunk dicts (in contract order) into a store"""
+        store = cls()
+        parts: List[str] = []
+        length = 0
+        ids: List[str] = []
+        sequential = True
+        # (contract offset, buffer offset, text) of the chunk that ends the buffer
+        tail: Optional[Tuple[int, int, str]] = None
+        for position, chunk in enumerate(chunks):
+            content = chunk['content']
+            start = chunk.get('start_index')
+            offset, added = _shared_offset(tail, start, content)
+            if offset is None:
+                offset, added = length, content
+            if added or offset == length:
+                parts.append(added)
+                length += len(added)
+                tail = (start, offset, content) if start is not None else None
+
+            chunk_id = chunk['chunk_id']
+            ids.append(chunk_id)
+            sequential = sequential and chunk_id == f"chunk_{position}"
+            page_start = chunk.get('page_start', chunk['page_number'])
+            store.offsets.append(offset)
+            store.lengths.append(len(content))
+            store.start_index.append(-1 if start is None else start)
+            store.page_start.append(page_start)
+            store.page_end.append(chunk.get('page_end', page_start))
+            store.risk_score.append(chunk.get('risk_score', math.nan))
+            for key in chunk.keys() - CORE_FIELDS - store.columns.keys():
+                store.columns[key] = CodedColumn(padding=position)
+            for key, column in store.columns.items():
+                column.append(chunk.get(key))
+
+        store.text = "".join(parts)
+        store._ids = None if sequential else ids
+        for column in store.columns.values():
+            column.seal()
+        return store
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ChunkView, List[ChunkView]]:
+        if isinstance(index, slice):
+            return [ChunkView(self, position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return ChunkView(self, index)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, position) for position in range(len(self)))
+
+    def content(self, position: int) -> str:
+        offset = self.offsets[position]
+        return self.text[offset:offset + self.lengths[position]]
+
+    def chunk_id(self, position: int) -> str:
+        return f"chunk_{position}" if self._ids is None else self._ids[position]
+
+    def position(self, chunk_id: str) -> Optional[int]:
+        """Position of a chunk ID in the store, or None"""
+        if self._ids is None:
+            number = chunk_id[len("chunk_"):] if chunk_id.startswith("chunk_") else ""
+            if number.isdigit() and int(number) < len(self) and chunk_id == f"chunk_{int(number)}":
+                return int(number)
+            return None
+        if self._positions is None:
+            self._positions = {chunk_id: position for position, chunk_id in enumerate(self._ids)}
+        return self._positions.get(chunk_id)
+
+    def find(self, chunk_id: str) -> Optional[ChunkView]:
+        """The chunk with this ID, or None"""
+        position = self.position(chunk_id)
+        return None if position is None else ChunkView(self, position)
+
+    def fields(self, position: int) -> List[str]:
+        """Keys of the chunk dict at a position"""
+        keys = ['content', 'chunk_id', 'page_number', 'page_start', 'page_end']
+        if self.start_index[position] >= 0:
+            keys.append('start_index')
+        if not math.isnan(self.risk_score[position]):
+            keys.append('risk_score')
+        return keys + list(self.columns)
+
+    def field(self, position: int, key: str) -> Any:
+        """One field of the chunk at a position; KeyError if the chunk has no such field"""
+        if key == 'content':
+            return self.content(position)
+        if key == 'chunk_id':
+            return self.chunk_id(position)
+        if key in ('page_number', 'page_start'):
+            return self.page_start[position]
+        if key == 'page_end':
+            return self.page_end[position]
+        if key == 'start_index' and self.start_index[position] >= 0:
+            return self.start_index[position]
+        if key == 'risk_score' and not math.isnan(self.risk_score[position]):
+            return self.risk_score[position]
+        if key in self.columns:
+            return self.columns[key].get(position)
+        raise KeyError(key)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the store"""
+        arrays = [self.offsets, self.lengths, self.start_index, self.page_start, self.page_end, self.risk_score]
+        arrays += [column.codes for column in self.columns.values()]
+        total = sys.getsizeof(self.text) + sum(len(values) * values.itemsize for values in arrays)
+        total += sum(sys.getsizeof(value) for column in self.columns.values() for value in column.values)
+        if self._ids is not None:
+            total += sys.getsizeof(self._ids) + sum(sys.getsizeof(chunk_id) for chunk_id in self._ids)
+        return total
+
+def _shared_offset(tail: Optional[Tuple[int, int, str]], start: Optional[int],
+                   content: str) -> Tuple[Optional[int], str]:
+    """(buffer offset, text to append) when content overlaps the text ending the buffer, else (None, "")
+
+    Chunks are exact slices of the contract text, so a chunk starting inside the
+    previous one repeats its text up to where that one ends; only the rest is new.
+    """
+    if tail is None or start is None:
+        return None, ""
+    tail_start, tail_offset, tail_text = tail
+    shift = start - tail_start
+    if not 0 <= shift < len(tail_text):
+        return None, ""
+    overlap = len(tail_text) - shift
+    if overlap >= len(content):
+        if tail_text[shift:shift + len(content)] == content:
+            return tail_offset + shift, ""
+        return None, ""
+    if tail_text[shift:] != content[:overlap]:
+        return None, ""
+    return tail_offset + shift, content[overlap:]
@@ -0,0 +1,141 @@
+"""Clause-aware splitting: one chunk per numbered clause or defined term"""
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+NUMBERED_HEADING = re.compile(r"^[ \t]*(\d{1,3}(?:\.\d{1,3})*)(\.?)[ \t]+([A-Z(].*)$", re.MULTILINE)
+KEYWORD_HEADING = re.compile(r"^[ \t]*(ARTICLE|Article|SECTION|Section|CLAUSE|Clause)[ \t]+"
+                             r"(\d{1,3}(?:\.\d{1,3})*|[IVXLC]+)\b[.:\-–\s]*(.*)$", re.MULTILINE)
+DEFINED_TERM = re.compile(r"^[ \t]*[\"“]([^\"”\n]{1,60})[\"”][ \t]+(?:means|shall mean|has the meaning)\b",
+                          re.MULTILINE)
+
+# Page separators inserted by document_processor.process_pdf; not clause text
+PAGE_MARKER = re.compile(r"^--- Page \d+ ---$", re.MULTILINE)
+
+MAX_HEADING_WORDS = 8  # longer text after a section number is the clause body, not a heading
+SENTENCE_END = (".", "!", "?", ";")
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100}
+
+@dataclass
+class Section:
+    start: int
+    number: Optional[str]
+    heading: str
+    path: str
+    title_only: bool = False  # the line reads as a title ("3. FEES", "Term"), not a one-line clause
+
+def roman_to_int(numeral: str) -> int:
+    total = 0
+    for i, char in enumerate(numeral):
+        value = ROMAN_VALUES[char]
+        following = ROMAN_VALUES[numeral[i + 1]] if i + 1 < len(numeral) else 0
+        total += -value if value < following else value
+    return total
+
+def article_number(numeral: str) -> str:
+    """Section number of an article; articles have their own namespace, so Article IV is not section 4"""
+    return f"Article {roman_to_int(numeral.upper()) if numeral.isalpha() else numeral}"
+
+def _heading_text(rest: str) -> Tuple[str, bool]:
+    """(heading, line reads as a title) for the text after a section number
+
+    The heading runs up to the first sentence end, and only counts if it is short.
+    A short line ending like a sentence ("Either party may terminate.") is a
+    clause, unless it is in capitals.
+    """
+    rest = rest.strip()
+    heading = re.split(r"\.\s|\s[-–]\s", rest, maxsplit=1)[0].strip().rstrip(".:")
+    if len(heading.split()) > MAX_HEADING_WORDS:
+        return "", False
+    whole_line = heading == rest.rstrip(".:")
+    return heading, whole_line and (not rest.endswith(SENTENCE_END) or rest.isupper())
+
+def _is_child(section: Section, parent: Section) -> bool:
+    """Whether section is numbered under parent (3.1 under 3, 4.1 under Article 4)"""
+    if section.number is None or parent.number is None or section.number == parent.number:
+        return False
+    parent_number = parent.number.split()[-1]
+    return section.number.startswith(f"{parent_number}.")
+
+def _has_text(text: str) -> bool:
+    return bool(PAGE_MARKER.sub("", text).strip())
+
+def detect_sections(text: str) -> List[Section]:
+    """Section starts in text order, each with its number, heading and path from the top level"""
+    starts = []
+    for match in NUMBERED_HEADING.finditer(text):
+        number, dot, rest = match.groups()
+        if "." not in number and not dot and not rest.isupper():
+            continue  # "30 Business Days" wrapped onto a new line, not section 30
+        starts.append((match.start(), number, *_heading_text(rest), False))
+    for match in KEYWORD_HEADING.finditer(text):
+        keyword, number, rest = match.groups()
+        if keyword.lower() == "article":
+            number = article_number(number)
+        elif number.isalpha():
+            number = str(roman_to_int(number))
+        starts.append((match.start(), number, *_heading_text(rest), False))
+    for match in DEFINED_TERM.finditer(text):
+        starts.append((match.start(), None, match.group(1).strip(), False, True))
+    starts.sort(key=lambda start: start[0])
+
+    sections = []
+    stack: List[tuple] = []  # (number, label) of the enclosing numbered sections
+    for offset, number, heading, title_only, is_term in starts:
+        if sections and sections[-1].start == offset:
+            continue  # "Section 3 ..." also matches the keyword pattern
+        if is_term:
+            parent_number = stack[-1][0] if stack else None
+            path = " > ".join([label for _, label in stack] + [heading])
+            sections.append(Section(offset, parent_number, heading, path))
+            continue
+        depth = number.count(".") + 1
+        while stack and stack[-1][0].count(".") + 1 >= depth:
+            stack.pop()
+        stack.append((number, f"{number} {heading}".strip()))
+        sections.append(Section(offset, number, heading, " > ".join(label for _, label in stack), title_only))
+    return sections
+
+def split_clauses(text: str) -> List[Dict[str, Any]]:
+    """Split text into clause-level pieces: content, start_index and section fields (no chunk IDs or pages)"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter  # slow to import
+    sections = detect_sections(text)
+    if not sections or sections[0].start > 0:
+        sections.insert(0, Section(0, None, "Preamble", "Preamble"))
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True
+    )
+
+    pieces = []
+    carried_from = None  # start of a body-less heading waiting for its first sub-clause
+    for i, section in enumerate(sections):
+        end = sections[i + 1].start if i + 1 < len(sections) else len(text)
+        start = section.start if carried_from is None else carried_from
+        lines = text[section.start:end].strip().split("\n", 1)
+        heading_only = len(lines) == 1 or not _has_text(lines[1])
+        next_is_child = i + 1 < len(sections) and _is_child(sections[i + 1], section)
+        if heading_only and (section.title_only or next_is_child) and i + 1 < len(sections):
+            carried_from = start
+            continue
+        carried_from = None
+        section_text = text[start:end]
+        if not _has_text(section_text):
+            continue
+        fields = {
+            'element_type': 'clause',
+            'section_number': section.number,
+            'heading': section.heading,
+            'section_path': section.path
+        }
+        if len(section_text) <= CHUNK_SIZE:
+            stripped = section_text.strip()
+            pieces.append({'content': stripped, 'start_index': start + section_text.index(stripped), **fields})
+            continue
+        for document in splitter.create_documents([section_text]):
+            offset = max(document.metadata.get('start_index', 0), 0)
+            pieces.append({'content': document.page_content, 'start_index': start + offset, **fields})
+    return pieces
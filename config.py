@@ -5,9 +5,122 @@ OPENAI_API_KEY = "sk-proj-h34RlkN0e6x4t9J9565qEmbKknwzBH_GMStK-rQNRwsTF0oD19Uo_-
 OPENAI_MODEL = "gpt-4o"  # Using GPT-4o as the default model
 OPENAI_TEMPERATURE = 0.0
 
+# Routing: a local classifier decides; the LLM router is only asked below this confidence
+ROUTER_CONFIDENCE_THRESHOLD = 0.5
+ROUTER_MIN_MARGIN = 0.35  # escalate when the top two classes are closer than this (benchmarks/router_benchmark.py)
+ROUTER_CACHE_SIZE = 4096  # normalized query -> route decisions kept in memory
+
+EMBEDDING_BACKEND = "openai"  # "openai" or "local" (CPU sentence-transformers, no network)
+EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_EMBEDDING_BASE_URL = os.getenv("OPENAI_EMBEDDING_BASE_URL")  # e.g. a local stand-in server
+
+# Embedding pipeline
+EMBEDDING_BATCH_TOKENS = 20000  # max tokens per embedding request
+EMBEDDING_BATCH_SIZE = 256  # max texts per embedding request
+EMBEDDING_MAX_CONCURRENCY = 4  # embedding requests in flight
+EMBEDDING_MAX_RETRIES = 6  # retries on rate-limit (429) errors
+EMBEDDING_BACKOFF_SECONDS = 1.0  # base delay for exponential backoff
+
+# Local embedding backend (EMBEDDING_BACKEND = "local")
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_MODEL_PATH = "./models/all-MiniLM-L6-v2"  # saved by download_model.py
+LOCAL_EMBEDDING_BATCH_SIZE = 256  # texts per forward pass
+LOCAL_EMBEDDING_THREADS = 0  # torch intra-op threads; 0 = library default
+LOCAL_EMBEDDING_FLOAT16 = False  # return float16 vectors
+
 CHROMA_DB_PATH = "./chroma_db"
 COLLECTION_NAME = "contract_chunks"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+CHUNKING_STRATEGY = "clause"  # "clause" (one chunk per numbered clause/defined term) or "recursive" (fixed size)
 TOP_K_RESULTS = 5
+VECTOR_INDEX_BACKEND = "chroma"  # "chroma" or "mmap" (in-process memory-mapped matrix per contract)
+RETRIEVAL_MODE = "hybrid"  # "hybrid" (BM25 + vector, fused) or "vector"
+HYBRID_RRF_K = 60  # reciprocal rank fusion constant
+HYBRID_CANDIDATES = 20  # candidates taken from each retriever before fusion
+BM25_K1 = 1.5
+BM25_B = 0.75
+VECTOR_INDEX_DTYPE = "float32"  # "float16" halves index size but upcasts on every query
+
+# PDF parsing
+PDF_WORKERS = 0  # processes for page extraction; 0 = one per CPU
+PDF_PAGES_PER_TASK = 16  # pages extracted per worker task
+
+# Ingestion cache (parsed chunks keyed by PDF content hash + chunking config)
+INGEST_CACHE_PATH = "./ingest_cache"
+INGEST_MEMORY_CACHE_SIZE = 8  # ingested contracts kept in-process
+
+# Bulk ingestion (bulk_ingest.py): checkpoint manifest and how many parsed
+# contracts may wait for embedding before parsing pauses
+BULK_MANIFEST_PATH = "./ingest_cache/bulk_manifest.jsonl"
+BULK_MAX_PENDING_EMBEDS = 4
+
+# Streamlit app: uploads are ingested in background threads; finished contracts are
+# kept across reruns and browser sessions until their estimated size exceeds the budget
+APP_INGEST_WORKERS = 2
+APP_CONTRACT_CACHE_MB = 512
+
+# Batch mode: queries analysed concurrently against one contract
+BATCH_MAX_CONCURRENCY = 8
+
+# Speculative retrieval: top-k search starts while the query is still being routed,
+# and its results go to the agent if the router picks one that retrieves
+SPECULATIVE_RETRIEVAL = True
+SPECULATIVE_RETRIEVAL_WORKERS = 8
+
+# Headless queue runner (queue_runner.py): analyses in flight and requests read ahead
+QUEUE_MAX_CONCURRENCY = 16
+QUEUE_MAX_PENDING = 64  # reading pauses while this many requests wait (backpressure)
+
+# Startup: heavy libraries are imported on first use. Long-running processes (Streamlit,
+# queue runner) load them and build the LLM and embedding clients in a background thread
+WARM_UP_ON_START = True
+
+# Portfolio search (portfolio.py): each catalogued contract's vector index is a shard;
+# queries fan out over the shards that pass the metadata filters in parallel
+PORTFOLIO_CATALOG_PATH = "./ingest_cache/portfolio.jsonl"
+PORTFOLIO_SEARCH_WORKERS = 8
+PORTFOLIO_OPEN_SHARDS = 256  # memory-mapped shards kept open between queries (capped by the open-file limit)
+PORTFOLIO_TOP_K = 10  # hits across all contracts per query
+
+# Instrumentation: per-event JSON lines and a Prometheus text snapshot ("" disables either)
+METRICS_JSONL_PATH = "./metrics/events.jsonl"
+METRICS_PROMETHEUS_PATH = "./metrics/metrics.prom"
+# USD per million tokens, for cost estimates; unlisted models count as free
+MODEL_PRICING_PER_MILLION = {
+    "gpt-4o": {"prompt": 2.50, "completion": 10.00},
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60},
+    "text-embedding-3-small": {"prompt": 0.02},
+    "text-embedding-3-large": {"prompt": 0.13},
+}
+
+# Response cache: answers reused for the same or a near-duplicate question on the same contract
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_PATH = "./response_cache"
+RESPONSE_CACHE_SIZE = 2000  # answers kept across all contracts (least recently used evicted)
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+RESPONSE_CACHE_SIMILARITY = 0.95  # query-embedding cosine similarity that counts as the same question
+
+# Summarisation
+SUMMARY_MODE = "map_reduce"  # "map_reduce" (whole contract) or "head" (first 10 chunks)
+SUMMARY_WINDOW_TOKENS = 6000  # contract text per map-step LLM call
+SUMMARY_MAX_WORKERS = 8  # concurrent map/reduce LLM calls
+SUMMARY_REDUCE_FANIN = 8  # partial summaries merged per reduce call
+SUMMARY_CACHE_PATH = "./summary_cache"  # partial summaries keyed by window content hash
+
+# Risk scanning: keyword taxonomy matched once at ingestion (a term also matches
+# words it starts, e.g. "terminate" matches "terminated")
+RISK_TAXONOMY = {
+    'financial': ['penalty', 'penalties', 'damages', 'liquidated damages', 'guarantee', 'default'],
+    'legal': ['liability', 'indemnify', 'indemnification', 'indemnity', 'breach', 'warranty', 'warranties'],
+    'termination': ['terminate', 'termination'],
+    'operational': ['force majeure'],
+    'compliance': ['confidential', 'non-compete', 'intellectual property']
+}
+RISK_CONTEXT_CHUNKS = 5  # highest risk-density chunks sent to the risk checker
 
+# Prompt context: overlapping chunks are merged into contiguous spans, near-duplicate
+# passages dropped and the rest packed into a token budget per agent
+CONTEXT_TOKEN_BUDGETS = {'rag_qa': 1500, 'risk_checker': 1500, 'summariser': 3000}
+CONTEXT_MMR_LAMBDA = 0.7  # weight of relevance against diversity when ordering passages
+CONTEXT_REDUNDANCY_THRESHOLD = 0.8  # word overlap with a chosen passage above which a passage is dropped
@@ -0,0 +1,130 @@
+"""Prompt context for the agents: merged, de-duplicated passages packed into a token budget"""
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+from langchain_core.documents import Document
+from chunk_store import ChunkStore
+from config import CONTEXT_TOKEN_BUDGETS, CONTEXT_MMR_LAMBDA, CONTEXT_REDUNDANCY_THRESHOLD
+from token_counter import count_tokens
+
+# Chunks that do not overlap are separated by the "\n\n" the splitter dropped
+SEPARATOR_GAP = 2
+
+@dataclass
+class Passage:
+    """Contiguous contract text and the chunks it was built from"""
+    chunk_ids: List[str]
+    text: str
+    relevance: float  # 1.0 for the best candidate, falling with rank
+    start: Optional[int] = None  # character offset in the contract, when known
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+    @property
+    def citation(self) -> str:
+        return " ".join(f"[{chunk_id}]" for chunk_id in self.chunk_ids)
+
+def non_overlapping_tail(text: str, start: Optional[int], covered_until: Optional[int]) -> str:
+    """The part of text (beginning at offset start) after covered_until"""
+    if start is None or covered_until is None:
+        return text
+    return text[max(covered_until - start, 0):]
+
+def passage_from_chunk(chunk: Dict[str, Any], relevance: float = 1.0) -> Passage:
+    page_start = chunk.get('page_start', chunk.get('page_number'))
+    return Passage([chunk['chunk_id']], chunk['content'], relevance, chunk.get('start_index'),
+                   page_start, chunk.get('page_end', page_start))
+
+def passages_from_chunks(chunks: List[Dict[str, Any]]) -> List[Passage]:
+    """Passages for chunks already in priority order"""
+    return [passage_from_chunk(chunk, 1.0 - i / len(chunks)) for i, chunk in enumerate(chunks)]
+
+def passages_from_results(results: List[Tuple[Document, float]],
+                          chunks: Optional[ChunkStore] = None) -> List[Passage]:
+    """Passages for search results, ranked by position
+
+    Scores are not comparable across retrieval backends (distances, fused ranks),
+    so relevance comes from the rank. Offsets come from the contract's chunks when
+    given, since stored vectors do not carry them.
+    """
+    passages = []
+    for i, (doc, _) in enumerate(results):
+        chunk = chunks.find(doc.metadata['chunk_id']) if chunks is not None else None
+        page_start = doc.metadata.get('page_start', doc.metadata.get('page_number'))
+        passages.append(Passage([doc.metadata['chunk_id']], doc.page_content, 1.0 - i / len(results),
+                                (chunk or doc.metadata).get('start_index'),
+                                page_start, doc.metadata.get('page_end', page_start)))
+    return passages
+
+def merge_overlapping(passages: List[Passage]) -> List[Passage]:
+    """Join passages whose text overlaps or adjoins into single spans, in contract order"""
+    located = sorted((p for p in passages if p.start is not None), key=lambda p: p.start)
+    merged: List[Passage] = []
+    for passage in located:
+        last = merged[-1] if merged else None
+        if last is not None and passage.start <= last.end + SEPARATOR_GAP:
+            if passage.start > last.end:
+                last.text += "\n" * (passage.start - last.end)  # keeps offsets exact
+            if passage.end > last.end:
+                last.text += non_overlapping_tail(passage.text, passage.start, last.end)
+            last.chunk_ids = last.chunk_ids + passage.chunk_ids
+            last.relevance = max(last.relevance, passage.relevance)
+            last.page_end = max(filter(None, [last.page_end, passage.page_end]), default=None)
+        else:
+            merged.append(Passage(list(passage.chunk_ids), passage.text, passage.relevance,
+                                  passage.start, passage.page_start, passage.page_end))
+    return merged + [p for p in passages if p.start is None]
+
+def _words(text: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def select_diverse(passages: List[Passage], mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+                   redundancy_threshold: float = CONTEXT_REDUNDANCY_THRESHOLD) -> List[Passage]:
+    """Order passages by maximal marginal relevance, dropping near-duplicates of ones already chosen
+
+    Similarity is word-set overlap, so no extra embedding calls are needed.
+    """
+    words = [_words(p.text) for p in passages]
+    remaining = list(range(len(passages)))
+    chosen: List[int] = []
+    while remaining:
+        def redundancy(i: int) -> float:
+            return max((_similarity(words[i], words[j]) for j in chosen), default=0.0)
+
+        best = max(remaining, key=lambda i: mmr_lambda * passages[i].relevance - (1 - mmr_lambda) * redundancy(i))
+        remaining.remove(best)
+        if redundancy(best) < redundancy_threshold:
+            chosen.append(best)
+    return [passages[i] for i in chosen]
+
+def pack(passages: List[Passage], budget: int) -> List[Passage]:
+    """Take passages in order while they fit in budget tokens; the first is truncated if it alone is too long"""
+    packed: List[Passage] = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(f"{passage.citation} {passage.text}")
+        if used + tokens <= budget:
+            packed.append(passage)
+            used += tokens
+        elif not packed:
+            keep = len(passage.text) * budget // tokens
+            packed.append(Passage(passage.chunk_ids, passage.text[:keep], passage.relevance,
+                                  passage.start, passage.page_start, passage.page_end))
+            used = budget
+    return packed
+
+def build_context(passages: List[Passage], agent: str) -> List[Passage]:
+    """Merge, de-duplicate and pack passages into the agent's budget; returned in contract order"""
+    selected = pack(select_diverse(merge_overlapping(passages)), CONTEXT_TOKEN_BUDGETS[agent])
+    return sorted(selected, key=lambda p: (p.start is None, p.start or 0))
+
+def format_context(passages: List[Passage]) -> str:
+    """Passages prefixed with their chunk citations"""
+    return "".join(f"\n{passage.citation} {passage.text}\n" for passage in passages)
@@ -1,38 +1,117 @@
-from typing import List, Dict, Any
-from config import CHUNK_SIZE, CHUNK_OVERLAP
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import pypdf
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from config import CHUNK_SIZE, CHUNK_OVERLAP, PDF_WORKERS, PDF_PAGES_PER_TASK, CHUNKING_STRATEGY
+from clause_chunker import split_clauses
+from metrics import timed
+from progress import report_progress
 
-def process_pdf(pdf_path: str) -> List[Dict[str, Any]]:
-    """Parse PDF and return chunks with metadata"""
-    print(f"Processing PDF: {pdf_path}")
-    
-    # Parse PDF with pypdf (simpler, no network dependencies)
+def count_pages(pdf_path: str) -> int:
+    """Number of pages in the PDF"""
+    import pypdf  # imported on first use to keep startup fast
+    with open(pdf_path, 'rb') as file:
+        return len(pypdf.PdfReader(file).pages)
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract text for pages [start, stop); runs inside a worker process"""
+    import pypdf
     with open(pdf_path, 'rb') as file:
         pdf_reader = pypdf.PdfReader(file)
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-    
-    # Create text splitter
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def iter_page_texts(pdf_path: str, max_workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) in page order, extracting page ranges in a process pool"""
+    num_pages = count_pages(pdf_path)
+    workers = max_workers or PDF_WORKERS or os.cpu_count() or 1
+    starts = list(range(0, num_pages, PDF_PAGES_PER_TASK))
+    next_page = 0
+
+    if workers > 1 and len(starts) > 1:
+        stops = [min(start + PDF_PAGES_PER_TASK, num_pages) for start in starts]
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+                # map() yields results in submission order as they complete
+                for texts in executor.map(_extract_page_range, repeat(pdf_path), starts, stops):
+                    for page_text in texts:
+                        next_page += 1
+                        report_progress("parse", next_page, num_pages)
+                        yield next_page, page_text
+            return
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Parallel page extraction failed ({e}); continuing serially from page {next_page + 1}")
+
+    for start in range(next_page, num_pages, PDF_PAGES_PER_TASK):
+        for page_text in _extract_page_range(pdf_path, start, min(start + PDF_PAGES_PER_TASK, num_pages)):
+            next_page += 1
+            report_progress("parse", next_page, num_pages)
+            yield next_page, page_text
+
+def page_for_offset(page_offsets: List[int], offset: int) -> int:
+    """1-based page number containing a character offset of the joined text"""
+    return max(bisect_right(page_offsets, offset), 1)
+
+def split_recursive(text: str) -> List[Dict[str, Any]]:
+    """Fixed-size overlapping pieces on generic separators: content and start_index"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter  # slow to import
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ". ", " ", ""]
+        separators=["\n\n", "\n", ". ", " ", ""],
+        add_start_index=True
     )
-    
+    return [
+        {'content': document.page_content,
+         'start_index': max(document.metadata.get('start_index', 0), 0),
+         'element_type': 'text'}
+        for document in text_splitter.create_documents([text])
+    ]
+
+def split_text(text: str) -> List[Dict[str, Any]]:
+    """Split with the configured CHUNKING_STRATEGY"""
+    if CHUNKING_STRATEGY == "clause":
+        return split_clauses(text)
+    if CHUNKING_STRATEGY != "recursive":
+        raise ValueError(f"Unknown CHUNKING_STRATEGY: {CHUNKING_STRATEGY!r}")
+    return split_recursive(text)
+
+def process_pdf(pdf_path: str, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Parse PDF and return chunks with metadata"""
+    print(f"Processing PDF: {pdf_path}")
+
+    # Join page texts once, remembering where each page starts in the joined text
+    parts = []
+    page_offsets = []
+    length = 0
+    with timed("parse"):
+        for page_num, page_text in iter_page_texts(pdf_path, max_workers=max_workers):
+            segment = f"\n--- Page {page_num} ---\n{page_text}"
+            page_offsets.append(length)
+            parts.append(segment)
+            length += len(segment)
+    text = "".join(parts)
+
     # Split text into chunks
-    text_chunks = text_splitter.split_text(text)
-    
+    report_progress("split", 0, 1)
+    with timed("split"):
+        pieces = split_text(text)
+    report_progress("split", 1, 1)
+
     chunks = []
-    for i, chunk in enumerate(text_chunks):
+    for i, piece in enumerate(pieces):
+        start = piece['start_index']
+        end = start + len(piece['content'])
+        page_start = page_for_offset(page_offsets, start)
         chunks.append({
-            'content': chunk,
+            'content': piece['content'],
             'chunk_id': f"chunk_{i}",
-            'page_number': 1,  # Will be estimated from chunk position
-            'element_type': 'text'
+            'page_number': page_start,
+            'page_start': page_start,
+            'page_end': page_for_offset(page_offsets, max(end - 1, start)),
+            **{key: value for key, value in piece.items() if key != 'content'}
         })
-    
-    print(f"Created {len(chunks)} chunks")
-    return chunks
\ No newline at end of file
+
+    print(f"Created {len(chunks)} chunks from {len(page_offsets)} pages")
+    return chunks
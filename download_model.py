@@ -1,2 +1,7 @@
 from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from config import LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL_PATH
+
+# Save a local copy so EMBEDDING_BACKEND = "local" works without network access
+model = SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+model.save(LOCAL_EMBEDDING_MODEL_PATH)
+print(f"Saved {LOCAL_EMBEDDING_MODEL} to {LOCAL_EMBEDDING_MODEL_PATH}")
@@ -0,0 +1,259 @@
+import asyncio
+import contextvars
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import (
+    EMBEDDING_BATCH_TOKENS, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES, EMBEDDING_BACKOFF_SECONDS,
+    LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL_PATH, LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_THREADS, LOCAL_EMBEDDING_FLOAT16
+)
+from metrics import record_embedding
+from progress import report_progress
+from token_counter import count_tokens
+
+@dataclass
+class EmbeddingStats:
+    """Throughput of one embedding run"""
+    chunks: int = 0
+    tokens: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"Embedded {self.chunks} chunks ({self.tokens} tokens) in {self.batches} batches "
+                f"over {self.seconds:.2f}s: {self.chunks_per_second:.1f} chunks/s, "
+                f"{self.tokens_per_second:.0f} tokens/s, {self.retries} retries")
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 / RateLimitError style failures from any client"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-suggested wait from a Retry-After header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def batch_by_tokens(token_counts: List[int], max_tokens: int, max_items: int) -> List[List[int]]:
+    """Group text indices into batches bounded by total tokens and item count"""
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def run_sync(coroutine: Awaitable) -> Any:
+    """Run a coroutine from sync code, even when an event loop is already running"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Carry the caller's context (metrics capture, progress listener) into the helper thread
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
+
+class BatchedEmbeddings(Embeddings):
+    """Token-batched, concurrency-bounded wrapper around any embedding client
+
+    The client only needs embed_documents/embed_query (async variants are used
+    when present), so a fake client or a local stand-in server works for tests.
+    Rate-limit errors pause all workers and are retried with jittered backoff.
+    """
+
+    def __init__(self, client: Any, max_batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+                 max_batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+                 max_retries: int = EMBEDDING_MAX_RETRIES,
+                 backoff_seconds: float = EMBEDDING_BACKOFF_SECONDS):
+        self.client = client
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.last_stats = EmbeddingStats()
+        self._resume_at = 0.0
+
+    def _backoff_delay(self, error: Exception, attempt: int, stats: EmbeddingStats) -> float:
+        """Seconds to wait before retrying a rate-limited call; also sets the shared cooldown"""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        stats.retries += 1
+        print(f"Embedding rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    async def _with_retry(self, call: Callable[[], Awaitable], stats: EmbeddingStats) -> Any:
+        for attempt in range(self.max_retries + 1):
+            # Another worker hit a rate limit: wait out the shared cooldown first
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self._backoff_delay(e, attempt, stats)
+
+    def _with_retry_sync(self, call: Callable[[], Any], stats: EmbeddingStats) -> Any:
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self._backoff_delay(e, attempt, stats)
+
+    async def _embed_all(self, texts: List[str], client_async: bool) -> List[List[float]]:
+        started = time.perf_counter()
+        token_counts = [count_tokens(text) for text in texts]
+        batches = batch_by_tokens(token_counts, self.max_batch_tokens, self.max_batch_size)
+        stats = EmbeddingStats(chunks=len(texts), tokens=sum(token_counts), batches=len(batches))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        embedded = 0
+
+        async def embed_batch(batch_texts: List[str]) -> List[List[float]]:
+            if client_async and hasattr(self.client, "aembed_documents"):
+                return await self.client.aembed_documents(batch_texts)
+            return await asyncio.to_thread(self.client.embed_documents, batch_texts)
+
+        async def run(batch: List[int]) -> None:
+            nonlocal embedded
+            async with semaphore:
+                batch_texts = [texts[i] for i in batch]
+                batch_vectors = await self._with_retry(lambda: embed_batch(batch_texts), stats)
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+            embedded += len(batch)
+            report_progress("embed", embedded, len(texts))
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        stats.seconds = time.perf_counter() - started
+        self.last_stats = stats
+        if texts:
+            record_embedding(getattr(self.client, "model", "unknown"), stats.chunks, stats.tokens, stats.seconds)
+            print(stats.summary())
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_all(texts, client_async=True)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Async clients keep connections bound to one event loop, so the sync path
+        # fans the client's sync method out over threads from a private loop instead
+        return run_sync(self._embed_all(texts, client_async=False))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if hasattr(self.client, "aembed_query"):
+            call = lambda: self.client.aembed_query(text)
+        else:
+            call = lambda: asyncio.to_thread(self.client.embed_query, text)
+        return await self._with_retry(call, EmbeddingStats())
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._with_retry_sync(lambda: self.client.embed_query(text), EmbeddingStats())
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed search queries in batched requests; OpenAI embeds a query exactly like a one-text document"""
+        return self.embed_documents(texts)
+
+@lru_cache(maxsize=2)
+def load_local_model(model_name_or_path: str, threads: int) -> Any:
+    """Load a sentence-transformers model once per process"""
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("EMBEDDING_BACKEND='local' requires sentence-transformers "
+                          "(pip install sentence-transformers)") from e
+    if threads:
+        torch.set_num_threads(threads)
+    print(f"Loading local embedding model: {model_name_or_path}")
+    return SentenceTransformer(model_name_or_path, device="cpu")
+
+class LocalEmbeddings(Embeddings):
+    """CPU sentence-transformers embeddings (default: MiniLM from download_model.py)
+
+    Texts are encoded in large batches straight into normalized NumPy arrays;
+    embed_array exposes them without a round trip through Python lists.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL,
+                 model_path: str = LOCAL_EMBEDDING_MODEL_PATH,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads: int = LOCAL_EMBEDDING_THREADS,
+                 float16: bool = LOCAL_EMBEDDING_FLOAT16):
+        # Prefer the copy saved by download_model.py so air-gapped hosts never hit the network
+        source = model_path if model_path and os.path.isdir(model_path) else model_name
+        self.model = load_local_model(source, threads)
+        self.batch_size = batch_size
+        self.dtype = np.float16 if float16 else np.float32
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return vectors.astype(self.dtype, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        started = time.perf_counter()
+        # Encode in slices of a few batches so progress can be reported between them
+        step = self.batch_size * 4
+        parts = []
+        for offset in range(0, len(texts), step):
+            parts.append(self.embed_array(texts[offset:offset + step]))
+            report_progress("embed", min(offset + step, len(texts)), len(texts))
+        vectors = np.concatenate(parts)
+        seconds = time.perf_counter() - started
+        record_embedding(LOCAL_EMBEDDING_MODEL, len(texts), 0, seconds)
+        print(f"Embedded {len(texts)} chunks locally in {seconds:.2f}s: {len(texts) / max(seconds, 1e-9):.1f} chunks/s")
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for several texts in one encode call"""
+        return self.embed_array(texts).tolist() if texts else []
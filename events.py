@@ -0,0 +1,14 @@
+from typing import Any
+
+# Tag for LLM calls whose tokens are not part of the answer (routing, summary partials);
+# LangGraph's "messages" stream skips runs carrying it
+NO_STREAM_TAG = "nostream"
+
+def emit_event(kind: str, **data: Any) -> None:
+    """Send a progress event to whoever is streaming the workflow; a no-op otherwise"""
+    from langgraph.config import get_stream_writer  # loaded with the workflow, not at import
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return  # called outside a workflow run (e.g. agents used directly)
+    writer({"event": kind, **data})
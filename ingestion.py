@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+from config import (
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_STRATEGY,
+    INGEST_CACHE_PATH, INGEST_MEMORY_CACHE_SIZE, VECTOR_INDEX_BACKEND, VECTOR_INDEX_DTYPE,
+    RETRIEVAL_MODE
+)
+from chunk_store import ChunkStore
+from document_processor import process_pdf
+from vector_store import create_vector_store, get_embeddings, embedding_signature, chunk_document_ids
+from vector_index import MmapVectorIndex
+from lexical_index import LexicalIndex
+from metrics import record_cache
+from retrieval import HybridRetriever
+from section_index import SectionIndex
+from risk_scanner import annotate_risks, rank_risky_chunks, taxonomy_signature
+
+# Bump whenever the chunk format changes so stale cache entries are ignored
+INGEST_FORMAT_VERSION = 3
+
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_INDEX_FILE = "lexical.npz"
+
+@dataclass
+class IngestedContract:
+    """A parsed and embedded contract, ready for querying"""
+    contract_id: str
+    content_hash: str
+    chunks: ChunkStore
+    vector_store: Any
+    from_cache: bool = False
+    lexical_index: Optional[LexicalIndex] = None
+    risk_ranking: List[int] = field(default_factory=list)
+    section_index: Optional[SectionIndex] = None
+    # Set when searches go to a collection shared by a document's revisions, which
+    # holds only the chunks of the revision synced last
+    collection_name: Optional[str] = None
+    stale: bool = False
+
+# Contracts already ingested by this process, most recently used last
+_loaded: "OrderedDict[str, IngestedContract]" = OrderedDict()
+# Held for every read and write of _loaded; background ingestion and eviction run in other threads
+_loaded_lock = threading.Lock()
+
+# Contracts by ID for workflow state, which references a contract instead of holding
+# it. Weak, so a contract lives only as long as a session or _loaded holds it.
+_registry: "weakref.WeakValueDictionary[str, IngestedContract]" = weakref.WeakValueDictionary()
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ingestion_config() -> Dict[str, Any]:
+    """Settings that change the chunks or their embeddings"""
+    return {
+        'chunk_size': CHUNK_SIZE,
+        'chunk_overlap': CHUNK_OVERLAP,
+        'chunking': CHUNKING_STRATEGY,
+        'embedding': embedding_signature(),
+        'format_version': INGEST_FORMAT_VERSION
+    }
+
+def ingestion_key(content_hash: str) -> str:
+    """Cache key: PDF content hash combined with the ingestion config"""
+    payload = json.dumps({'content_hash': content_hash, **ingestion_config()}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def collection_name_for(key: str, document_id: Optional[str] = None) -> str:
+    """Chroma collection name for an ingestion key, or for a named document across revisions"""
+    if document_id is None:
+        return f"contract_{key[:32]}"
+    # Revisions of one document share a collection per ingestion config, so
+    # only the chunks a redline touched need embedding
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "_", document_id).strip("_-")[:40] or "document"
+    config_hash = hashlib.sha256(json.dumps(ingestion_config(), sort_keys=True).encode("utf-8")).hexdigest()
+    return f"doc_{slug}_{config_hash[:8]}"
+
+def document_id_from_filename(filename: str) -> Optional[str]:
+    """Document ID for a file: its name without directory or extension, so re-uploads of a revision share a collection"""
+    return os.path.splitext(os.path.basename(filename))[0].strip() or None
+
+def _cache_dir(key: str) -> str:
+    return os.path.join(INGEST_CACHE_PATH, key)
+
+def _write_json(path: str, data: Any) -> None:
+    """Write JSON atomically so a crash never leaves a half-written file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+def read_manifest(key: str) -> Optional[Dict[str, Any]]:
+    """Manifest of a complete cache entry, or None"""
+    try:
+        with open(os.path.join(_cache_dir(key), MANIFEST_FILE), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def load_cached_chunks(key: str) -> Optional[List[Dict[str, Any]]]:
+    """Return cached chunks for a key, or None if there is no complete entry"""
+    manifest = read_manifest(key)
+    if manifest is None:
+        return None
+    try:
+        with open(os.path.join(_cache_dir(key), CHUNKS_FILE), encoding='utf-8') as file:
+            chunks = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable ingest cache entry {key[:12]}: {e}")
+        return None
+    if manifest.get('num_chunks') != len(chunks):
+        return None
+    return chunks
+
+def save_cached_chunks(key: str, content_hash: str, chunks: List[Dict[str, Any]],
+                       collection_name: str) -> None:
+    """Persist chunks; the manifest is written last and marks the entry complete"""
+    cache_dir = _cache_dir(key)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_json(os.path.join(cache_dir, CHUNKS_FILE), chunks)
+    _write_json(os.path.join(cache_dir, MANIFEST_FILE), {
+        'content_hash': content_hash,
+        'collection_name': collection_name,
+        'num_chunks': len(chunks),
+        'risk_taxonomy': taxonomy_signature(),
+        **ingestion_config()
+    })
+
+def mmap_index_path(key: str) -> str:
+    """Directory of the contract's memory-mapped vector index"""
+    return os.path.join(_cache_dir(key), f"index_{VECTOR_INDEX_DTYPE}")
+
+def build_mmap_index(key: str, chunks: List[Dict[str, Any]], vector_store: Any) -> MmapVectorIndex:
+    """Export the contract's vectors from Chroma into a memory-mapped index"""
+    print("Building memory-mapped vector index...")
+    return MmapVectorIndex.from_chroma(vector_store, mmap_index_path(key), chunk_document_ids(chunks),
+                                       dtype=VECTOR_INDEX_DTYPE)
+
+def load_lexical_index(key: str, chunks: List[Dict[str, Any]]) -> LexicalIndex:
+    """Load the contract's BM25 index, building and caching it if missing"""
+    path = os.path.join(_cache_dir(key), LEXICAL_INDEX_FILE)
+    if os.path.exists(path):
+        lexical_index = LexicalIndex.load(path)
+        if len(lexical_index) == len(chunks):
+            return lexical_index
+    lexical_index = LexicalIndex.build([chunk['content'] for chunk in chunks])
+    os.makedirs(_cache_dir(key), exist_ok=True)
+    lexical_index.save(path)
+    return lexical_index
+
+def parse_contract(pdf_path: str, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Parse a PDF into risk-annotated chunks (no embedding)"""
+    chunks = process_pdf(pdf_path, max_workers=max_workers)
+    annotate_risks(chunks)
+    return chunks
+
+def store_contract(key: str, content_hash: str, chunks: List[Dict[str, Any]],
+                   collection_name: str) -> Tuple[Any, LexicalIndex]:
+    """Embed freshly parsed chunks and write the cache entry and indexes; returns the vector store and BM25 index"""
+    vector_store = create_vector_store(chunks, COLLECTION_NAME=collection_name)
+    save_cached_chunks(key, content_hash, chunks, collection_name)
+    lexical_index = load_lexical_index(key, chunks)
+    if VECTOR_INDEX_BACKEND == "mmap":
+        vector_store = build_mmap_index(key, chunks, vector_store)
+    return vector_store, lexical_index
+
+def _finish(memo_key: str, key: str, content_hash: str, chunks: List[Dict[str, Any]],
+            vector_store: Any, from_cache: bool, shared_collection: Optional[str] = None,
+            synced: bool = False, lexical_index: Optional[LexicalIndex] = None) -> IngestedContract:
+    if lexical_index is None:
+        lexical_index = load_lexical_index(key, chunks)
+    risk_ranking, section_index = rank_risky_chunks(chunks), SectionIndex(chunks)
+    # From here on only the compact store is kept; the chunk dicts are dropped
+    store = ChunkStore.from_chunks(chunks)
+    if RETRIEVAL_MODE == "hybrid":
+        vector_store = HybridRetriever(vector_store, lexical_index, store)
+    searches_collection = shared_collection is not None and VECTOR_INDEX_BACKEND != "mmap"
+    contract = IngestedContract(key, content_hash, store, vector_store, from_cache, lexical_index,
+                                risk_ranking, section_index, shared_collection if searches_collection else None)
+    if synced and shared_collection is not None:
+        _invalidate_revisions(shared_collection, key)
+    register_contract(contract)
+    return _remember(memo_key, contract)
+
+def _invalidate_revisions(collection_name: str, key: str) -> None:
+    """After a shared collection is synced to revision key, mark other loaded revisions searching it stale"""
+    with _loaded_lock:
+        for memo_key in [memo_key for memo_key, contract in _loaded.items()
+                         if contract.collection_name == collection_name and contract.contract_id != key]:
+            del _loaded[memo_key]
+    for contract in list(_registry.values()):
+        if contract.collection_name == collection_name and contract.contract_id != key:
+            contract.stale = True
+
+def ensure_current(contract: IngestedContract) -> None:
+    """Re-sync a shared collection to this revision if another revision was synced since it loaded"""
+    if not contract.stale:
+        return
+    print(f"Collection {contract.collection_name} holds another revision; re-syncing it")
+    create_vector_store([dict(chunk) for chunk in contract.chunks], COLLECTION_NAME=contract.collection_name)
+    _invalidate_revisions(contract.collection_name, contract.contract_id)
+    contract.stale = False
+
+def register_contract(contract: IngestedContract) -> None:
+    """Make a contract resolvable by its ID from workflow state"""
+    _registry[contract.contract_id] = contract
+
+def get_contract(contract_id: str) -> IngestedContract:
+    """A registered contract that is still loaded; KeyError if it has been released"""
+    contract = _registry.get(contract_id)
+    if contract is None:
+        raise KeyError(f"Contract {contract_id[:12]} is not loaded")
+    return contract
+
+def forget_contract(contract_id: str) -> None:
+    """Drop a contract from the in-process cache (its disk cache entry stays)"""
+    with _loaded_lock:
+        for memo_key in [memo_key for memo_key, contract in _loaded.items() if contract.contract_id == contract_id]:
+            del _loaded[memo_key]
+
+def _remember(memo_key: str, contract: IngestedContract) -> IngestedContract:
+    with _loaded_lock:
+        _loaded[memo_key] = contract
+        _loaded.move_to_end(memo_key)
+        while len(_loaded) > INGEST_MEMORY_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return contract
+
+def _recall(memo_key: str) -> Optional[IngestedContract]:
+    """A contract this process already loaded under memo_key, or None"""
+    with _loaded_lock:
+        contract = _loaded.get(memo_key)
+        if contract is not None:
+            _loaded.move_to_end(memo_key)
+        return contract
+
+def ingest_contract(pdf_path: str, document_id: Optional[str] = None) -> IngestedContract:
+    """Parse and embed a PDF, reusing cached chunks and embeddings when the content is unchanged
+
+    Pass a stable document_id (e.g. "acme_msa") to keep successive revisions of a
+    contract in one collection that is updated incrementally.
+    """
+    content_hash = hash_file(pdf_path)
+    key = ingestion_key(content_hash)
+    collection_name = collection_name_for(key, document_id)
+    shared_collection = collection_name if document_id is not None else None
+    memo_key = f"{key}:{collection_name}"
+
+    contract = _recall(memo_key)
+    if contract is not None:
+        record_cache("ingest", "memory")
+        print("Using contract already loaded in memory.")
+        return contract
+
+    chunks = load_cached_chunks(key)
+    record_cache("ingest", "disk" if chunks is not None else "miss")
+    if chunks is None:
+        chunks = parse_contract(pdf_path)
+        vector_store, lexical_index = store_contract(key, content_hash, chunks, collection_name)
+        return _finish(memo_key, key, content_hash, chunks, vector_store, from_cache=False,
+                       shared_collection=shared_collection, synced=True, lexical_index=lexical_index)
+
+    print(f"Loaded {len(chunks)} cached chunks for {os.path.basename(pdf_path)}")
+    if (read_manifest(key) or {}).get('risk_taxonomy') != taxonomy_signature():
+        # Taxonomy changed since caching: re-scan text only, no re-parse or re-embed
+        annotate_risks(chunks)
+        save_cached_chunks(key, content_hash, chunks, collection_name)
+
+    # A complete mmap index already holds this contract's vectors: skip Chroma entirely
+    if VECTOR_INDEX_BACKEND == "mmap" and MmapVectorIndex.exists(mmap_index_path(key), expected_size=len(chunks)):
+        index = MmapVectorIndex(mmap_index_path(key), embedding_function=get_embeddings())
+        return _finish(memo_key, key, content_hash, chunks, index, from_cache=True,
+                       shared_collection=shared_collection)
+
+    # Embeds only chunks missing from the collection; a no-op when it is already in sync
+    vector_store = create_vector_store(chunks, COLLECTION_NAME=collection_name)
+    if VECTOR_INDEX_BACKEND == "mmap":
+        vector_store = build_mmap_index(key, chunks, vector_store)
+    return _finish(memo_key, key, content_hash, chunks, vector_store, from_cache=True,
+                   shared_collection=shared_collection, synced=True)
@@ -0,0 +1,104 @@
+import os
+import re
+from collections import Counter
+from typing import List, Dict, Tuple
+import numpy as np
+from config import BM25_K1, BM25_B
+
+# Words plus dotted/hyphenated terms, so "14.2" and "non-compete" stay single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms used for lexical indexing and querying"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class LexicalIndex:
+    """BM25 inverted index over chunk texts
+
+    Postings are stored CSR-style: one uint32 array of chunk positions and one
+    uint16 array of term frequencies, sliced per term through an offsets array.
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "LexicalIndex":
+        """Tokenize texts and build postings sorted by term"""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.uint32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        total = sum(len(postings[term]) for term in terms)
+        doc_ids = np.empty(total, dtype=np.uint32)
+        term_freqs = np.empty(total, dtype=np.uint16)
+        position = 0
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            doc_ids[position:position + len(entries)] = [doc_id for doc_id, _ in entries]
+            term_freqs[position:position + len(entries)] = [min(count, 65535) for _, count in entries]
+            position += len(entries)
+            offsets[i + 1] = position
+        return cls(terms, offsets, doc_ids, term_freqs, doc_lengths)
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, terms=np.array(self.terms, dtype=str), offsets=self.offsets,
+                 doc_ids=self.doc_ids, term_freqs=self.term_freqs, doc_lengths=self.doc_lengths)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(path) as data:
+            return cls(data['terms'].tolist(), data['offsets'], data['doc_ids'],
+                       data['term_freqs'], data['doc_lengths'])
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for the query"""
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        if not len(scores):
+            return scores
+        num_docs = len(self.doc_lengths)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float32)
+            idf = np.log(1.0 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (chunk position, BM25 score) pairs with a positive score, best first"""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        ranked = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
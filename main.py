@@ -1,39 +1,66 @@
-from document_processor import process_pdf
-from vector_store import create_vector_store
-from workflow import create_workflow, ContractState
+import argparse
+import json
+import sys
+from typing import List, Optional
+from config import BATCH_MAX_CONCURRENCY
 
-def analyze_contract(pdf_path: str, user_query: str) -> str:
+# The analysis stack (session, metrics) is imported inside the functions that use it,
+# so printing usage or parsing arguments does not load LangChain and friends
+
+def analyze_contract(pdf_path: str, user_query: str, document_id: Optional[str] = None) -> str:
     """Main function to analyze contract"""
+    from session import ContractSession
     print("🔄 Starting contract analysis...")
     
-    print("📄 Processing PDF...")
-    chunks = process_pdf(pdf_path)
-    
-    print("🗃️ Creating vector store...")
-    cname = pdf_path.split("/")[-1].replace(".pdf", "")
-    vector_store = create_vector_store(chunks, COLLECTION_NAME = cname)
-    
-    print("🔧 Setting up workflow...")
-    workflow = create_workflow()
+    print("📄 Loading contract (parsed chunks and embeddings are cached by content)...")
+    session = ContractSession(pdf_path, document_id=document_id)
     
     print(f"🤖 Analyzing query: '{user_query}'")
     
-    initial_state = ContractState(
-        user_query=user_query,
-        agent_type=None,
-        chunks=chunks,
-        vector_store=vector_store,
-        response=None,
-        messages=[]
-    )
-    
-    result = workflow.invoke(initial_state)
-    
-    return result["response"]
+    return session.ask(user_query)
+
+def read_queries(path: str) -> List[str]:
+    """One query per line; blank lines and lines starting with # are skipped"""
+    with open(path, encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+def run_batch(pdf_path: str, queries: List[str], output_path: str, max_concurrency: int,
+              document_id: Optional[str] = None) -> None:
+    """Answer all queries against one contract and write one JSON line per query, in input order"""
+    from metrics import get_metrics
+    from session import ContractSession
+    session = ContractSession(pdf_path, document_id=document_id)
+    results = session.ask_many(queries, max_concurrency=max_concurrency)
+    output = open(output_path, 'w', encoding='utf-8') if output_path != "-" else sys.stdout
+    try:
+        for result in results:
+            output.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    failed = sum(1 for result in results if result.error)
+    print(f"✅ {len(results) - failed}/{len(results)} queries answered", file=sys.stderr)
+    print(f"📦 Response cache: {session.cache_stats}", file=sys.stderr)
+    get_metrics().write_prometheus()
 
 def main():
     """Example usage"""
-    pdf_path = "/Users/sritejabanisetti/Desktop/work/langgraph/test_2025.pdf"  
+    parser = argparse.ArgumentParser(description="Contract Analysis System")
+    parser.add_argument("pdf_path", nargs="?", default="/Users/sritejabanisetti/Desktop/work/langgraph/test_2025.pdf")
+    parser.add_argument("--queries-file", help="run a batch: one query per line")
+    parser.add_argument("--output", default="-", help="JSONL output for --queries-file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY,
+                        help="queries analysed at once in batch mode")
+    parser.add_argument("--document-id", help="stable name for the contract; revisions with the same ID share "
+                                              "one collection, so only changed clauses are embedded")
+    args = parser.parse_args()
+    pdf_path = args.pdf_path
+    from metrics import get_metrics
+    from session import ContractSession
+    
+    if args.queries_file:
+        run_batch(pdf_path, read_queries(args.queries_file), args.output, args.concurrency, args.document_id)
+        return
     
     queries = [
         #"Give me an executive summary of this contract",
@@ -45,15 +72,33 @@ def main():
     print("🚀 Contract Analysis System")
     print("=" * 50)
     
+    # Open the contract once; every query reuses its chunks, index and workflow
+    print("📄 Loading contract...")
+    session = ContractSession(pdf_path, document_id=args.document_id)
+    
     for query in queries:
         print(f"\n💬 Query: {query}")
         print("-" * 30)
         try:
-            response = analyze_contract(pdf_path, query)
-            print(response)
+            # Print the answer as it is generated
+            for event in session.stream(query):
+                if event["event"] == "route":
+                    print(f"🤖 Agent: {event['agent_type']}")
+                elif event["event"] == "token":
+                    print(event["text"], end="", flush=True)
+                elif event["event"] == "done":
+                    source = f" (cached, {event['cached']} match)" if event["cached"] else ""
+                    print(f"\n\n⏱️ First token after {event['time_to_first_token'] or 0:.2f}s, "
+                          f"complete after {event['seconds']:.2f}s{source}")
+                    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in event["metrics"]["stages"].items())
+                    print(f"📊 {stages or 'no timed stages'}; {event['metrics']['prompt_tokens']} prompt + "
+                          f"{event['metrics']['completion_tokens']} completion tokens, ~${event['metrics']['cost_usd']:.4f}")
         except Exception as e:
             print(f"❌ Error: {e}")
         print("\n" + "="*50)
+    
+    print(f"📦 Response cache: {session.cache_stats}")
+    get_metrics().write_prometheus()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
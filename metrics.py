@@ -0,0 +1,286 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from config import METRICS_JSONL_PATH, METRICS_PROMETHEUS_PATH, MODEL_PRICING_PER_MILLION
+from token_counter import count_tokens
+
+# Workflow node currently running in this context; labels LLM calls and retrievals
+_current_node: ContextVar[Optional[str]] = ContextVar("current_node", default=None)
+# Events recorded while a capture() block is active in this context
+_captured: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("captured_metrics", default=None)
+
+# name -> (Prometheus type, help text)
+METRIC_HELP = {
+    'contract_stage_seconds': ("summary", "Wall time per pipeline stage"),
+    'contract_node_seconds': ("summary", "Wall time per workflow node"),
+    'contract_llm_calls_total': ("counter", "LLM calls"),
+    'contract_llm_tokens_total': ("counter", "LLM tokens by kind (prompt/completion)"),
+    'contract_llm_cost_usd_total': ("counter", "Estimated LLM and embedding cost in USD"),
+    'contract_retrievals_total': ("counter", "Retrieval calls"),
+    'contract_retrieval_hits_total': ("counter", "Chunks returned by retrieval"),
+    'contract_cache_lookups_total': ("counter", "Cache lookups by cache and result"),
+    'contract_speculations_total': ("counter", "Speculative retrievals by outcome (used/wasted/failed) and route"),
+    'contract_speculation_wait_seconds': ("summary", "Wait for a used speculative retrieval after routing"),
+}
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int = 0) -> float:
+    """USD cost from MODEL_PRICING_PER_MILLION; 0 for unpriced (e.g. local) models"""
+    prices = MODEL_PRICING_PER_MILLION.get(model)
+    if prices is None:
+        return 0.0
+    return (prompt_tokens * prices['prompt'] + completion_tokens * prices.get('completion', 0.0)) / 1_000_000
+
+def current_node() -> str:
+    return _current_node.get() or "none"
+
+class Metrics:
+    """Process-wide aggregates plus a JSON-lines event log
+
+    Every record() call updates the Prometheus aggregates, appends the event to
+    METRICS_JSONL_PATH (if set) and to any capture() block active in the
+    calling context, which is how one query's breakdown is collected.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = METRICS_JSONL_PATH):
+        self.jsonl_path = jsonl_path
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self.llm_callback = LLMMetricsCallback(self)
+
+    def _add(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def _observe(self, name: str, seconds: float, **labels: str) -> None:
+        self._add(f"{name}_sum", seconds, **labels)
+        self._add(f"{name}_count", 1, **labels)
+
+    def record(self, event: Dict[str, Any]) -> None:
+        event = {'ts': round(time.time(), 3), **event}
+        kind = event['type']
+        with self._lock:
+            if kind == 'stage':
+                self._observe('contract_stage_seconds', event['seconds'], stage=event['stage'])
+            elif kind == 'node':
+                self._observe('contract_node_seconds', event['seconds'], node=event['node'])
+            elif kind == 'llm':
+                self._observe('contract_stage_seconds', event['seconds'], stage='llm')
+                self._add('contract_llm_calls_total', 1, agent=event['agent'], model=event['model'])
+                self._add('contract_llm_tokens_total', event['prompt_tokens'], agent=event['agent'], kind='prompt')
+                self._add('contract_llm_tokens_total', event['completion_tokens'], agent=event['agent'], kind='completion')
+                self._add('contract_llm_cost_usd_total', event['cost_usd'], agent=event['agent'])
+            elif kind == 'embedding':
+                self._observe('contract_stage_seconds', event['seconds'], stage='embed')
+                self._add('contract_llm_cost_usd_total', event['cost_usd'], agent='embedding')
+            elif kind == 'retrieval':
+                self._add('contract_retrievals_total', 1, agent=event['agent'])
+                self._add('contract_retrieval_hits_total', event['hits'], agent=event['agent'])
+            elif kind == 'cache':
+                self._add('contract_cache_lookups_total', 1, cache=event['cache'], result=event['result'])
+            elif kind == 'speculation':
+                self._add('contract_speculations_total', 1, outcome=event['outcome'], route=event['route'])
+                if event['outcome'] == 'used':
+                    self._observe('contract_speculation_wait_seconds', event['wait_seconds'], route=event['route'])
+            if self.jsonl_path:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+                    self._file = open(self.jsonl_path, 'a', encoding='utf-8', buffering=1)
+                self._file.write(json.dumps(event) + "\n")
+        captured = _captured.get()
+        if captured is not None:
+            captured.append(event)
+
+    def prometheus_text(self) -> str:
+        """Snapshot of all aggregates in the Prometheus text exposition format"""
+        with self._lock:
+            values = dict(self._values)
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            series = sorted((key, value) for key, value in values.items()
+                            if key[0] in (name, f"{name}_sum", f"{name}_count"))
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (series_name, labels), value in series:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{series_name}{{{label_text}}} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = METRICS_PROMETHEUS_PATH) -> None:
+        """Write the snapshot atomically (for the node_exporter textfile collector)"""
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Times every chat-model call and records its token usage and estimated cost"""
+    run_inline = True  # stay in the caller's context so the current node is visible
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._runs: Dict[Any, Tuple[float, str, str, int]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *,
+                            run_id: Any, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        params = kwargs.get('invocation_params') or {}
+        model = params.get('model') or params.get('model_name') or "unknown"
+        agent = (metadata or {}).get('agent') or _current_node.get() or (metadata or {}).get('langgraph_node') or "none"
+        prompt_estimate = sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        self._runs[run_id] = (time.perf_counter(), agent, model, prompt_estimate)
+
+    def on_llm_end(self, response: Any, *, run_id: Any, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, agent, model, prompt_estimate = run
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens is None:
+            # No usage reported (e.g. streamed without usage): estimate from the text
+            text = "".join(generation.text for batch in response.generations for generation in batch)
+            prompt_tokens, completion_tokens = prompt_estimate, count_tokens(text) if text else 0
+        self.metrics.record({
+            'type': 'llm', 'agent': agent, 'model': model,
+            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'cost_usd': round(estimate_cost(model, prompt_tokens, completion_tokens), 6),
+            'seconds': round(time.perf_counter() - started, 4)
+        })
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+def _token_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    usage = (response.llm_output or {}).get('token_usage') or {}
+    if usage.get('prompt_tokens') is not None:
+        return usage['prompt_tokens'], usage.get('completion_tokens', 0)
+    for batch in response.generations:
+        for generation in batch:
+            metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if metadata:
+                return metadata.get('input_tokens', 0), metadata.get('output_tokens', 0)
+    return None, None
+
+@lru_cache(maxsize=1)
+def get_metrics() -> Metrics:
+    """Process-wide metrics collector"""
+    return Metrics()
+
+@contextmanager
+def timed(stage: str, **fields: Any) -> Iterator[None]:
+    """Record the wall time of the enclosed block as a pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_metrics().record({'type': 'stage', 'stage': stage, 'node': current_node(),
+                              'seconds': round(time.perf_counter() - started, 4), **fields})
+
+def record_retrieval(hits: int) -> None:
+    get_metrics().record({'type': 'retrieval', 'agent': current_node(), 'hits': hits})
+
+def record_cache(cache: str, result: str) -> None:
+    """result is "hit"/"miss" (or the kind of hit, e.g. "exact"/"semantic")"""
+    get_metrics().record({'type': 'cache', 'cache': cache, 'result': result})
+
+def record_speculation(outcome: str, route: str, wait_seconds: float = 0.0) -> None:
+    """outcome is "used", "wasted" or "failed"
+
+    route is the agent picked, or "cached" / "section_index" when no agent retrieves.
+    """
+    get_metrics().record({'type': 'speculation', 'outcome': outcome, 'route': route,
+                          'wait_seconds': round(wait_seconds, 4)})
+
+def record_embedding(model: str, texts: int, tokens: int, seconds: float) -> None:
+    get_metrics().record({'type': 'embedding', 'model': model, 'texts': texts, 'tokens': tokens,
+                          'cost_usd': round(estimate_cost(model, tokens), 6), 'seconds': round(seconds, 4)})
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a workflow node (sync or async) to time it and label the calls it makes"""
+    def finish(token: Any, started: float) -> None:
+        _current_node.reset(token)
+        get_metrics().record({'type': 'node', 'node': name, 'seconds': round(time.perf_counter() - started, 4)})
+
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+            token, started = _current_node.set(name), time.perf_counter()
+            try:
+                return await node(state)
+            finally:
+                finish(token, started)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+        token, started = _current_node.set(name), time.perf_counter()
+        try:
+            return node(state)
+        finally:
+            finish(token, started)
+    return wrapper
+
+@contextmanager
+def capture(events: Optional[List[Dict[str, Any]]] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Collect the events recorded in this context (and threads/tasks started from it)"""
+    events = [] if events is None else events
+    token = _captured.set(events)
+    try:
+        yield events
+    finally:
+        _captured.reset(token)
+
+def capture_iter(iterable: Iterable[Any], events: List[Dict[str, Any]]) -> Iterator[Any]:
+    """Iterate, capturing events recorded while producing each item
+
+    Unlike wrapping a generator body in capture(), this is safe when the
+    consumer stops early or resumes the generator from another context.
+    """
+    iterator = iter(iterable)
+    while True:
+        with capture(events):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def stage_breakdown(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-stage seconds, node seconds, tokens, cost, retrieval hits, cache results and speculation outcomes"""
+    summary: Dict[str, Any] = {'stages': {}, 'nodes': {}, 'prompt_tokens': 0, 'completion_tokens': 0,
+                               'cost_usd': 0.0, 'llm_calls': 0, 'retrieval_hits': 0, 'cache': {}, 'speculation': {}}
+    for event in events:
+        kind = event['type']
+        if kind in ('stage', 'llm', 'embedding'):
+            stage = {'llm': 'llm', 'embedding': 'embed'}.get(kind, event.get('stage'))
+            summary['stages'][stage] = summary['stages'].get(stage, 0.0) + event['seconds']
+        if kind == 'node':
+            summary['nodes'][event['node']] = summary['nodes'].get(event['node'], 0.0) + event['seconds']
+        elif kind == 'llm':
+            summary['llm_calls'] += 1
+            summary['prompt_tokens'] += event['prompt_tokens']
+            summary['completion_tokens'] += event['completion_tokens']
+            summary['cost_usd'] += event['cost_usd']
+        elif kind == 'embedding':
+            summary['cost_usd'] += event['cost_usd']
+        elif kind == 'retrieval':
+            summary['retrieval_hits'] += event['hits']
+        elif kind == 'cache':
+            key = f"{event['cache']}:{event['result']}"
+            summary['cache'][key] = summary['cache'].get(key, 0) + 1
+        elif kind == 'speculation':
+            summary['speculation'][event['outcome']] = summary['speculation'].get(event['outcome'], 0) + 1
+    summary['cost_usd'] = round(summary['cost_usd'], 6)
+    return summary
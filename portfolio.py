@@ -0,0 +1,415 @@
+"""Search and question answering across every ingested contract"""
+import argparse
+import csv
+import heapq
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from config import (
+    PORTFOLIO_CATALOG_PATH, PORTFOLIO_SEARCH_WORKERS, PORTFOLIO_OPEN_SHARDS, PORTFOLIO_TOP_K
+)
+from metrics import timed
+from vector_index import DOCUMENTS_FILE, VECTORS_FILE, MmapVectorIndex
+
+MONTHS = "January|February|March|April|May|June|July|August|September|October|November|December"
+DATE_FORMATS = [
+    (re.compile(r"\b(\d{4}-\d{2}-\d{2})\b"), "%Y-%m-%d"),
+    (re.compile(rf"\b((?:{MONTHS}) \d{{1,2}}, \d{{4}})\b"), "%B %d, %Y"),
+    (re.compile(rf"\b(\d{{1,2}} (?:{MONTHS}) \d{{4}})\b"), "%d %B %Y"),
+]
+EFFECTIVE_CUE = re.compile(r"\b(?:effective|dated|as of|commenc\w*)\b", re.IGNORECASE)
+CONTRACT_TITLE = re.compile(r"^\s*([A-Z][A-Za-z&\- ]{0,60}?\b(?:AGREEMENT|Agreement|CONTRACT|Contract|LEASE|Lease))\b",
+                            re.MULTILINE)
+PARTIES = re.compile(r"\bbetween\s+(.+?)\s+and\s+(.+?)(?:\.\s|\n\n|$)", re.IGNORECASE | re.DOTALL)
+METADATA_HEAD_CHARS = 3000  # metadata is read from the start of the contract
+CLI_DESCRIPTION = """Search and answer questions across every ingested contract.
+
+Each catalogued contract is one shard: its memory-mapped embedding matrix from
+the ingestion cache. A query is embedded once, metadata filters narrow the
+shards, and the rest are scored in parallel and merged into one global top k.
+The rag_qa and clause_finder agents answer from the hits, citing each one as
+[contract:chunk_id].
+
+    python portfolio.py index ./contracts --metadata contracts.csv
+    python portfolio.py ask "Which contracts have uncapped indemnification?" --where contract_type=services
+"""
+
+@dataclass
+class ContractRecord:
+    """One catalogued contract: its ingestion key, name and searchable metadata"""
+    contract_id: str
+    name: str
+    path: str
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class PortfolioHit:
+    """A chunk of one contract matching a portfolio query"""
+    contract_id: str
+    name: str
+    position: int
+    similarity: float  # cosine similarity to the query, higher is better
+
+def _parse_date(text: str) -> Optional[str]:
+    """ISO date of the first date in text, or None"""
+    found = []
+    for pattern, date_format in DATE_FORMATS:
+        match = pattern.search(text)
+        if match:
+            try:
+                found.append((match.start(), datetime.strptime(match.group(1), date_format).date().isoformat()))
+            except ValueError:
+                continue
+    return min(found)[1] if found else None
+
+def _party_name(text: str) -> str:
+    name = re.split(r",|\(|\n", text, maxsplit=1)[0]
+    return name.strip().strip("\"“”'").strip()
+
+def extract_metadata(chunks: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Best-effort contract_type, parties and effective_date from the opening text
+
+    Fields that cannot be found are left out; catalogue metadata supplied by the
+    user always takes precedence.
+    """
+    head = "\n".join(chunk['content'] for chunk in chunks[:5])[:METADATA_HEAD_CHARS]
+    metadata = {}
+    title = CONTRACT_TITLE.search(head)
+    if title:
+        metadata['contract_type'] = " ".join(title.group(1).lower().split())
+    parties = PARTIES.search(head)
+    if parties:
+        names = [_party_name(parties.group(1)), _party_name(parties.group(2))]
+        metadata['parties'] = "; ".join(name for name in names if name)
+    cue = EFFECTIVE_CUE.search(head)
+    date = _parse_date(head[cue.start():cue.start() + 200]) if cue else None
+    date = date or _parse_date(head)
+    if date:
+        metadata['effective_date'] = date
+    return metadata
+
+def read_catalog(path: str = PORTFOLIO_CATALOG_PATH) -> Dict[str, ContractRecord]:
+    """Catalogued contracts by ID; later lines replace earlier ones for the same contract"""
+    records: Dict[str, ContractRecord] = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = ContractRecord(**json.loads(line))
+            except (ValueError, TypeError):
+                continue  # a line cut short by a crash
+            records[record.contract_id] = record
+    return records
+
+def add_to_catalog(records: List[ContractRecord], path: str = PORTFOLIO_CATALOG_PATH) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+
+def read_metadata_file(path: str) -> Dict[str, Dict[str, str]]:
+    """Per-file metadata from a CSV with a "file" column (file name or path) and one column per field"""
+    with open(path, encoding='utf-8', newline="") as file:
+        rows = list(csv.DictReader(file))
+    return {os.path.basename(row.pop('file')): {key: value for key, value in row.items() if value} for row in rows}
+
+def matches(record: ContractRecord, filters: Dict[str, str]) -> bool:
+    """True if the record passes every filter
+
+    date_from/date_to bound effective_date (ISO dates, inclusive). Any other
+    field matches when the filter value occurs in it, ignoring case. counterparty
+    falls back to the extracted parties.
+    """
+    for name, wanted in filters.items():
+        if name in ('date_from', 'date_to'):
+            date = record.metadata.get('effective_date')
+            if not date or (name == 'date_from' and date < wanted) or (name == 'date_to' and date > wanted):
+                return False
+            continue
+        value = record.metadata.get(name)
+        if value is None and name == 'counterparty':
+            value = record.metadata.get('parties')
+        if value is None or wanted.lower() not in value.lower():
+            return False
+    return True
+
+class Shard:
+    """One contract's normalized embedding matrix, memory-mapped; texts are read when the contract first has a hit"""
+    __slots__ = ('record', 'path', 'vectors', 'texts', 'metadatas')
+
+    def __init__(self, record: ContractRecord, path: str):
+        self.record = record
+        self.path = path
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+        self.texts: Optional[List[str]] = None
+        self.metadatas: Optional[List[Dict[str, Any]]] = None
+
+    def document(self, row: int) -> Document:
+        """The chunk stored at row; the index's documents are parsed once and kept while the shard is open"""
+        if self.texts is None:
+            with open(os.path.join(self.path, DOCUMENTS_FILE), encoding='utf-8') as file:
+                data = json.load(file)
+            self.texts, self.metadatas = data['texts'], data['metadatas']
+        return Document(page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """Top-k (similarity, row), best first"""
+        if len(self.vectors) == 0:
+            return []
+        similarities = np.asarray(self.vectors @ query, dtype=np.float32)
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(k)
+        top = top[np.argsort(-similarities[top])]
+        return [(float(similarities[row]), int(row)) for row in top]
+
+def _push_best(heap: List[Tuple[float, str, int]], hits: List[Tuple[float, int]], contract_id: str, k: int) -> None:
+    """Add a shard's best-first hits to a min-heap holding the k best overall"""
+    for similarity, row in hits:
+        item = (similarity, contract_id, row)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        else:
+            break  # the rest of this shard scores lower still
+
+def open_shard_limit(requested: int = PORTFOLIO_OPEN_SHARDS) -> int:
+    """requested, capped at half the soft open-file limit, since each open shard's memory map holds a descriptor"""
+    try:
+        import resource  # Unix only
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, OSError, ValueError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft // 2))
+
+class PortfolioIndex:
+    """Catalogued contracts searched as shards, with open shards cached between queries"""
+
+    def __init__(self, catalog_path: str = PORTFOLIO_CATALOG_PATH, workers: int = PORTFOLIO_SEARCH_WORKERS,
+                 max_open_shards: int = PORTFOLIO_OPEN_SHARDS):
+        self.records = read_catalog(catalog_path)
+        self.workers = workers
+        self.max_open_shards = open_shard_limit(max_open_shards)
+        self.shards: "OrderedDict[str, Shard]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portfolio")
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def select(self, filters: Optional[Dict[str, str]] = None) -> List[ContractRecord]:
+        return [record for record in self.records.values() if matches(record, filters or {})]
+
+    def shard(self, record: ContractRecord, keep: bool = True) -> Optional[Shard]:
+        """The contract's open shard, or None if it has no vector index under the current config
+
+        With keep=False a shard that is not already open is opened for this call
+        only, so a scan over more shards than the cache holds does not evict the
+        shards that later queries reuse.
+        """
+        from ingestion import mmap_index_path
+        with self.lock:
+            shard = self.shards.get(record.contract_id)
+            if shard is not None:
+                self.shards.move_to_end(record.contract_id)
+                return shard
+        path = mmap_index_path(record.contract_id)
+        if not MmapVectorIndex.exists(path):
+            return None
+        shard = Shard(record, path)
+        if not keep:
+            return shard
+        with self.lock:
+            self.shards[record.contract_id] = shard
+            while len(self.shards) > self.max_open_shards:
+                self.shards.popitem(last=False)
+        return shard
+
+    def _search_group(self, records: List[ContractRecord], query: np.ndarray, k: int,
+                      keep: bool) -> List[Tuple[float, str, int]]:
+        heap: List[Tuple[float, str, int]] = []
+        for record in records:
+            shard = self.shard(record, keep)
+            if shard is not None:
+                _push_best(heap, shard.search(query, k), record.contract_id, k)
+        return heap
+
+    def search_by_vector(self, query_vector: List[float], k: int = PORTFOLIO_TOP_K,
+                         filters: Optional[Dict[str, str]] = None) -> List[PortfolioHit]:
+        """Global top-k chunks over every contract passing the filters, best first"""
+        records = self.select(filters)
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        # A scan wider than the cache would only cycle shards through it; open the extra ones transiently
+        keep = len(records) <= self.max_open_shards
+        # One task per worker over an interleaved slice of the shards, not one per shard
+        groups = [records[i::self.workers] for i in range(min(self.workers, len(records)))]
+        heap: List[Tuple[float, str, int]] = []
+        for group_heap in self.executor.map(lambda group: self._search_group(group, query, k, keep), groups):
+            for similarity, contract_id, row in group_heap:
+                _push_best(heap, [(similarity, row)], contract_id, k)
+        return [PortfolioHit(contract_id, self.records[contract_id].name, row, similarity)
+                for similarity, contract_id, row in sorted(heap, reverse=True)]
+
+    def search(self, query: str, k: int = PORTFOLIO_TOP_K,
+               filters: Optional[Dict[str, str]] = None) -> List[PortfolioHit]:
+        from vector_store import get_embeddings
+        return self.search_by_vector(get_embeddings().embed_query(query), k, filters)
+
+    def documents(self, hits: List[PortfolioHit]) -> List[Tuple[Document, float]]:
+        """Hits as (Document, similarity); chunk IDs carry the contract name for citations
+
+        Texts come from the hit shards' own stored documents, which stay cached
+        with the open shard, so repeated queries do not re-read the contracts.
+        """
+        results = []
+        for hit in hits:
+            shard = self.shard(self.records[hit.contract_id])
+            if shard is None or hit.position >= len(shard.vectors):
+                continue
+            document = shard.document(hit.position)
+            # No start_index: offsets from different contracts must never be merged
+            document.metadata.update(chunk_id=f"{contract_label(hit.name)}:{document.metadata['chunk_id']}",
+                                     contract_id=hit.contract_id, contract=hit.name)
+            results.append((document, hit.similarity))
+        return results
+
+def contract_label(name: str) -> str:
+    """Short citation label for a contract file"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+class PortfolioRetriever:
+    """A filtered portfolio exposed like a vector store, so the agents search it unchanged"""
+
+    def __init__(self, index: PortfolioIndex, filters: Optional[Dict[str, str]] = None):
+        self.index = index
+        self.filters = filters or {}
+
+    @property
+    def embeddings(self) -> Any:
+        from vector_store import get_embeddings
+        return get_embeddings()
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return self.index.documents(self.index.search_by_vector(embedding, k, self.filters))
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k)
+
+@dataclass
+class PortfolioAnswer:
+    """Answer to a portfolio question and the contracts it drew on"""
+    query: str
+    agent_type: str
+    response: str
+    contracts: List[Dict[str, Any]]  # name, contract_id, best similarity and cited chunk IDs, best first
+    searched: int  # contracts that passed the filters
+
+def _contracts_of(results: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+    contracts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for document, similarity in results:
+        entry = contracts.setdefault(document.metadata['contract_id'], {
+            'name': document.metadata['contract'], 'contract_id': document.metadata['contract_id'],
+            'similarity': round(similarity, 4), 'chunk_ids': []
+        })
+        entry['chunk_ids'].append(document.metadata['chunk_id'])
+    return list(contracts.values())
+
+def ask_portfolio(query: str, index: PortfolioIndex, filters: Optional[Dict[str, str]] = None,
+                  k: int = PORTFOLIO_TOP_K, agent_type: Optional[str] = None) -> PortfolioAnswer:
+    """Answer a question across the portfolio with clause_finder or rag_qa, citing each contract
+
+    Summaries and risk reviews cover one whole contract, so portfolio questions
+    routed to them are answered by rag_qa from the best hits instead.
+    """
+    from agents import RAG_QA_K, CLAUSE_FINDER_K, rag_qa_agent, clause_finder_agent
+    from retrieval import PrefetchedRetriever
+    from router import route_query
+    agent_type = 'clause_finder' if (agent_type or route_query(query)) == 'clause_finder' else 'rag_qa'
+    retriever = PortfolioRetriever(index, filters)
+    searched = len(index.select(filters))
+    k = max(k, RAG_QA_K, CLAUSE_FINDER_K)
+    with timed("retrieve", contracts=searched):
+        results = retriever.similarity_search_with_score(query, k=k)
+    prefetched = PrefetchedRetriever(retriever, {query: results}, k)
+    if agent_type == 'clause_finder':
+        response = clause_finder_agent(query, prefetched)
+    else:
+        response = rag_qa_agent(query, prefetched)
+    return PortfolioAnswer(query, agent_type, response, _contracts_of(results), searched)
+
+def index_directory(root: str, metadata_path: Optional[str] = None, workers: Optional[int] = None,
+                    catalog_path: str = PORTFOLIO_CATALOG_PATH) -> List[ContractRecord]:
+    """Ingest every PDF under root, build each contract's shard and catalogue it with its metadata"""
+    from bulk_ingest import bulk_ingest, find_pdfs
+    from ingestion import (
+        hash_file, ingestion_key, collection_name_for, load_cached_chunks, mmap_index_path, build_mmap_index
+    )
+    from vector_store import load_vector_store
+    bulk_ingest(root, workers=workers)
+    supplied = read_metadata_file(metadata_path) if metadata_path else {}
+    records = []
+    for path in find_pdfs(root):
+        key = ingestion_key(hash_file(path))
+        chunks = load_cached_chunks(key)
+        if chunks is None:
+            print(f"Skipping {path}: not ingested")
+            continue
+        if not MmapVectorIndex.exists(mmap_index_path(key), expected_size=len(chunks)):
+            build_mmap_index(key, chunks, load_vector_store(collection_name_for(key)))
+        metadata = {**extract_metadata(chunks), **supplied.get(os.path.basename(path), {})}
+        records.append(ContractRecord(key, os.path.basename(path), os.path.abspath(path), metadata))
+    add_to_catalog(records, catalog_path)
+    print(f"Catalogued {len(records)} contracts in {catalog_path}")
+    return records
+
+def parse_filters(where: List[str], since: Optional[str], until: Optional[str]) -> Dict[str, str]:
+    filters = dict(condition.split("=", 1) for condition in where)
+    if since:
+        filters['date_from'] = since
+    if until:
+        filters['date_to'] = until
+    return filters
+
+def main():
+    parser = argparse.ArgumentParser(description=CLI_DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_command = commands.add_parser("index", help="ingest a directory of PDFs and catalogue them")
+    index_command.add_argument("root")
+    index_command.add_argument("--metadata", help="CSV with a \"file\" column and one column per field")
+    index_command.add_argument("--workers", type=int, default=None, help="parser processes")
+    ask_command = commands.add_parser("ask", help="answer a question across the catalogued contracts")
+    ask_command.add_argument("query")
+    ask_command.add_argument("--where", action="append", default=[], metavar="FIELD=VALUE",
+                             help="metadata filter, e.g. counterparty=Acme (repeatable)")
+    ask_command.add_argument("--since", help="effective on or after this ISO date")
+    ask_command.add_argument("--until", help="effective on or before this ISO date")
+    ask_command.add_argument("--k", type=int, default=PORTFOLIO_TOP_K, help="hits across all contracts")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        index_directory(args.root, args.metadata, args.workers)
+        return
+    index = PortfolioIndex()
+    answer = ask_portfolio(args.query, index, parse_filters(args.where, args.since, args.until), args.k)
+    print(f"🔎 {answer.searched} of {len(index)} contracts searched; matches in {len(answer.contracts)}:")
+    for contract in answer.contracts:
+        print(f"  {contract['name']} (similarity {contract['similarity']:.2f}): {', '.join(contract['chunk_ids'])}")
+    print(f"\n🤖 Agent: {answer.agent_type}\n{answer.response}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Progress reporting for long-running ingestion stages"""
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+ProgressCallback = Callable[[str, int, int], None]
+
+_listener: contextvars.ContextVar[Optional[ProgressCallback]] = contextvars.ContextVar("progress_listener", default=None)
+
+@contextmanager
+def progress_listener(callback: ProgressCallback) -> Iterator[None]:
+    """Send progress reports made in this context to callback(stage, done, total)"""
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+def report_progress(stage: str, done: int, total: int) -> None:
+    """Report that done of total units of stage ("parse", "split", "embed") are finished"""
+    callback = _listener.get()
+    if callback is not None:
+        callback(stage, done, total)
@@ -0,0 +1,166 @@
+"""Answer a stream of contract questions concurrently, without a UI.
+
+Reads JSON lines with "pdf_path" and "query" (and optionally "id" and
+"document_id", which keeps revisions of one contract in one collection), runs up to
+--concurrency analyses at once on one event loop, and writes one JSON line per
+result in completion order. Reading pauses while --queue-size requests are
+waiting, so memory stays bounded however large the input is.
+
+    python queue_runner.py requests.jsonl --concurrency 16 --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, Dict, Any, Awaitable, Callable, Iterable, Iterator, Optional, Tuple
+from config import QUEUE_MAX_CONCURRENCY, QUEUE_MAX_PENDING, INGEST_MEMORY_CACHE_SIZE
+from warmup import start_warm_up
+
+# The analysis stack is imported when the first contract is opened, so --help
+# and argument errors return at once and the warm-up starts sooner
+if TYPE_CHECKING:
+    from session import ContractSession
+
+@dataclass
+class AnalysisRequest:
+    """One question about one contract"""
+    request_id: str
+    pdf_path: str
+    query: str
+    document_id: Optional[str] = None
+
+@dataclass
+class AnalysisResult:
+    """Outcome of one request"""
+    request_id: str
+    pdf_path: str
+    query: str
+    response: Optional[str]
+    seconds: float
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class QueueStats:
+    """Throughput of one run"""
+    completed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.completed / self.seconds if self.seconds else 0.0
+
+class SessionPool:
+    """Opens each contract once and shares the session between concurrent requests"""
+
+    def __init__(self, max_sessions: int = INGEST_MEMORY_CACHE_SIZE):
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[Tuple[str, Optional[str]], ContractSession]" = OrderedDict()
+        self.locks: Dict[Tuple[str, Optional[str]], asyncio.Lock] = {}
+
+    async def get(self, pdf_path: str, document_id: Optional[str] = None) -> "ContractSession":
+        from session import ContractSession
+        key = (pdf_path, document_id)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self.sessions:
+                # Ingestion parses and embeds in worker threads/processes; keep the loop free
+                self.sessions[key] = await asyncio.to_thread(ContractSession, pdf_path, document_id)
+                if len(self.sessions) > self.max_sessions:
+                    evicted, _ = self.sessions.popitem(last=False)
+                    self.locks.pop(evicted, None)
+            self.sessions.move_to_end(key)
+            return self.sessions[key]
+
+async def process_requests(requests: Iterable[AnalysisRequest],
+                           handle: Callable[[AnalysisRequest], Awaitable[str]],
+                           on_result: Callable[[AnalysisResult], None],
+                           max_concurrency: int = QUEUE_MAX_CONCURRENCY,
+                           max_pending: int = QUEUE_MAX_PENDING) -> QueueStats:
+    """Run handle over requests with at most max_concurrency in flight
+
+    Requests are pulled from the iterable only while fewer than max_pending are
+    queued, so a slow backend throttles the reader instead of growing memory.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    stats = QueueStats()
+    started = time.perf_counter()
+
+    async def worker() -> None:
+        while True:
+            request = await queue.get()
+            if request is None:
+                return
+            request_started = time.perf_counter()
+            try:
+                response = await handle(request)
+                result = AnalysisResult(request.request_id, request.pdf_path, request.query,
+                                        response, time.perf_counter() - request_started)
+                stats.completed += 1
+            except Exception as e:
+                result = AnalysisResult(request.request_id, request.pdf_path, request.query,
+                                        None, time.perf_counter() - request_started, str(e))
+                stats.failed += 1
+            on_result(result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, max_concurrency))]
+    for request in requests:
+        await queue.put(request)  # waits while the queue is full
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+def read_requests(lines: Iterable[str]) -> Iterator[AnalysisRequest]:
+    """Parse request JSON lines lazily; blank lines are skipped"""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield AnalysisRequest(str(record.get('id', number)), record['pdf_path'], record['query'],
+                              record.get('document_id'))
+
+async def run(input_path: str, output_path: str, max_concurrency: int, max_pending: int) -> QueueStats:
+    """Answer every request in input_path with sessions shared per contract"""
+    pool = SessionPool()
+
+    async def handle(request: AnalysisRequest) -> str:
+        session = await pool.get(request.pdf_path, request.document_id)
+        return await session.aask(request.query)
+
+    output = open(output_path, 'w', encoding='utf-8') if output_path != "-" else sys.stdout
+
+    def write(result: AnalysisResult) -> None:
+        output.write(json.dumps(result.to_dict(), ensure_ascii=False) + "\n")
+        output.flush()
+
+    try:
+        with open(input_path, encoding='utf-8') as file:
+            return await process_requests(read_requests(file), handle, write, max_concurrency, max_pending)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("requests", help="JSONL file of {\"pdf_path\", \"query\"[, \"document_id\"]} requests")
+    parser.add_argument("--output", default="-", help="JSONL results (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=QUEUE_MAX_CONCURRENCY, help="analyses in flight")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_MAX_PENDING, help="requests read ahead")
+    args = parser.parse_args()
+    start_warm_up()  # load clients while the first contracts are parsed
+    stats = asyncio.run(run(args.requests, args.output, args.concurrency, args.queue_size))
+    from metrics import get_metrics
+    get_metrics().write_prometheus()
+    print(f"✅ {stats.completed} answered, {stats.failed} failed in {stats.seconds:.1f}s "
+          f"({stats.requests_per_second:.2f} requests/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import numpy as np
+from config import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_SIMILARITY
+)
+
+@dataclass
+class CachedResponse:
+    """One cached answer"""
+    query: str
+    response: str
+    created: float
+    embedding: Optional[List[float]] = None
+
+@dataclass
+class CacheStats:
+    """Counters for tuning the similarity threshold"""
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), 'hit_rate': round(self.hit_rate, 3)}
+
+def cache_namespace(*parts: str) -> str:
+    """Entries are only matched within one namespace (contract, agent, prompt version, ...)"""
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:32]
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+class ResponseCache:
+    """LRU + TTL cache of answers, matched by normalized query or query embedding
+
+    Entries are grouped by namespace and persisted as one append-only JSONL
+    file per namespace, loaded the first time the namespace is looked up.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_SIZE,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS, similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._namespaces: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def _file(self, namespace: str) -> str:
+        return os.path.join(self.path, f"{namespace}.jsonl")
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return now - entry.created > self.ttl_seconds
+
+    def _load(self, namespace: str) -> None:
+        """Read a namespace from disk, dropping expired and superseded lines"""
+        self._namespaces[namespace] = set()
+        path = self._file(namespace)
+        if not os.path.exists(path):
+            return
+        now = time.time()
+        latest: Dict[str, CachedResponse] = {}
+        lines = 0
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write
+                entry = CachedResponse(record['query'], record['response'], record['created'], record.get('embedding'))
+                if not self._expired(entry, now):
+                    latest[record['key']] = entry
+        for key, entry in sorted(latest.items(), key=lambda item: item[1].created):
+            self._insert(namespace, key, entry)
+        if lines > len(latest):
+            self._rewrite(namespace)
+
+    def _rewrite(self, namespace: str) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        path = self._file(namespace)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for key in self._namespaces[namespace]:
+                file.write(json.dumps({'key': key, **asdict(self._entries[(namespace, key)])}) + "\n")
+        os.replace(tmp_path, path)
+
+    def _insert(self, namespace: str, key: str, entry: CachedResponse) -> None:
+        self._entries[(namespace, key)] = entry
+        self._entries.move_to_end((namespace, key))
+        self._namespaces[namespace].add(key)
+        while len(self._entries) > self.max_entries:
+            (old_namespace, old_key), _ = self._entries.popitem(last=False)
+            self._namespaces[old_namespace].discard(old_key)
+            self.stats.evictions += 1
+
+    def _drop(self, namespace: str, key: str) -> None:
+        self._entries.pop((namespace, key), None)
+        self._namespaces[namespace].discard(key)
+
+    def lookup(self, namespace: str, key: str,
+               embed: Optional[Callable[[], List[float]]] = None) -> Tuple[Optional[str], Optional[str], Optional[List[float]]]:
+        """(response, "exact" | "semantic", query embedding); response is None on a miss
+
+        The query is only embedded (via embed) when there is no exact match and
+        the namespace holds answers it could match; the embedding is returned so
+        the caller can store it with the new answer.
+        """
+        now = time.time()
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._load(namespace)
+            entry = self._entries.get((namespace, key))
+            if entry is not None and self._expired(entry, now):
+                self._drop(namespace, key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((namespace, key))
+                self.stats.exact_hits += 1
+                return entry.response, "exact", entry.embedding
+            candidates = [k for k in self._namespaces[namespace] if self._entries[(namespace, k)].embedding is not None]
+
+        embedding = embed() if embed is not None and candidates else None
+        if embedding is not None:
+            query_vector = _unit(embedding)
+            with self._lock:
+                best_key, best_score = None, self.similarity
+                for candidate_key in candidates:
+                    candidate = self._entries.get((namespace, candidate_key))
+                    if candidate is None:
+                        continue  # evicted meanwhile
+                    if self._expired(candidate, now):
+                        self._drop(namespace, candidate_key)
+                        continue
+                    score = float(np.dot(query_vector, _unit(candidate.embedding)))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end((namespace, best_key))
+                    self.stats.semantic_hits += 1
+                    return self._entries[(namespace, best_key)].response, "semantic", embedding
+
+        with self._lock:
+            self.stats.misses += 1
+        return None, None, embedding
+
+    def store(self, namespace: str, key: str, query: str, response: str,
+              embedding: Optional[List[float]] = None) -> None:
+        """Remember an answer in memory and append it to the namespace's file"""
+        entry = CachedResponse(query, response, time.time(), list(map(float, embedding)) if embedding is not None else None)
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._load(namespace)
+            self._insert(namespace, key, entry)
+            self.stats.stores += 1
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file(namespace), 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'key': key, **asdict(entry)}) + "\n")
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache shared by every session"""
+    return ResponseCache()
@@ -0,0 +1,139 @@
+import re
+from typing import List, Dict, Any, Mapping, Sequence, Tuple
+from langchain_core.documents import Document
+from config import HYBRID_RRF_K, HYBRID_CANDIDATES
+from lexical_index import LexicalIndex
+from vector_store import chunk_to_document, search_similar_chunks, search_similar_chunks_batch, asearch_similar_chunks
+
+# Section references, dotted clause numbers and quoted phrases are best matched literally
+EXACT_TERM_PATTERN = re.compile(
+    r'"[^"]+"|\b(?:section|clause|article|schedule|exhibit)\s+\d+(?:\.\d+)*|\b\d+\.\d+(?:\.\d+)*\b',
+    re.IGNORECASE
+)
+
+def is_exact_term_query(query: str) -> bool:
+    """True for queries naming a section number or quoting a phrase"""
+    return EXACT_TERM_PATTERN.search(query) is not None
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = HYBRID_RRF_K) -> Dict[str, float]:
+    """Fuse ranked ID lists; scores are scaled so rank 1 in every list scores 1.0"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    best_possible = len(rankings) / (rrf_k + 1)
+    return {key: score / best_possible for key, score in fused.items()}
+
+class HybridRetriever:
+    """BM25 + vector retrieval fused with reciprocal rank fusion
+
+    Exposes similarity_search_with_score like a vector store, so agents use it
+    unchanged. Scores are fused relevance in (0, 1], higher is better. Queries
+    with exact terms (section numbers, quoted phrases) are answered from the
+    lexical index alone, without an embedding call.
+    """
+
+    def __init__(self, vector_store: Any, lexical_index: LexicalIndex, chunks: Sequence[Mapping[str, Any]],
+                 rrf_k: int = HYBRID_RRF_K, candidates: int = HYBRID_CANDIDATES):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.chunks = chunks
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    @property
+    def embeddings(self) -> Any:
+        return self.vector_store.embeddings
+
+    def lexical_search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        """BM25-only results, scores scaled so the best hit is 1.0"""
+        hits = self.lexical_index.search(query, k)
+        if not hits:
+            return []
+        top_score = hits[0][1]
+        return [(chunk_to_document(self.chunks[i]), score / top_score) for i, score in hits]
+
+    def _fuse(self, query: str, vector_results: List[Tuple[Document, float]], k: int) -> List[Tuple[Document, float]]:
+        lexical_hits = self.lexical_index.search(query, self.candidates)
+        documents = {doc.metadata['chunk_id']: doc for doc, _ in vector_results}
+        lexical_ranking = []
+        for i, _ in lexical_hits:
+            chunk_id = self.chunks[i]['chunk_id']
+            documents.setdefault(chunk_id, chunk_to_document(self.chunks[i]))
+            lexical_ranking.append(chunk_id)
+        vector_ranking = [doc.metadata['chunk_id'] for doc, _ in vector_results]
+        fused = reciprocal_rank_fusion([lexical_ranking, vector_ranking], self.rrf_k)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(documents[chunk_id], score) for chunk_id, score in ranked]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if is_exact_term_query(query):
+            lexical = self.lexical_search(query, k)
+            if lexical:
+                return lexical
+        vector_results = self.vector_store.similarity_search_with_score(query, k=self.candidates)
+        return self._fuse(query, vector_results, k)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if is_exact_term_query(query):
+            lexical = self.lexical_search(query, k)
+            if lexical:
+                return lexical
+        vector_results = await asearch_similar_chunks(self.vector_store, query, k=self.candidates)
+        return self._fuse(query, vector_results, k)
+
+    def search_with_query_vector(self, query: str, query_vector: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """Hybrid search with the query embedding computed by the caller"""
+        if is_exact_term_query(query):
+            lexical = self.lexical_search(query, k)
+            if lexical:
+                return lexical
+        vector_results = search_similar_chunks(self.vector_store, query, k=self.candidates, query_vector=query_vector)
+        return self._fuse(query, vector_results, k)
+
+    def batch_similarity_search_with_score(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        results: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+        pending = []
+        for i, query in enumerate(queries):
+            lexical = self.lexical_search(query, k) if is_exact_term_query(query) else []
+            if lexical:
+                results[i] = lexical
+            else:
+                pending.append(i)
+        if pending:
+            pending_queries = [queries[i] for i in pending]
+            vector_batches = search_similar_chunks_batch(self.vector_store, pending_queries, k=self.candidates)
+            for i, vector_results in zip(pending, vector_batches):
+                results[i] = self._fuse(queries[i], vector_results, k)
+        return results
+
+class PrefetchedRetriever:
+    """Serves searches from results fetched ahead of time, delegating anything else
+
+    Lets a batch fetch retrieval for many queries at once and hand each agent its
+    results without changing the agents.
+    """
+
+    def __init__(self, retriever: Any, results: Dict[str, List[Tuple[Document, float]]], k: int):
+        self.retriever = retriever
+        self.results = results
+        self.k = k
+
+    @property
+    def embeddings(self) -> Any:
+        return self.retriever.embeddings
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if query in self.results and k <= self.k:
+            return self.results[query][:k]
+        return self.retriever.similarity_search_with_score(query, k=k)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        if query in self.results and k <= self.k:
+            return self.results[query][:k]
+        return await asearch_similar_chunks(self.retriever, query, k=k)
+
+    def search_with_query_vector(self, query: str, query_vector: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        if query in self.results and k <= self.k:
+            return self.results[query][:k]
+        return search_similar_chunks(self.retriever, query, k=k, query_vector=query_vector)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import re
+from typing import List, Dict, Any, Iterable, Optional
+from config import RISK_TAXONOMY
+
+# Terms added at runtime on top of config.RISK_TAXONOMY
+_extra_terms: Dict[str, List[str]] = {}
+_matcher: Optional["RiskMatcher"] = None
+
+def register_risk_terms(category: str, terms: Iterable[str]) -> None:
+    """Extend the risk taxonomy; takes effect for chunks annotated afterwards"""
+    global _matcher
+    _extra_terms.setdefault(category, []).extend(term.lower() for term in terms)
+    _matcher = None
+
+def risk_taxonomy() -> Dict[str, List[str]]:
+    """Configured taxonomy merged with registered terms"""
+    taxonomy = {category: [term.lower() for term in terms] for category, terms in RISK_TAXONOMY.items()}
+    for category, terms in _extra_terms.items():
+        taxonomy.setdefault(category, []).extend(term for term in terms if term not in taxonomy[category])
+    return taxonomy
+
+def taxonomy_signature() -> str:
+    """Changes whenever the taxonomy does, so stale chunk annotations can be detected"""
+    payload = json.dumps(risk_taxonomy(), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+class RiskMatcher:
+    """All taxonomy terms compiled into one regex, matched in a single pass per chunk"""
+
+    def __init__(self, taxonomy: Dict[str, List[str]]):
+        self.category_of = {term: category for category, terms in taxonomy.items() for term in terms}
+        # Longest terms first so "liquidated damages" wins over "damages"
+        alternatives = sorted(self.category_of, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in alternatives) + r")\w*")
+
+    def scan(self, text: str) -> Dict[str, int]:
+        """Occurrences of each term in the text"""
+        counts: Dict[str, int] = {}
+        for match in self.pattern.finditer(text.lower()):
+            term = match.group(1)
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+def get_matcher() -> RiskMatcher:
+    global _matcher
+    if _matcher is None:
+        _matcher = RiskMatcher(risk_taxonomy())
+    return _matcher
+
+def annotate_risks(chunks: List[Dict[str, Any]]) -> None:
+    """Store risk-term counts, categories and density (hits per 1,000 chars) on each chunk"""
+    matcher = get_matcher()
+    for chunk in chunks:
+        counts = matcher.scan(chunk['content'])
+        chunk['risk_terms'] = counts
+        chunk['risk_categories'] = sorted({matcher.category_of[term] for term in counts})
+        chunk['risk_score'] = round(1000.0 * sum(counts.values()) / max(len(chunk['content']), 1), 3)
+
+def rank_risky_chunks(chunks: List[Dict[str, Any]]) -> List[int]:
+    """Positions of chunks with any risk term, highest risk density first"""
+    risky = [i for i, chunk in enumerate(chunks) if chunk.get('risk_score', 0) > 0]
+    return sorted(risky, key=lambda i: (-chunks[i]['risk_score'], -len(chunks[i]['risk_categories']), i))
@@ -1,7 +1,23 @@
-from langchain_openai import ChatOpenAI
+import math
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 from pydantic import BaseModel, Field
-from config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_TEMPERATURE
+from config import (
+    OPENAI_API_KEY, OPENAI_MODEL, OPENAI_TEMPERATURE,
+    ROUTER_CONFIDENCE_THRESHOLD, ROUTER_MIN_MARGIN, ROUTER_CACHE_SIZE
+)
+from events import NO_STREAM_TAG
+from metrics import get_metrics, record_cache
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+AGENT_TYPES = ('summariser', 'rag_qa', 'clause_finder', 'risk_checker')
 
 class RouterDecision(BaseModel):
     """Router decision structure"""
@@ -9,19 +25,134 @@ class RouterDecision(BaseModel):
     reasoning: str = Field(description="Why this agent was chosen")
     confidence: float = Field(description="Confidence score 0-1")
 
+# Keywords per agent, used as classifier features
+KEYWORD_RULES = {
+    'summariser': ['summary', 'overview', 'summarize', 'summarise', 'executive'],
+    'clause_finder': ['find', 'clause', 'section', 'locate'],
+    'risk_checker': ['risk', 'danger', 'problem', 'compliance']
+}
+
+# Labelled example queries for the local nearest-centroid classifier
+ROUTER_EXAMPLES = {
+    'summariser': [
+        "Give me an executive summary of this contract",
+        "Summarize the agreement",
+        "Provide an overview of the contract",
+        "What is this contract about?",
+        "Summarise the key terms for me",
+        "Give me a high-level summary",
+        "Brief me on this agreement",
+        "What are the main points of this document?"
+    ],
+    'rag_qa': [
+        "What are the payment terms?",
+        "Who are the parties involved?",
+        "What is the contract duration?",
+        "When does the agreement expire?",
+        "How much is the monthly fee?",
+        "What law governs this contract?",
+        "How many days notice is required to renew?",
+        "Who is responsible for insurance?",
+        "What is the price per unit?",
+        "When are invoices due?"
+    ],
+    'clause_finder': [
+        "Find all clauses related to termination",
+        "Find termination clauses",
+        "Locate the confidentiality clause",
+        "Show me section 12.3",
+        "Where is the indemnification clause?",
+        "Find the governing law section",
+        "Which clauses mention intellectual property?",
+        "Show me the force majeure clause"
+    ],
+    'risk_checker': [
+        "What are the main risks in this contract?",
+        "Identify risky clauses",
+        "Are there any compliance issues?",
+        "What are the potential problems with this agreement?",
+        "Check this contract for red flags",
+        "Which terms are unfavourable to us?",
+        "Is there any uncapped liability exposure?",
+        "Assess the legal risks"
+    ]
+}
+
+FEATURE_DIM = 1 << 14
+RULE_FEATURE_WEIGHT = 2.0
+SOFTMAX_SCALE = 12.0  # sharpness of the cosine -> confidence mapping
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation, so repeats share a cache entry"""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+def _hash_feature(name: str) -> int:
+    return zlib.crc32(name.encode("utf-8")) % FEATURE_DIM
+
+def query_features(query: str) -> Dict[int, float]:
+    """Hashed word, bigram and character trigram features plus keyword-rule features, L2-normalised"""
+    text = normalize_query(query)
+    words = WORD_PATTERN.findall(text)
+    features: Dict[int, float] = {}
+    names = [f"w:{w}" for w in words] + [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        names.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    for name in names:
+        index = _hash_feature(name)
+        features[index] = features.get(index, 0.0) + 1.0
+    for agent_type, rule_words in KEYWORD_RULES.items():
+        if any(word in text for word in rule_words):
+            index = _hash_feature(f"rule:{agent_type}")
+            features[index] = features.get(index, 0.0) + RULE_FEATURE_WEIGHT
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+@lru_cache(maxsize=1)
+def _centroids() -> Dict[str, Dict[int, float]]:
+    centroids = {}
+    for agent_type, examples in ROUTER_EXAMPLES.items():
+        centroid: Dict[int, float] = {}
+        for example in examples:
+            for index, value in query_features(example).items():
+                centroid[index] = centroid.get(index, 0.0) + value
+        norm = math.sqrt(sum(value * value for value in centroid.values())) or 1.0
+        centroids[agent_type] = {index: value / norm for index, value in centroid.items()}
+    return centroids
+
+def rank_agents(query: str) -> List[Tuple[str, float]]:
+    """Local nearest-centroid routing: (agent_type, confidence in 0-1) for every agent, best first"""
+    features = query_features(query)
+    similarities = {
+        agent_type: sum(value * centroid.get(index, 0.0) for index, value in features.items())
+        for agent_type, centroid in _centroids().items()
+    }
+    exponents = {agent_type: math.exp(SOFTMAX_SCALE * sim) for agent_type, sim in similarities.items()}
+    total = sum(exponents.values())
+    return sorted(((agent_type, value / total) for agent_type, value in exponents.items()),
+                  key=lambda item: item[1], reverse=True)
+
+def classify_query(query: str) -> Tuple[str, float]:
+    """(agent_type, confidence in 0-1) from the local classifier; takes microseconds"""
+    return rank_agents(query)[0]
+
 def create_router_llm():
     """Create LLM for router"""
+    from langchain_openai import ChatOpenAI  # slow to import; loaded on first LLM routing
     return ChatOpenAI(
         model=OPENAI_MODEL,
         api_key=OPENAI_API_KEY,
-        temperature=OPENAI_TEMPERATURE
+        temperature=OPENAI_TEMPERATURE,
+        callbacks=[get_metrics().llm_callback]
     )
 
-def route_query(query: str) -> str:
-    """Route user query to appropriate agent"""
-    llm = create_router_llm()
-    
-    system_prompt = """You are a routing agent for a contract analysis system. 
+@lru_cache(maxsize=1)
+def get_router_llm() -> "ChatOpenAI":
+    """Shared router LLM client"""
+    return create_router_llm()
+
+ROUTER_SYSTEM_PROMPT = """You are a routing agent for a contract analysis system. 
     Based on the user query, decide which specialist agent should handle it:
 
     1. 'summariser': For requests asking for contract summaries, overviews, executive summaries
@@ -30,27 +161,95 @@ def route_query(query: str) -> str:
     4. 'risk_checker': For risk analysis, compliance checks, identifying problematic clauses
 
     Return only the agent type as a single word."""
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+
+def _router_messages(query: str) -> List:
+    return [
+        SystemMessage(content=ROUTER_SYSTEM_PROMPT),
         HumanMessage(content=f"Route this query: {query}")
     ]
-    
-    # Get structured response
-    structured_llm = llm.with_structured_output(RouterDecision)
-    try:
-        response = structured_llm.invoke(messages)
-        print(f"Router decision: {response.agent_type} (confidence: {response.confidence})")
-        print(f"Reasoning: {response.reasoning}")
+
+def _checked_decision(response: RouterDecision, fallback: str) -> str:
+    print(f"Router decision: {response.agent_type} (confidence: {response.confidence})")
+    print(f"Reasoning: {response.reasoning}")
+    if response.agent_type in AGENT_TYPES:
         return response.agent_type
-    except:
-        # Fallback to simple routing
-        query_lower = query.lower()
-        if any(word in query_lower for word in ['summary', 'overview', 'summarize', 'executive']):
-            return 'summariser'
-        elif any(word in query_lower for word in ['find', 'clause', 'section', 'locate']):
-            return 'clause_finder'
-        elif any(word in query_lower for word in ['risk', 'danger', 'problem', 'compliance']):
-            return 'risk_checker'
-        else:
-            return 'rag_qa'
\ No newline at end of file
+    print(f"Unknown agent type from LLM router, using {fallback}")
+    return fallback
+
+def _llm_decision(query: str, fallback: str) -> Optional[str]:
+    """The LLM router's decision, or None if the call failed"""
+    try:
+        structured_llm = get_router_llm().with_structured_output(RouterDecision)
+        response = structured_llm.invoke(_router_messages(query), config={"tags": [NO_STREAM_TAG]})  # keep JSON out of the token stream
+        return _checked_decision(response, fallback)
+    except Exception as e:
+        print(f"LLM router failed ({e}); using {fallback}")
+        return None
+
+async def _allm_decision(query: str, fallback: str) -> Optional[str]:
+    try:
+        structured_llm = get_router_llm().with_structured_output(RouterDecision)
+        response = await structured_llm.ainvoke(_router_messages(query), config={"tags": [NO_STREAM_TAG]})
+        return _checked_decision(response, fallback)
+    except Exception as e:
+        print(f"LLM router failed ({e}); using {fallback}")
+        return None
+
+
+
+# Routing decisions per normalized query, shared by the sync and async paths
+_route_cache: "OrderedDict[str, str]" = OrderedDict()
+_route_cache_lock = threading.Lock()
+
+def _cached_route(normalized: str) -> Optional[str]:
+    with _route_cache_lock:
+        agent_type = _route_cache.get(normalized)
+        if agent_type is not None:
+            _route_cache.move_to_end(normalized)
+    record_cache("router", "hit" if agent_type is not None else "miss")
+    return agent_type
+
+def _remember_route(normalized: str, agent_type: str) -> str:
+    with _route_cache_lock:
+        _route_cache[normalized] = agent_type
+        if len(_route_cache) > ROUTER_CACHE_SIZE:
+            _route_cache.popitem(last=False)
+    return agent_type
+
+def _local_route(normalized: str) -> Tuple[str, bool]:
+    """(agent_type, confident) from the local classifier; close calls between two agents are not confident"""
+    (agent_type, confidence), (runner_up, runner_up_confidence) = rank_agents(normalized)[:2]
+    if confidence >= ROUTER_CONFIDENCE_THRESHOLD and confidence - runner_up_confidence >= ROUTER_MIN_MARGIN:
+        print(f"Router decision: {agent_type} (local classifier, confidence: {confidence:.2f})")
+        return agent_type, True
+    print(f"Local router unsure ({agent_type} {confidence:.2f}, {runner_up} {runner_up_confidence:.2f}); "
+          f"asking LLM router")
+    return agent_type, False
+
+def route_query(query: str) -> str:
+    """Route user query to appropriate agent: cached, local classifier first, LLM only when unsure"""
+    normalized = normalize_query(query)
+    agent_type = _cached_route(normalized)
+    if agent_type is not None:
+        return agent_type
+    agent_type, confident = _local_route(normalized)
+    if not confident:
+        decision = _llm_decision(query, fallback=agent_type)
+        if decision is None:
+            return agent_type  # not cached, so the next ask retries the LLM router
+        agent_type = decision
+    return _remember_route(normalized, agent_type)
+
+async def aroute_query(query: str) -> str:
+    """Async route_query; only the LLM fallback awaits the network"""
+    normalized = normalize_query(query)
+    agent_type = _cached_route(normalized)
+    if agent_type is not None:
+        return agent_type
+    agent_type, confident = _local_route(normalized)
+    if not confident:
+        decision = await _allm_decision(query, fallback=agent_type)
+        if decision is None:
+            return agent_type
+        agent_type = decision
+    return _remember_route(normalized, agent_type)
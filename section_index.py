@@ -0,0 +1,82 @@
+"""Section-number and heading lookup over clause chunks"""
+import re
+from typing import List, Dict, Any, Optional, Tuple
+from clause_chunker import article_number, roman_to_int
+
+SECTION_QUERY = re.compile(r"(?:\b(section|clause|article)|§)\s*(\d{1,3}(?:\.\d{1,3})*|[ivxlc]+)\b", re.IGNORECASE)
+# Leading number of a section_path label: "Article 4 Term", "12.3 Late Payment"
+LABEL_NUMBER = re.compile(r"^(Article \d+|\d+(?:\.\d+)*)(?: |$)")
+DOTTED_NUMBER = re.compile(r"\b\d{1,3}(?:\.\d{1,3})+\b")
+ROMAN_NUMERAL = re.compile(r"^C{0,3}(XC|XL|L?X{0,3})(IX|IV|V?I{0,3})$")
+
+# Words that carry no heading content, dropped from both headings and queries
+FILLER_WORDS = {
+    'find', 'show', 'me', 'the', 'a', 'an', 'locate', 'where', 'is', 'are', 'what', 'does', 'say', 'please',
+    'get', 'of', 'on', 'about', 'for', 'clause', 'clauses', 'section', 'sections', 'article', 'provision',
+    'provisions', 'heading', 'titled', 'called', 'this', 'contract'
+}
+
+def normalize_heading(text: str) -> str:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+def query_section_number(query: str) -> Optional[str]:
+    """Section number named in the query ("section 12.3", "article IV", "12.3"), if any"""
+    match = SECTION_QUERY.search(query)
+    if match:
+        keyword, number = match.group(1), match.group(2).rstrip(".")
+        is_numeral = number.isdigit() or "." in number or bool(ROMAN_NUMERAL.match(number.upper()))
+        if is_numeral and keyword and keyword.lower() == "article":
+            return article_number(number)
+        if number.isdigit() or "." in number:
+            return number
+        if is_numeral:
+            return str(roman_to_int(number.upper()))
+    match = DOTTED_NUMBER.search(query)
+    return match.group(0) if match else None
+
+def _number_prefixes(number: str) -> List[str]:
+    parts = number.split(".")
+    return [".".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+def _path_labels(chunk: Dict[str, Any]) -> List[Tuple[Optional[str], str]]:
+    """(section number or None, heading) of every section enclosing the chunk, outermost first"""
+    labels = []
+    for label in (chunk.get('section_path') or "").split(" > "):
+        match = LABEL_NUMBER.match(label)
+        labels.append((match.group(1), label[match.end():]) if match else (None, label))
+    return labels
+
+def _path_headings(chunk: Dict[str, Any]) -> List[str]:
+    """Headings of the chunk and of every section enclosing it"""
+    return [heading for _, heading in _path_labels(chunk)] + [chunk.get('heading') or ""]
+
+def _path_numbers(chunk: Dict[str, Any]) -> List[str]:
+    """Numbers of the chunk's section and of every section enclosing it"""
+    numbers = {number for number, _ in _path_labels(chunk) if number}
+    if chunk.get('section_number'):
+        numbers.update(_number_prefixes(chunk['section_number']))
+    return sorted(numbers)
+
+class SectionIndex:
+    """Chunk positions by section number and by normalized heading"""
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.by_number: Dict[str, List[int]] = {}
+        self.by_heading: Dict[str, List[int]] = {}
+        for position, chunk in enumerate(chunks):
+            for number in _path_numbers(chunk):
+                self.by_number.setdefault(number, []).append(position)
+            for key in {normalize_heading(heading) for heading in _path_headings(chunk)}:
+                if key:
+                    self.by_heading.setdefault(key, []).append(position)
+
+    def __len__(self) -> int:
+        return len(self.by_number) + len(self.by_heading)
+
+    def lookup(self, query: str) -> List[int]:
+        """Positions of the chunks a query names by section number or exact heading; empty if it names neither"""
+        number = query_section_number(query)
+        if number is not None:
+            return self.by_number.get(number, [])
+        return self.by_heading.get(normalize_heading(query), [])
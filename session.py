@@ -0,0 +1,416 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from langchain_core.documents import Document
+from config import (BATCH_MAX_CONCURRENCY, OPENAI_MODEL, RESPONSE_CACHE_ENABLED, SPECULATIVE_RETRIEVAL,
+                    SPECULATIVE_RETRIEVAL_WORKERS)
+from agents import RAG_QA_K, CLAUSE_FINDER_K, AGENT_PROMPT_VERSION, QUERY_INDEPENDENT_AGENTS
+from chunk_store import ChunkStore
+from ingestion import ingest_contract, ensure_current, register_contract, IngestedContract
+from metrics import capture, capture_iter, stage_breakdown, record_cache, record_speculation, timed
+from response_cache import get_response_cache, cache_namespace
+from retrieval import PrefetchedRetriever
+from risk_scanner import taxonomy_signature
+from router import route_query, aroute_query, normalize_query
+from summary_pipeline import SUMMARY_PROMPT_VERSION
+from vector_store import search_similar_chunks, asearch_similar_chunks, embed_queries
+from workflow import get_workflow, get_async_workflow, ContractState
+
+# Agents whose answers come from top-k retrieval
+RETRIEVAL_AGENTS = {'rag_qa': RAG_QA_K, 'clause_finder': CLAUSE_FINDER_K}
+# Results fetched ahead of routing must serve whichever retrieval agent is picked
+PREFETCH_K = max(RETRIEVAL_AGENTS.values())
+
+@lru_cache(maxsize=1)
+def speculation_executor() -> ThreadPoolExecutor:
+    """Process-wide threads for speculative retrieval"""
+    return ThreadPoolExecutor(max_workers=SPECULATIVE_RETRIEVAL_WORKERS, thread_name_prefix="speculate")
+
+@dataclass
+class QueryResult:
+    """Answer to one query of a batch"""
+    query: str
+    agent_type: Optional[str]
+    response: Optional[str]
+    seconds: float
+    error: Optional[str] = None
+    cached: Optional[str] = None  # "exact" or "semantic" when answered from the response cache
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class ContractSession:
+    """A contract opened once and queried many times
+
+    Holds the ingested chunks, the retriever and the compiled workflow; LLM and
+    embedding clients are process-wide singletons, so their HTTP connection pools
+    survive across questions. Each ask() costs only routing, retrieval and the
+    agent call, and questions already answered for this contract (or close
+    paraphrases of them) come from the response cache.
+    """
+
+    def __init__(self, pdf_path: str, document_id: Optional[str] = None):
+        self.pdf_path = pdf_path
+        with capture() as events:
+            self.contract: IngestedContract = ingest_contract(pdf_path, document_id=document_id)
+        self.ingest_metrics = stage_breakdown(events)
+        self.app = get_workflow()
+
+    @property
+    def contract_id(self) -> str:
+        return self.contract.contract_id
+
+    @property
+    def chunks(self) -> ChunkStore:
+        return self.contract.chunks
+
+    @property
+    def vector_store(self) -> Any:
+        return self.contract.vector_store
+
+    def initial_state(self, query: str, agent_type: Optional[str] = None,
+                      vector_store: Any = None) -> ContractState:
+        # Re-registering keeps the ID pointing at a live contract while this session holds it
+        register_contract(self.contract)
+        return ContractState(
+            user_query=query,
+            agent_type=agent_type,
+            contract_id=self.contract.contract_id,
+            retriever=vector_store,
+            response=None,
+            messages=[]
+        )
+
+    def _cache_slot(self, query: str, agent_type: str) -> Tuple[str, str]:
+        namespace = cache_namespace(self.contract.contract_id, agent_type, AGENT_PROMPT_VERSION,
+                                    SUMMARY_PROMPT_VERSION, OPENAI_MODEL, taxonomy_signature())
+        # Summaries and risk reports ignore the question, so any wording matches
+        key = "" if agent_type in QUERY_INDEPENDENT_AGENTS else normalize_query(query)
+        return namespace, key
+
+    def cached_answer(self, query: str, agent_type: str,
+                      embedding: Optional[List[float]] = None) -> Tuple[Optional[str], Optional[str], Optional[List[float]]]:
+        """(response, "exact" | "semantic", query embedding) from the response cache; response is None on a miss
+
+        The query is embedded only if a near-duplicate match is possible, unless
+        the caller already has its embedding.
+        """
+        if not RESPONSE_CACHE_ENABLED:
+            return None, None, embedding
+        namespace, key = self._cache_slot(query, agent_type)
+        embed = None
+        if key:
+            embed = (lambda: embedding) if embedding is not None else (lambda: self.vector_store.embeddings.embed_query(query))
+        response, cache_hit, found_embedding = get_response_cache().lookup(namespace, key, embed)
+        record_cache("response", cache_hit or "miss")
+        return response, cache_hit, found_embedding if found_embedding is not None else embedding
+
+    def remember_answer(self, query: str, agent_type: str, response: Optional[str],
+                        embedding: Optional[List[float]] = None) -> None:
+        """Store a fresh answer in the response cache"""
+        if not RESPONSE_CACHE_ENABLED or response is None:
+            return
+        namespace, key = self._cache_slot(query, agent_type)
+        if key and embedding is None:
+            embedding = self.vector_store.embeddings.embed_query(query)
+        get_response_cache().store(namespace, key, query, response, embedding)
+
+    @property
+    def cache_stats(self) -> Dict[str, Any]:
+        """Response cache hit/miss counters (shared by all sessions in the process)"""
+        return get_response_cache().stats.to_dict()
+
+    def _answered_by_section_index(self, query: str, agent_type: str) -> bool:
+        """Clause lookups by section number or heading need no retrieval"""
+        index = self.contract.section_index
+        return agent_type == 'clause_finder' and index is not None and bool(index.lookup(query))
+
+    def _speculate(self, query: str) -> Optional[Future]:
+        """Start top-k retrieval in the background while the query is routed (None when disabled)"""
+        if not SPECULATIVE_RETRIEVAL:
+            return None
+        # The copied context sends the search's metrics to the caller's capture() block
+        return speculation_executor().submit(contextvars.copy_context().run, self._speculative_search, query)
+
+    def _speculative_search(self, query: str) -> Tuple[Optional[List[float]], List[Tuple[Any, float]]]:
+        """(query embedding, top-k results); the response cache reuses the embedding"""
+        with timed("retrieve", speculative=True):
+            embedding = self.vector_store.embeddings.embed_query(query) if RESPONSE_CACHE_ENABLED else None
+            return embedding, search_similar_chunks(self.vector_store, query, k=PREFETCH_K, query_vector=embedding)
+
+    async def _aspeculative_search(self, query: str) -> Tuple[Optional[List[float]], List[Tuple[Any, float]]]:
+        with timed("retrieve", speculative=True):
+            if not RESPONSE_CACHE_ENABLED:
+                return None, await asearch_similar_chunks(self.vector_store, query, k=PREFETCH_K)
+            embedding = await self.vector_store.embeddings.aembed_query(query)
+            return embedding, search_similar_chunks(self.vector_store, query, k=PREFETCH_K, query_vector=embedding)
+
+    def _needs_embedding(self, speculation: Any, agent_type: str) -> bool:
+        """Whether the response cache matches this agent's answers by the query embedding"""
+        return speculation is not None and RESPONSE_CACHE_ENABLED and agent_type not in QUERY_INDEPENDENT_AGENTS
+
+    def _speculative_embedding(self, speculation: Optional[Future], agent_type: str) -> Optional[List[float]]:
+        """The query embedding from the speculative search if the cache needs one (None if it failed)"""
+        if not self._needs_embedding(speculation, agent_type):
+            return None
+        try:
+            return speculation.result()[0]
+        except Exception:
+            return None
+
+    async def _aspeculative_embedding(self, speculation: Optional["asyncio.Task"], agent_type: str) -> Optional[List[float]]:
+        if not self._needs_embedding(speculation, agent_type):
+            return None
+        try:
+            return (await speculation)[0]
+        except Exception:
+            return None
+
+    def _speculation_route(self, query: str, agent_type: Optional[str]) -> Tuple[bool, str]:
+        """(whether the agent will use speculative results, route label for the metrics)
+
+        agent_type is None when the answer came from the response cache.
+        """
+        if agent_type is None:
+            return False, "cached"
+        if self._answered_by_section_index(query, agent_type):
+            return False, "section_index"
+        return agent_type in RETRIEVAL_AGENTS, agent_type
+
+    def _take_speculation(self, speculation: Optional[Future], query: str,
+                          agent_type: Optional[str]) -> Optional[PrefetchedRetriever]:
+        """A retriever serving the speculative results if the routed agent retrieves; otherwise they are discarded"""
+        if speculation is None:
+            return None
+        used, route = self._speculation_route(query, agent_type)
+        if not used:
+            speculation.cancel()
+            record_speculation("wasted", route)
+            return None
+        waited = time.perf_counter()
+        try:
+            _, results = speculation.result()
+        except Exception as e:
+            # The agent searches again itself
+            print(f"Speculative retrieval failed: {e}")
+            record_speculation("failed", route)
+            return None
+        record_speculation("used", route, time.perf_counter() - waited)
+        return PrefetchedRetriever(self.vector_store, {query: results}, PREFETCH_K)
+
+    async def _atake_speculation(self, speculation: Optional["asyncio.Task"], query: str,
+                                 agent_type: Optional[str]) -> Optional[PrefetchedRetriever]:
+        """Async _take_speculation for a speculative search running as a task"""
+        if speculation is None:
+            return None
+        used, route = self._speculation_route(query, agent_type)
+        if not used:
+            if not speculation.cancel():
+                speculation.exception()  # finished already; retrieve any error so it is not logged
+            record_speculation("wasted", route)
+            return None
+        waited = time.perf_counter()
+        try:
+            _, results = await speculation
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            record_speculation("failed", route)
+            return None
+        record_speculation("used", route, time.perf_counter() - waited)
+        return PrefetchedRetriever(self.vector_store, {query: results}, PREFETCH_K)
+
+    def ask(self, query: str) -> str:
+        """Answer one question about the contract
+
+        With SPECULATIVE_RETRIEVAL, retrieval runs while the query is routed and
+        looked up in the response cache, so retrieval agents start with their results.
+        """
+        ensure_current(self.contract)
+        speculation = self._speculate(query)
+        agent_type = route_query(query)
+        response, _, embedding = self.cached_answer(query, agent_type, self._speculative_embedding(speculation, agent_type))
+        retriever = self._take_speculation(speculation, query, agent_type if response is None else None)
+        if response is None:
+            response = self.app.invoke(self.initial_state(query, agent_type, retriever))["response"]
+            self.remember_answer(query, agent_type, response, embedding)
+        return response
+
+    async def aask(self, query: str) -> str:
+        """Async ask: network calls are awaited, so one event loop can serve many questions at once"""
+        if self.contract.stale:
+            await asyncio.to_thread(ensure_current, self.contract)
+        speculation = asyncio.create_task(self._aspeculative_search(query)) if SPECULATIVE_RETRIEVAL else None
+        try:
+            agent_type = await aroute_query(query)
+            speculative_embedding = await self._aspeculative_embedding(speculation, agent_type)
+            response, _, embedding = await asyncio.to_thread(self.cached_answer, query, agent_type, speculative_embedding)
+        except BaseException:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+        retriever = await self._atake_speculation(speculation, query, agent_type if response is None else None)
+        if response is None:
+            result = await get_async_workflow().ainvoke(self.initial_state(query, agent_type, retriever))
+            response = result["response"]
+            await asyncio.to_thread(self.remember_answer, query, agent_type, response, embedding)
+        return response
+
+    def stream(self, query: str) -> Iterator[Dict[str, Any]]:
+        """Answer one question, yielding events as the workflow runs
+
+        Events are dicts with an "event" key: "route" (agent_type), "retrieval"
+        (chunk_ids), "stage" (long-running steps), "token" (text, in answer order)
+        and finally "done" (response, seconds, time_to_first_token, cached, and
+        metrics: the per-stage breakdown from metrics.stage_breakdown). Agents
+        that do not call an LLM, and cached answers, arrive as a single token.
+        """
+        started = time.perf_counter()
+        metrics_events: List[Dict[str, Any]] = []
+        ensure_current(self.contract)
+        with capture(metrics_events):
+            speculation = self._speculate(query)
+            agent_type = route_query(query)
+            cached, cache_hit, embedding = self.cached_answer(query, agent_type,
+                                                              self._speculative_embedding(speculation, agent_type))
+            retriever = self._take_speculation(speculation, query, agent_type if cached is None else None)
+        if cached is not None:
+            yield {"event": "route", "agent_type": agent_type}
+            yield {"event": "token", "text": cached}
+            seconds = time.perf_counter() - started
+            yield {"event": "done", "response": cached, "seconds": seconds, "time_to_first_token": seconds,
+                   "cached": cache_hit, "metrics": stage_breakdown(metrics_events)}
+            return
+
+        time_to_first_token = None
+        response = None
+        streamed = False
+        state = self.initial_state(query, agent_type, retriever)
+        graph_stream = self.app.stream(state, stream_mode=["updates", "messages", "custom"])
+        for mode, payload in capture_iter(graph_stream, metrics_events):
+            events = []
+            if mode == "custom":
+                events.append(payload)
+            elif mode == "messages":
+                chunk, _ = payload
+                if chunk.content:
+                    events.append({"event": "token", "text": chunk.content})
+            else:
+                for node, update in payload.items():
+                    if node == "router":
+                        events.append({"event": "route", "agent_type": update["agent_type"]})
+                    else:
+                        response = update["response"]
+            if not streamed and response is not None:
+                events.append({"event": "token", "text": response})
+            for event in events:
+                if event["event"] == "token":
+                    streamed = True
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - started
+                yield event
+        with capture(metrics_events):
+            self.remember_answer(query, agent_type, response, embedding)
+        yield {
+            "event": "done",
+            "response": response,
+            "seconds": time.perf_counter() - started,
+            "time_to_first_token": time_to_first_token,
+            "cached": None,
+            "metrics": stage_breakdown(metrics_events)
+        }
+
+    def ask_many(self, queries: List[str], max_concurrency: int = BATCH_MAX_CONCURRENCY) -> List[QueryResult]:
+        """Answer many questions concurrently; results are in input order with per-query timings
+
+        Identical (normalized) queries are answered once and routed concurrently.
+        The questions that need an embedding, for the response cache or for
+        retrieval, are embedded in one request; cached answers are reused and
+        retrieval for every remaining retrieval-based query is fetched with those
+        embeddings before the agents run. A query that fails at any step gets an
+        error result; the rest of the batch still runs.
+        """
+        started = time.perf_counter()
+        ensure_current(self.contract)
+        unique: Dict[str, str] = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        answers: Dict[str, QueryResult] = {}
+        workers = max(1, min(max_concurrency, len(unique)))
+
+        def fail(key: str, step_started: float, error: Exception, agent_type: Optional[str] = None) -> None:
+            answers[key] = QueryResult(unique[key], agent_type, None, time.perf_counter() - step_started, str(error))
+
+        def route(key: str) -> Optional[str]:
+            route_started = time.perf_counter()
+            try:
+                return route_query(unique[key])
+            except Exception as e:
+                fail(key, route_started, e)
+                return None
+
+        # Routing can call the LLM for close calls, so it runs concurrently as well
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            routes = {key: agent_type for key, agent_type in zip(unique, executor.map(route, unique))
+                      if agent_type is not None}
+
+        # One embedding request for cache lookups, cache stores and retrieval alike
+        retrieves = {key for key in routes if routes[key] in RETRIEVAL_AGENTS
+                     and not self._answered_by_section_index(unique[key], routes[key])}
+        embedded = [key for key in routes if key in retrieves
+                    or (RESPONSE_CACHE_ENABLED and routes[key] not in QUERY_INDEPENDENT_AGENTS)]
+        embeddings: Dict[str, Optional[List[float]]] = dict.fromkeys(unique)
+        if embedded:
+            try:
+                embeddings.update(zip(embedded, embed_queries(self.vector_store.embeddings, [unique[key] for key in embedded])))
+            except Exception as e:
+                # Each query then embeds on its own, so a bad input fails only that query
+                print(f"Batch embedding failed ({e}); embedding per query")
+
+        for key in [key for key in routes if key not in answers]:
+            lookup_started = time.perf_counter()
+            try:
+                response, cache_hit, embeddings[key] = self.cached_answer(unique[key], routes[key], embeddings[key])
+            except Exception as e:
+                fail(key, lookup_started, e, routes[key])
+                continue
+            if response is not None:
+                answers[key] = QueryResult(unique[key], routes[key], response, time.perf_counter() - lookup_started, cached=cache_hit)
+        pending = [key for key in routes if key not in answers]
+
+        # A failed prefetch is retried live inside that query's own run
+        prefetched: Dict[str, List[Tuple[Document, float]]] = {}
+        with timed("retrieve", queries=sum(1 for key in pending if key in retrieves)):
+            for key in pending:
+                if key in retrieves:
+                    try:
+                        prefetched[unique[key]] = search_similar_chunks(self.vector_store, unique[key], k=PREFETCH_K,
+                                                                        query_vector=embeddings[key])
+                    except Exception as e:
+                        print(f"Prefetch failed for {unique[key]!r}: {e}")
+        retriever = PrefetchedRetriever(self.vector_store, prefetched, PREFETCH_K)
+        print(f"Batch: {len(queries)} queries, {len(unique)} unique, {len(answers)} cached or failed, "
+              f"{len(prefetched)} retrievals prefetched in {time.perf_counter() - started:.2f}s")
+
+        def run(key: str) -> QueryResult:
+            query_started = time.perf_counter()
+            try:
+                result = self.app.invoke(self.initial_state(unique[key], routes[key], retriever))
+                self.remember_answer(unique[key], routes[key], result["response"], embeddings[key])
+                return QueryResult(unique[key], routes[key], result["response"], time.perf_counter() - query_started)
+            except Exception as e:
+                return QueryResult(unique[key], routes[key], None, time.perf_counter() - query_started, str(e))
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+                answers.update(zip(pending, executor.map(run, pending)))
+
+        results = []
+        for query in queries:
+            answer = answers[normalize_query(query)]
+            results.append(QueryResult(query, answer.agent_type, answer.response, answer.seconds, answer.error, answer.cached))
+        print(f"Batch finished in {time.perf_counter() - started:.2f}s")
+        return results
@@ -0,0 +1,100 @@
+"""Report where start-up time goes: per-module import time and time to ready.
+
+Each entry module is imported in a fresh interpreter with `python -X importtime`.
+The warm-up from warmup.py then runs in the same interpreter. The report shows
+the import time of the entry module, the time until every client is ready, the
+seconds per warm-up step and the slowest packages in each phase.
+
+    python startup_profile.py                 # main and session
+    python startup_profile.py streamlit_app --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+WARM_UP_MARKER = "# warm-up"
+RESULT_PREFIX = "STARTUP_PROFILE "
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+steps = {{}}
+if {warm_up}:
+    sys.stderr.write({marker!r} + "\\n")
+    sys.stderr.flush()
+    from warmup import warm_up
+    steps = warm_up()
+print({prefix!r} + json.dumps({{'import_seconds': imported - started,
+                               'ready_seconds': time.perf_counter() - started, 'steps': steps}}))
+"""
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Seconds of self import time per top-level package, before and after the warm-up marker"""
+    phases: Tuple[Dict[str, float], Dict[str, float]] = ({}, {})
+    phase = 0
+    for line in stderr.splitlines():
+        if line.strip() == WARM_UP_MARKER:
+            phase = 1
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        phases[phase][package] = phases[phase].get(package, 0.0) + int(self_us) / 1e6
+    return phases
+
+def profile(module: str, warm_up: bool = True) -> Dict[str, object]:
+    """Import and warm-up timings of one entry module, measured in a fresh interpreter"""
+    code = PROBE.format(module=module, warm_up=warm_up, marker=WARM_UP_MARKER, prefix=RESULT_PREFIX)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    results = [line[len(RESULT_PREFIX):] for line in process.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not results:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"Profiling {module} failed: {errors[-1] if errors else 'no output'}")
+    imports, warm_up_imports = parse_importtime(process.stderr)
+    return {'module': module, **json.loads(results[-1]), 'imports': imports, 'warm_up_imports': warm_up_imports}
+
+def _slowest(packages: Dict[str, float], top: int) -> List[Tuple[str, float]]:
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def print_report(report: Dict[str, object], top: int) -> None:
+    print(f"{report['module']}: imported in {report['import_seconds']:.2f}s, "
+          f"ready in {report['ready_seconds']:.2f}s")
+    for title, packages in (("import", report['imports']), ("warm-up", report['warm_up_imports'])):
+        if packages:
+            print(f"  slowest packages during {title}:")
+            for package, seconds in _slowest(packages, top):
+                print(f"    {package:30s} {seconds * 1000:8.1f}ms")
+    if report['steps']:
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report['steps'].items())
+        print(f"  warm-up steps: {steps}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["main", "session"], help="entry modules to profile")
+    parser.add_argument("--top", type=int, default=10, help="packages listed per phase")
+    parser.add_argument("--no-warm-up", action="store_true", help="measure imports only")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    reports = []
+    for module in args.modules:
+        try:
+            report = profile(module, warm_up=not args.no_warm_up)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            continue
+        print_report(report, args.top)
+        reports.append(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(reports, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,37 @@
 import streamlit as st
 import streamlit.components.v1
-import tempfile
 import os
 from pathlib import Path
 import traceback
+from typing import TYPE_CHECKING
+from warmup import start_warm_up
 
-# Import the main functionality
-from main import analyze_contract
+# The analysis stack loads on the warm-up thread and on first use, not before the page renders
+if TYPE_CHECKING:
+    from background_ingestion import IngestionJob, IngestionJobs
+
+@st.cache_resource(show_spinner=False)
+def get_ingestion_jobs() -> "IngestionJobs":
+    """Background ingestion shared by every rerun and browser session"""
+    from background_ingestion import IngestionJobs
+    return IngestionJobs()
+
+@st.fragment(run_every=0.5)
+def poll_ingestion_progress(content_hash: str):
+    """Live ingestion progress, refreshed on its own until the job finishes"""
+    job = get_ingestion_jobs().get(content_hash)
+    if job is None or job.finished:
+        st.rerun()  # the full rerun renders the static status instead, which stops the polling
+    st.progress(job.fraction, text=f"📄 {job.message}...")
+
+def show_ingestion_status(job: "IngestionJob"):
+    """Ingestion status for the uploaded contract; only a running job is polled"""
+    if not job.finished:
+        poll_ingestion_progress(job.content_hash)
+    elif job.error:
+        st.error(f"❌ Could not process the contract: {job.error}")
+    else:
+        st.success(f"📚 Contract ready: {len(job.session.chunks)} chunks indexed")
 
 def main():
     st.set_page_config(
@@ -14,6 +39,7 @@ def main():
         page_icon="📄",
         layout="wide"
     )
+    start_warm_up()  # once per process: clients are ready by the time a contract is uploaded
     
     # Initialize session state for architecture view
     if 'show_architecture' not in st.session_state:
@@ -98,6 +124,7 @@ def main():
     else:
         # Main content area
         col1, col2 = st.columns([1, 1])
+        job = None
         
         with col1:
             st.header("📤 Upload Contract")
@@ -110,6 +137,13 @@ def main():
             if uploaded_file is not None:
                 st.success(f"✅ File uploaded: {uploaded_file.name}")
                 
+                # Start ingesting straight away so questions only pay for retrieval and the answer
+                job = get_ingestion_jobs().start(uploaded_file.getvalue(), uploaded_file.name)
+                show_ingestion_status(job)
+                if job.error and st.button("🔁 Retry"):
+                    get_ingestion_jobs().start(uploaded_file.getvalue(), uploaded_file.name, retry=True)
+                    st.rerun()
+                
                 # Display file info
                 file_details = {
                     "Filename": uploaded_file.name,
@@ -130,37 +164,54 @@ def main():
         # Analysis section
         st.header("🔍 Analysis")
         
-        if st.button("🚀 Analyze Contract", type="primary", use_container_width=True):
+        # Enabled by the rerun that follows ingestion, so a question never waits on an unfinished contract
+        contract_ready = job is not None and job.session is not None
+        if st.button("🚀 Analyze Contract", type="primary", use_container_width=True,
+                     disabled=uploaded_file is not None and not contract_ready):
             if uploaded_file is None:
                 st.error("❌ Please upload a PDF file first.")
             elif not user_query or user_query.strip() == "":
                 st.error("❌ Please enter a question.")
             else:
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_file_path = tmp_file.name
-                
                 try:
-                    with st.spinner("🔄 Processing contract and analyzing..."):
-                        # Create progress indicators
-                        progress_text = st.empty()
-                        progress_bar = st.progress(0)
-                        
-                        progress_text.text("📄 Processing PDF...")
-                        progress_bar.progress(25)
-                        
-                        progress_text.text("🗃️ Creating vector store...")
-                        progress_bar.progress(50)
-                        
-                        progress_text.text("🤖 Analyzing with AI...")
-                        progress_bar.progress(75)
-                        
-                        # Run the analysis
-                        response = analyze_contract(tmp_file_path, user_query)
-                        
-                        progress_text.text("✅ Analysis complete!")
-                        progress_bar.progress(100)
+                    # Progress follows the workflow's own events
+                    progress_text = st.empty()
+                    progress_bar = st.progress(0)
+                    live_response = st.empty()
+                    
+                    session = job.session
+                    
+                    progress_text.text("🔀 Routing question...")
+                    progress_bar.progress(30)
+                    
+                    # Run the analysis, rendering tokens as they arrive
+                    response = ""
+                    agent_type = None
+                    timings = {}
+                    for event in session.stream(user_query):
+                        if event["event"] == "route":
+                            agent_type = event["agent_type"]
+                            progress_text.text(f"🤖 Routed to {agent_type}...")
+                            progress_bar.progress(45)
+                        elif event["event"] == "retrieval":
+                            progress_text.text(f"🔍 Found {len(event['chunk_ids'])} relevant passages, generating answer...")
+                            progress_bar.progress(60)
+                        elif event["event"] == "stage":
+                            progress_text.text(f"⏳ {event['stage'].capitalize()}...")
+                            progress_bar.progress(60)
+                        elif event["event"] == "token":
+                            if not response:
+                                progress_text.text("✍️ Writing answer...")
+                                progress_bar.progress(80)
+                            response += event["text"]
+                            live_response.markdown(response + "▌")
+                        elif event["event"] == "done":
+                            response = event["response"] or response
+                            timings = event
+                    
+                    live_response.empty()
+                    progress_text.text("✅ Analysis complete!")
+                    progress_bar.progress(100)
                     
                     # Display results
                     st.success("✅ Analysis completed!")
@@ -179,7 +230,37 @@ def main():
                         st.markdown("### 📊 Analysis Details")
                         st.info(f"**Question:** {user_query}")
                         st.info(f"**File:** {uploaded_file.name}")
+                        st.info(f"**Agent:** {agent_type}")
+                        if timings.get("time_to_first_token") is not None:
+                            st.info(f"**Time to First Token:** {timings['time_to_first_token']:.2f}s")
+                        st.info(f"**Total Time:** {timings.get('seconds', 0):.2f}s")
+                        if timings.get("cached"):
+                            st.info(f"**Served from cache:** {timings['cached']} match")
+                        st.caption(f"Response cache: {session.cache_stats}")
                         st.info(f"**Response Length:** {len(response)} characters")
+                        
+                        breakdown = timings.get("metrics")
+                        if breakdown:
+                            st.markdown("#### ⏱️ Time per Stage")
+                            stage_rows = [{"Stage": stage, "Seconds": round(seconds, 3)}
+                                          for stage, seconds in breakdown["stages"].items()]
+                            stage_rows += [{"Stage": f"node: {node}", "Seconds": round(seconds, 3)}
+                                           for node, seconds in breakdown["nodes"].items()]
+                            st.table(stage_rows)
+                            st.info(f"**LLM Calls:** {breakdown['llm_calls']} · "
+                                    f"**Tokens:** {breakdown['prompt_tokens']} prompt / {breakdown['completion_tokens']} completion · "
+                                    f"**Estimated Cost:** ${breakdown['cost_usd']:.4f}")
+                            st.info(f"**Retrieved Chunks:** {breakdown['retrieval_hits']}")
+                            if breakdown["cache"]:
+                                st.info("**Cache Lookups:** " + ", ".join(
+                                    f"{name} × {count}" for name, count in sorted(breakdown["cache"].items())))
+                        if session.ingest_metrics["stages"]:
+                            st.markdown("#### 📄 Contract Loading")
+                            st.table([{"Stage": stage, "Seconds": round(seconds, 3)}
+                                      for stage, seconds in session.ingest_metrics["stages"].items()])
+                    
+                    from metrics import get_metrics
+                    get_metrics().write_prometheus()
                     
                 except Exception as e:
                     st.error(f"❌ An error occurred during analysis:")
@@ -188,13 +269,6 @@ def main():
                     # Show detailed error in expander
                     with st.expander("🔍 Show detailed error"):
                         st.code(traceback.format_exc())
-                
-                finally:
-                    # Clean up temporary file
-                    try:
-                        os.unlink(tmp_file_path)
-                    except:
-                        pass
         
         # Footer
         st.markdown("---")
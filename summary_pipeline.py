@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Awaitable, Callable, Optional
+from langchain_core.messages import SystemMessage, HumanMessage
+from config import (
+    OPENAI_MODEL, SUMMARY_WINDOW_TOKENS, SUMMARY_MAX_WORKERS,
+    SUMMARY_REDUCE_FANIN, SUMMARY_CACHE_PATH
+)
+from token_counter import count_tokens
+from context_builder import non_overlapping_tail
+from events import NO_STREAM_TAG
+from metrics import record_cache
+
+MAP_PROMPT = """You are a contract summarisation specialist.
+    Summarise this excerpt of a larger contract as concise, factual bullet points covering
+    any parties, scope, term/duration, financial terms, obligations and risks it contains.
+    Omit topics the excerpt does not mention."""
+
+REDUCE_PROMPT = """You are a contract summarisation specialist.
+    Merge these partial summaries of consecutive parts of one contract into a single set of
+    concise, factual bullet points. Remove duplicates and keep every distinct obligation,
+    amount, date and risk."""
+
+# Bump when the map/reduce prompts change so cached partials are not reused
+SUMMARY_PROMPT_VERSION = "1"
+
+# Partials are not the answer: keep them out of the token stream, attribute them to the summariser
+PARTIAL_CONFIG = {"tags": [NO_STREAM_TAG], "metadata": {"agent": "summariser"}}
+
+def _is_anchor(chunk: Dict[str, Any]) -> bool:
+    """Content-defined window boundary, so an edit only shifts the windows around it"""
+    return int(hashlib.sha256(chunk['content'].encode("utf-8")).hexdigest()[:8], 16) % 4 == 0
+
+def summary_windows(chunks: List[Dict[str, Any]], max_tokens: int = SUMMARY_WINDOW_TOKENS) -> List[str]:
+    """Group consecutive chunks into token-budgeted windows, without the text chunks share"""
+    windows = []
+    current: List[str] = []
+    current_tokens = 0
+    covered_until = None
+    for chunk in chunks:
+        start = chunk.get('start_index')
+        text = non_overlapping_tail(chunk['content'], start, covered_until)
+        continues = start is not None and covered_until is not None and start <= covered_until
+        if start is not None:
+            covered_until = max(covered_until or 0, start + len(chunk['content']))
+        tokens = count_tokens(text)
+        full = current and current_tokens + tokens > max_tokens
+        at_anchor = current_tokens >= max_tokens // 2 and _is_anchor(chunk)
+        if full or (current and at_anchor):
+            windows.append("\n".join(current))
+            current, current_tokens = [], 0
+        if continues and current:
+            current[-1] += text  # same span of the contract: no separator
+        else:
+            current.append(text)
+        current_tokens += tokens
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+def _completion_cache_path(system_prompt: str, text: str) -> str:
+    key_source = "\x00".join([SUMMARY_PROMPT_VERSION, OPENAI_MODEL, system_prompt, text])
+    key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+    return os.path.join(SUMMARY_CACHE_PATH, key[:2], f"{key}.txt")
+
+def _read_cached(path: str) -> Optional[str]:
+    if os.path.exists(path):
+        record_cache("summary", "hit")
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+    record_cache("summary", "miss")
+    return None
+
+def _write_cached(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"  # identical windows may be written concurrently
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+def _completion_messages(system_prompt: str, text: str) -> List:
+    return [SystemMessage(content=system_prompt), HumanMessage(content=text)]
+
+def cached_completion(llm: Any, system_prompt: str, text: str) -> str:
+    """LLM completion cached on disk by prompt, model and input text"""
+    path = _completion_cache_path(system_prompt, text)
+    content = _read_cached(path)
+    if content is None:
+        messages = _completion_messages(system_prompt, text)
+        content = llm.invoke(messages, config=PARTIAL_CONFIG).content
+        _write_cached(path, content)
+    return content
+
+async def acached_completion(llm: Any, system_prompt: str, text: str) -> str:
+    """Async cached_completion"""
+    path = _completion_cache_path(system_prompt, text)
+    content = _read_cached(path)
+    if content is None:
+        messages = _completion_messages(system_prompt, text)
+        content = (await llm.ainvoke(messages, config=PARTIAL_CONFIG)).content
+        _write_cached(path, content)
+    return content
+
+def _parallel(fn: Callable[[str], str], items: List[str]) -> List[str]:
+    if len(items) == 1:
+        return [fn(items[0])]
+    # Each task runs in a copy of the caller's context so instrumentation still attributes it
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_MAX_WORKERS, len(items))) as executor:
+        return list(executor.map(lambda context, item: context.run(fn, item), contexts, items))
+
+async def _agather(fn: Callable[[str], Awaitable[str]], items: List[str]) -> List[str]:
+    semaphore = asyncio.Semaphore(SUMMARY_MAX_WORKERS)
+
+    async def limited(item: str) -> str:
+        async with semaphore:
+            return await fn(item)
+
+    return list(await asyncio.gather(*(limited(item) for item in items)))
+
+def _reduce_groups(partials: List[str]) -> List[str]:
+    return [
+        "\n\n".join(partials[i:i + SUMMARY_REDUCE_FANIN])
+        for i in range(0, len(partials), SUMMARY_REDUCE_FANIN)
+    ]
+
+def map_reduce_partials(llm: Any, windows: List[str]) -> List[str]:
+    """Summarise windows concurrently, then merge hierarchically down to at most SUMMARY_REDUCE_FANIN partials"""
+    print(f"Summarising contract in {len(windows)} windows")
+    partials = _parallel(lambda window: cached_completion(llm, MAP_PROMPT, window), windows)
+
+    while len(partials) > SUMMARY_REDUCE_FANIN:
+        partials = _parallel(lambda group: cached_completion(llm, REDUCE_PROMPT, group), _reduce_groups(partials))
+    return partials
+
+async def amap_reduce_partials(llm: Any, windows: List[str]) -> List[str]:
+    """Async map_reduce_partials: up to SUMMARY_MAX_WORKERS calls in flight on the event loop"""
+    print(f"Summarising contract in {len(windows)} windows")
+    partials = await _agather(lambda window: acached_completion(llm, MAP_PROMPT, window), windows)
+
+    while len(partials) > SUMMARY_REDUCE_FANIN:
+        partials = await _agather(lambda group: acached_completion(llm, REDUCE_PROMPT, group), _reduce_groups(partials))
+    return partials
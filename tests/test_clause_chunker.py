@@ -0,0 +1,28 @@
+from clause_chunker import split_clauses
+from section_index import SectionIndex
+
+def test_short_clause_ending_a_sentence_is_its_own_section():
+    text = ("3. TERMINATION\n"
+            "3.1 Either party may terminate for material breach.\n"
+            "3.2 Termination does not affect accrued rights, which survive until all amounts owed are paid.\n")
+    chunks = split_clauses(text)
+    by_number = {chunk['section_number']: chunk for chunk in chunks}
+    assert "Either party may terminate" in by_number["3.1"]['content']
+    assert "Either party may terminate" not in by_number["3.2"]['content']
+    # The body-less "3. TERMINATION" heading is kept with its first sub-clause
+    assert by_number["3.1"]['content'].startswith("3. TERMINATION")
+    index = SectionIndex(chunks)
+    assert [chunks[position]['section_number'] for position in index.lookup("section 3.1")] == ["3.1"]
+
+def test_article_numbers_do_not_collide_with_section_numbers():
+    text = ("ARTICLE IV - TERM\n"
+            "This Agreement continues for two years from the Effective Date unless terminated earlier.\n"
+            "4. Confidentiality\n"
+            "Each party shall keep the other's confidential information secret.\n")
+    chunks = split_clauses(text)
+    index = SectionIndex(chunks)
+    article = [chunks[position]['content'] for position in index.lookup("article IV")]
+    section = [chunks[position]['content'] for position in index.lookup("section 4")]
+    assert len(article) == 1 and article[0].startswith("ARTICLE IV")
+    assert len(section) == 1 and section[0].startswith("4. Confidentiality")
+    assert index.lookup("Article 4") == index.lookup("article IV")
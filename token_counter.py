@@ -0,0 +1,21 @@
+from functools import lru_cache
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken  # loaded on the first count, not when the modules that count tokens are imported
+    except ImportError:  # tiktoken ships with langchain-openai, but keep a fallback
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; offline hosts fall back to an estimate
+        print(f"Token encoding unavailable ({type(e).__name__}); estimating tokens from length")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Approximate token count for OpenAI models"""
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
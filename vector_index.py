@@ -0,0 +1,121 @@
+import json
+import os
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from vector_store import embed_queries
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.json"
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class MmapVectorIndex:
+    """Exact top-k search over one contract's normalized embeddings, memory-mapped from disk
+
+    Opening an index maps the matrix read-only, so it loads in milliseconds and
+    processes searching the same contract share pages through the OS page cache.
+    Scores are squared L2 distances between unit vectors (2 - 2 * cosine), the
+    same scale Chroma returns, so callers can switch backends transparently.
+    """
+
+    def __init__(self, path: str, embedding_function: Optional[Embeddings] = None):
+        self.path = path
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r')
+        with open(os.path.join(path, DOCUMENTS_FILE), encoding='utf-8') as file:
+            data = json.load(file)
+        self.ids: List[str] = data['ids']
+        self.texts: List[str] = data['texts']
+        self.metadatas: List[Dict[str, Any]] = data['metadatas']
+        self.embeddings = embedding_function
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def exists(cls, path: str, expected_size: Optional[int] = None) -> bool:
+        """True if a complete index is stored at path (optionally with the expected row count)"""
+        documents_path = os.path.join(path, DOCUMENTS_FILE)
+        if not (os.path.exists(documents_path) and os.path.exists(os.path.join(path, VECTORS_FILE))):
+            return False
+        if expected_size is None:
+            return True
+        return np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r').shape[0] == expected_size
+
+    @classmethod
+    def build(cls, path: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+              vectors: Any, dtype: str = "float32",
+              embedding_function: Optional[Embeddings] = None) -> "MmapVectorIndex":
+        """Normalize vectors, write them and their documents to path, and open the result"""
+        os.makedirs(path, exist_ok=True)
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+        # Documents are written last: their presence marks the index complete
+        documents_path = os.path.join(path, DOCUMENTS_FILE)
+        if os.path.exists(documents_path):
+            os.remove(documents_path)
+        tmp_vectors = os.path.join(path, f"tmp_{VECTORS_FILE}")
+        np.save(tmp_vectors, matrix)
+        os.replace(tmp_vectors, os.path.join(path, VECTORS_FILE))
+        with open(f"{documents_path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump({'ids': ids, 'texts': texts, 'metadatas': metadatas}, file)
+        os.replace(f"{documents_path}.tmp", documents_path)
+        return cls(path, embedding_function)
+
+    @classmethod
+    def from_chroma(cls, vector_store: Any, path: str, ids: List[str], dtype: str = "float32") -> "MmapVectorIndex":
+        """Export the given IDs (in order) from a Chroma store without re-embedding"""
+        stored = vector_store.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        position = {doc_id: i for i, doc_id in enumerate(stored['ids'])}
+        order = [position[doc_id] for doc_id in ids]
+        return cls.build(
+            path,
+            ids=ids,
+            texts=[stored['documents'][i] for i in order],
+            metadatas=[stored['metadatas'][i] for i in order],
+            vectors=np.asarray(stored['embeddings'])[order],
+            dtype=dtype,
+            embedding_function=vector_store.embeddings
+        )
+
+    def search_by_vectors(self, query_vectors: Any, k: int) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, distance) pairs for each query vector, best first"""
+        queries = _normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        k = min(k, len(self.ids))
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        # One matrix product scores every chunk against every query
+        similarities = np.asarray(self.vectors, dtype=np.float32) @ queries.T
+        similarities = similarities.T
+        if k < similarities.shape[1]:
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(similarities.shape[1]), similarities.shape)
+        results = []
+        for row, candidates in enumerate(top):
+            scores = similarities[row, candidates]
+            ranked = candidates[np.argsort(-scores)]
+            results.append([(int(i), float(2.0 - 2.0 * similarities[row, i])) for i in ranked])
+        return results
+
+    def _to_documents(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self.texts[i], metadata=self.metadatas[i]), distance)
+            for i, distance in hits
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return self._to_documents(self.search_by_vectors(embedding, k)[0])
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k)
+
+    def batch_similarity_search_with_score(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Embed all queries in one call and score them with a single matrix product"""
+        if not queries:
+            return []
+        query_vectors = embed_queries(self.embeddings, queries)
+        return [self._to_documents(hits) for hits in self.search_by_vectors(query_vectors, k)]
@@ -1,65 +1,193 @@
-import os
-import chromadb
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.schema import Document
-from typing import List, Dict, Any, Tuple
-from config import CHROMA_DB_PATH, TOP_K_RESULTS, OPENAI_API_KEY
+import asyncio
+import hashlib
+from functools import lru_cache
+from langchain_core.documents import Document
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from config import (
+    CHROMA_DB_PATH, TOP_K_RESULTS, OPENAI_API_KEY, OPENAI_EMBEDDING_BASE_URL,
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_FLOAT16
+)
+from embedding_pipeline import BatchedEmbeddings, LocalEmbeddings
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-def create_embeddings():
-    """Create embedding model using OpenAI"""
-    return OpenAIEmbeddings(
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+def chroma_class() -> type:
+    """The Chroma vector store class; chromadb is slow to import, so it is loaded on first use"""
+    from langchain_community.vectorstores import Chroma
+    return Chroma
+
+@lru_cache(maxsize=1)
+def chroma_client() -> Any:
+    """Persistent Chroma client shared by every collection, so writes can use its public collection API"""
+    import chromadb
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+def embedding_signature() -> str:
+    """Identifies the configured backend and model; vectors from different signatures never share a collection"""
+    if EMBEDDING_BACKEND == "local":
+        model_name = LOCAL_EMBEDDING_MODEL.split("/")[-1]
+        return f"local:{model_name}:{'fp16' if LOCAL_EMBEDDING_FLOAT16 else 'fp32'}"
+    return f"openai:{EMBEDDING_MODEL}"
+
+def create_embeddings() -> Embeddings:
+    """Create the configured embedding model (OpenAI batched and rate-limit aware, or local CPU)"""
+    if EMBEDDING_BACKEND == "local":
+        return LocalEmbeddings()
+    if EMBEDDING_BACKEND != "openai":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND!r}")
+    from langchain_openai import OpenAIEmbeddings
+    client = OpenAIEmbeddings(
         api_key=OPENAI_API_KEY,
-        model="text-embedding-3-small"
+        model=EMBEDDING_MODEL,
+        base_url=OPENAI_EMBEDDING_BASE_URL,
+        max_retries=0  # BatchedEmbeddings owns retries
+    )
+    return BatchedEmbeddings(client)
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    """Shared embedding client for the configured backend"""
+    return create_embeddings()
+
+def load_vector_store(COLLECTION_NAME = "default_collection") -> "Chroma":
+    """Open an existing persisted collection without embedding anything"""
+    return chroma_class()(
+        embedding_function=get_embeddings(),
+        client=chroma_client(),
+        collection_name=COLLECTION_NAME
     )
 
-def create_vector_store(chunks: List[Dict[str, Any]], COLLECTION_NAME = "default_collection") -> Chroma:
-    """Create and populate or load existing vector store"""
-    print("Checking for existing Chroma vector store...")
-
-    # Create embeddings
-    embeddings = create_embeddings()
-
-    # Try to load existing Chroma DB
-    if os.path.exists(CHROMA_DB_PATH) and os.path.isdir(CHROMA_DB_PATH):
-        try:
-            vector_store = Chroma(
-                embedding_function=embeddings,
-                persist_directory=CHROMA_DB_PATH,
-                collection_name=COLLECTION_NAME
-            )
-            print("Loaded existing vector store.")
-            return vector_store
-        except Exception as e:
-            print(f"Failed to load existing vector store: {e}")
-            print("Creating new vector store...")
-
-    # If not found or failed to load, create new store
-    print("Creating new vector store...")
-    documents = []
+def chunk_document_ids(chunks: List[Dict[str, Any]]) -> List[str]:
+    """Stable content-hash ID per chunk; repeated content gets an occurrence suffix"""
+    ids = []
+    seen: Dict[str, int] = {}
     for chunk in chunks:
-        doc = Document(
-            page_content=chunk['content'],
-            metadata={
-                'chunk_id': chunk['chunk_id'],
-                'page_number': chunk['page_number'],
-                'element_type': chunk.get('element_type', 'unknown')
-            }
-        )
-        documents.append(doc)
+        digest = hashlib.sha256(chunk['content'].encode("utf-8")).hexdigest()[:32]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+# Clause fields, set by the clause chunker; stored only when present (Chroma rejects None)
+SECTION_FIELDS = ('section_number', 'heading', 'section_path')
+
+def chunk_to_document(chunk: Dict[str, Any]) -> Document:
+    """Convert a chunk dict into a LangChain Document"""
+    metadata = {
+        'chunk_id': chunk['chunk_id'],
+        'page_number': chunk['page_number'],
+        'page_start': chunk.get('page_start', chunk['page_number']),
+        'page_end': chunk.get('page_end', chunk['page_number']),
+        'element_type': chunk.get('element_type', 'unknown')
+    }
+    metadata.update({field: chunk[field] for field in SECTION_FIELDS if chunk.get(field)})
+    return Document(page_content=chunk['content'], metadata=metadata)
 
-    vector_store = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        collection_name=COLLECTION_NAME,
-        persist_directory=CHROMA_DB_PATH
+def create_vector_store(chunks: List[Dict[str, Any]], COLLECTION_NAME = "default_collection",
+                        incremental: bool = True) -> "Chroma":
+    """Sync a collection with the given chunks, embedding only chunks it does not already hold"""
+    Chroma = chroma_class()
+    vector_store = Chroma(
+        embedding_function=get_embeddings(),
+        client=chroma_client(),
+        collection_name=COLLECTION_NAME
     )
 
-    print(f"Vector store created with {len(documents)} documents")
+    ids = chunk_document_ids(chunks)
+    documents = [chunk_to_document(chunk) for chunk in chunks]
+
+    if not incremental:
+        print("Rebuilding vector store...")
+        vector_store.delete_collection()
+        vector_store = Chroma.from_documents(
+            documents=documents,
+            embedding=vector_store.embeddings,
+            ids=ids,
+            collection_name=COLLECTION_NAME,
+            client=chroma_client()
+        )
+        print(f"Vector store created with {len(documents)} documents")
+        return vector_store
+
+    print("Diffing chunks against stored vectors...")
+    stored = vector_store.get(include=["metadatas"])
+    stored_metadata = dict(zip(stored["ids"], stored["metadatas"]))
+    wanted = set(ids)
+
+    stale_ids = [doc_id for doc_id in stored_metadata if doc_id not in wanted]
+    new_ids, new_documents = [], []
+    moved_ids, moved_metadata = [], []
+    for doc_id, document in zip(ids, documents):
+        if doc_id not in stored_metadata:
+            new_ids.append(doc_id)
+            new_documents.append(document)
+        elif stored_metadata[doc_id] != document.metadata:
+            # Same text at a new position: refresh metadata without re-embedding.
+            # Chroma merges updated metadata, so keys the chunk no longer has are cleared explicitly
+            moved_ids.append(doc_id)
+            cleared = {name: None for name in stored_metadata[doc_id] if name not in document.metadata}
+            moved_metadata.append({**cleared, **document.metadata})
+
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+    if new_documents:
+        vector_store.add_documents(new_documents, ids=new_ids)
+    if moved_ids:
+        collection = chroma_client().get_collection(COLLECTION_NAME)
+        batch_size = chroma_client().get_max_batch_size()
+        for start in range(0, len(moved_ids), batch_size):
+            collection.update(ids=moved_ids[start:start + batch_size],
+                              metadatas=moved_metadata[start:start + batch_size])
+
+    unchanged = len(ids) - len(new_ids) - len(moved_ids)
+    print(f"Vector store synced: {len(new_ids)} embedded, {len(moved_ids)} re-labelled, "
+          f"{len(stale_ids)} deleted, {unchanged} unchanged")
     return vector_store
 
-def search_similar_chunks(vector_store: Chroma, query: str, k: int = TOP_K_RESULTS) -> List[Tuple[Document, float]]:
-    """Search for similar chunks"""
+def search_similar_chunks(vector_store: "Chroma", query: str, k: int = TOP_K_RESULTS,
+                          query_vector: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+    """Search for similar chunks, reusing the query's embedding when the caller already has it"""
+    if query_vector is not None:
+        if hasattr(vector_store, "search_with_query_vector"):
+            # Hybrid and prefetched retrievers also need the query text
+            return vector_store.search_with_query_vector(query, query_vector, k=k)
+        if hasattr(vector_store, "similarity_search_by_vector_with_relevance_scores"):
+            return vector_store.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
     return vector_store.similarity_search_with_score(query, k=k)
+
+async def asearch_similar_chunks(vector_store: Any, query: str, k: int = TOP_K_RESULTS) -> List[Tuple[Document, float]]:
+    """Async search: awaits the query embedding instead of blocking the event loop"""
+    if hasattr(vector_store, "similarity_search_by_vector_with_relevance_scores"):
+        # Chroma and the mmap index: the embedding request is the only network call
+        query_vector = await vector_store.embeddings.aembed_query(query)
+        return vector_store.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
+    if hasattr(vector_store, "asimilarity_search_with_score"):
+        return await vector_store.asimilarity_search_with_score(query, k=k)
+    return await asyncio.to_thread(search_similar_chunks, vector_store, query, k)
+
+def embed_queries(embeddings: Embeddings, queries: List[str]) -> List[List[float]]:
+    """Embed several search queries in one request where the backend supports it, as embed_query would"""
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(queries)
+    return [embeddings.embed_query(query) for query in queries]
+
+def search_similar_chunks_batch(vector_store: Any, queries: List[str], k: int = TOP_K_RESULTS,
+                                query_vectors: Optional[List[List[float]]] = None) -> List[List[Tuple[Document, float]]]:
+    """Search for several queries at once; backends with a batched path embed them in one call
+
+    Pass query_vectors when the queries are already embedded.
+    """
+    if query_vectors is not None:
+        return [search_similar_chunks(vector_store, query, k=k, query_vector=query_vector)
+                for query, query_vector in zip(queries, query_vectors)]
+    if hasattr(vector_store, "batch_similarity_search_with_score"):
+        return vector_store.batch_similarity_search_with_score(queries, k=k)
+    if queries and hasattr(vector_store, "similarity_search_by_vector_with_relevance_scores"):
+        # Chroma: one embedding request for every query, then search by vector
+        query_vectors = embed_queries(vector_store.embeddings, queries)
+        return [vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=k) for vector in query_vectors]
+    return [search_similar_chunks(vector_store, query, k=k) for query in queries]
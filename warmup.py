@@ -0,0 +1,73 @@
+"""Load the heavy parts of the analysis stack before the first request needs them"""
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import VECTOR_INDEX_BACKEND, WARM_UP_ON_START
+
+def _load_workflows() -> None:
+    from workflow import get_workflow, get_async_workflow
+    get_workflow()
+    get_async_workflow()
+
+def _load_llm_clients() -> None:
+    from agents import get_agent_llm
+    from router import get_router_llm
+    get_agent_llm()
+    get_router_llm()
+
+def _load_embeddings() -> None:
+    from vector_store import get_embeddings
+    get_embeddings()
+
+def _load_vector_backend() -> None:
+    from vector_store import chroma_class
+    chroma_class()  # Chroma is the system of record for every backend
+    importlib.import_module("chromadb")  # the LangChain wrapper defers it to the first client
+    if VECTOR_INDEX_BACKEND == "mmap":
+        importlib.import_module("vector_index")
+
+def _load_parsers() -> None:
+    importlib.import_module("pypdf")
+    importlib.import_module("langchain.text_splitter")
+
+def _load_tokenizer() -> None:
+    from token_counter import count_tokens
+    count_tokens("warm up")
+
+# (name, step) in the order a first request needs them
+WARM_UP_STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("parsers", _load_parsers),
+    ("embeddings", _load_embeddings),
+    ("vector store", _load_vector_backend),
+    ("workflow", _load_workflows),
+    ("llm clients", _load_llm_clients),
+    ("tokenizer", _load_tokenizer),
+]
+
+def warm_up() -> Dict[str, float]:
+    """Run every warm-up step now; seconds per step. A failing step is reported and skipped"""
+    timings = {}
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # The request that needs this part will raise the real error
+            print(f"Warm-up step {name} failed: {e}")
+        timings[name] = time.perf_counter() - started
+    return timings
+
+_warm_up_thread: Optional[threading.Thread] = None
+_warm_up_lock = threading.Lock()
+
+def start_warm_up(force: bool = False) -> Optional[threading.Thread]:
+    """Warm up in a daemon thread, once per process; None when WARM_UP_ON_START is off (unless forced)"""
+    global _warm_up_thread
+    if not (WARM_UP_ON_START or force):
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
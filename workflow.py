@@ -1,81 +1,107 @@
-from typing import TypedDict, Annotated, List, Any, Optional
-from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage
+from typing import TYPE_CHECKING, TypedDict, Annotated, List, Any, Optional, Callable, Dict
 import operator
+from functools import lru_cache
 
 # Import our modules
-from document_processor import process_pdf
-from vector_store import create_vector_store
-from router import route_query
-from agents import summariser_agent, rag_qa_agent, clause_finder_agent, risk_checker_agent
+from ingestion import get_contract
+from router import route_query, aroute_query
+from metrics import instrument_node
+from agents import (
+    summariser_agent, rag_qa_agent, clause_finder_agent, risk_checker_agent,
+    asummariser_agent, arag_qa_agent, aclause_finder_agent, arisk_checker_agent
+)
+
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
 
 class ContractState(TypedDict):
-    """State passed between nodes"""
+    """State passed between nodes
+
+    The contract is referenced by ID (see ingestion.get_contract), not embedded, so
+    the state is a handful of small fields however large the contract is. Nodes
+    return only the fields they change.
+    """
     user_query: str
     agent_type: Optional[str]
-    chunks: List[Any]
-    vector_store: Any
+    contract_id: str
+    retriever: Optional[Any]  # overrides the contract's vector store for this query (e.g. prefetched results)
     response: Optional[str]
     messages: Annotated[List, operator.add]
 
-def router_node(state: ContractState) -> ContractState:
-    """Router node - decides which agent to use"""
-    agent_type = route_query(state["user_query"])
-    return {
-        **state,
-        "agent_type": agent_type,
-        "messages": [f"Routing to: {agent_type}"]
-    }
+def _retriever(state: ContractState) -> Any:
+    return state.get("retriever") or get_contract(state["contract_id"]).vector_store
+
+def router_node(state: ContractState) -> Dict[str, Any]:
+    """Router node - decides which agent to use (unless the caller already routed)"""
+    agent_type = state.get("agent_type") or route_query(state["user_query"])
+    return {"agent_type": agent_type, "messages": [f"Routing to: {agent_type}"]}
 
-def summariser_node(state: ContractState) -> ContractState:
+def summariser_node(state: ContractState) -> Dict[str, Any]:
     """Summariser node"""
-    response = summariser_agent(state["chunks"])
-    return {
-        **state,
-        "response": response,
-        "messages": ["Generated summary"]
-    }
-
-def rag_qa_node(state: ContractState) -> ContractState:
+    response = summariser_agent(get_contract(state["contract_id"]).chunks)
+    return {"response": response, "messages": ["Generated summary"]}
+
+def rag_qa_node(state: ContractState) -> Dict[str, Any]:
     """RAG Q&A node"""
-    response = rag_qa_agent(state["user_query"], state["vector_store"])
-    return {
-        **state,
-        "response": response,
-        "messages": ["Answered question using RAG"]
-    }
-
-def clause_finder_node(state: ContractState) -> ContractState:
+    contract = get_contract(state["contract_id"])
+    response = rag_qa_agent(state["user_query"], _retriever(state), contract.chunks)
+    return {"response": response, "messages": ["Answered question using RAG"]}
+
+def clause_finder_node(state: ContractState) -> Dict[str, Any]:
     """Clause finder node"""
-    response = clause_finder_agent(state["user_query"], state["vector_store"])
-    return {
-        **state,
-        "response": response,
-        "messages": ["Found matching clauses"]
-    }
-
-def risk_checker_node(state: ContractState) -> ContractState:
+    contract = get_contract(state["contract_id"])
+    response = clause_finder_agent(state["user_query"], _retriever(state), contract.chunks, contract.section_index)
+    return {"response": response, "messages": ["Found matching clauses"]}
+
+def risk_checker_node(state: ContractState) -> Dict[str, Any]:
     """Risk checker node"""
-    response = risk_checker_agent(state["chunks"])
-    return {
-        **state,
-        "response": response,
-        "messages": ["Analyzed contract risks"]
-    }
+    contract = get_contract(state["contract_id"])
+    response = risk_checker_agent(contract.chunks, contract.risk_ranking)
+    return {"response": response, "messages": ["Analyzed contract risks"]}
+
+# Async nodes: same updates as above, but network calls are awaited so one
+# event loop can run many analyses concurrently (use with ainvoke/astream)
+
+async def arouter_node(state: ContractState) -> Dict[str, Any]:
+    """Async router node"""
+    agent_type = state.get("agent_type") or await aroute_query(state["user_query"])
+    return {"agent_type": agent_type, "messages": [f"Routing to: {agent_type}"]}
+
+async def asummariser_node(state: ContractState) -> Dict[str, Any]:
+    """Async summariser node"""
+    response = await asummariser_agent(get_contract(state["contract_id"]).chunks)
+    return {"response": response, "messages": ["Generated summary"]}
+
+async def arag_qa_node(state: ContractState) -> Dict[str, Any]:
+    """Async RAG Q&A node"""
+    contract = get_contract(state["contract_id"])
+    response = await arag_qa_agent(state["user_query"], _retriever(state), contract.chunks)
+    return {"response": response, "messages": ["Answered question using RAG"]}
+
+async def aclause_finder_node(state: ContractState) -> Dict[str, Any]:
+    """Async clause finder node"""
+    contract = get_contract(state["contract_id"])
+    response = await aclause_finder_agent(state["user_query"], _retriever(state), contract.chunks,
+                                          contract.section_index)
+    return {"response": response, "messages": ["Found matching clauses"]}
+
+async def arisk_checker_node(state: ContractState) -> Dict[str, Any]:
+    """Async risk checker node"""
+    contract = get_contract(state["contract_id"])
+    response = await arisk_checker_agent(contract.chunks, contract.risk_ranking)
+    return {"response": response, "messages": ["Analyzed contract risks"]}
 
 def route_condition(state: ContractState) -> str:
     """Determine which agent to route to"""
     return state["agent_type"]
 
-def create_workflow() -> StateGraph:
-    """Create the LangGraph workflow"""
+def build_workflow(nodes: Dict[str, Callable]) -> "StateGraph":
+    """Compile the router -> agent graph from one implementation per node"""
+    from langgraph.graph import StateGraph, END  # slow to import; loaded with the first workflow
     workflow = StateGraph(ContractState)
     
-    workflow.add_node("router", router_node)
-    workflow.add_node("summariser", summariser_node)
-    workflow.add_node("rag_qa", rag_qa_node)
-    workflow.add_node("clause_finder", clause_finder_node)
-    workflow.add_node("risk_checker", risk_checker_node)
+    for name in ("router", "summariser", "rag_qa", "clause_finder", "risk_checker"):
+        workflow.add_node(name, instrument_node(name, nodes[name]))
     
     workflow.set_entry_point("router")
     
@@ -95,4 +121,34 @@ def create_workflow() -> StateGraph:
     workflow.add_edge("clause_finder", END)
     workflow.add_edge("risk_checker", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile()
+
+def create_workflow() -> "StateGraph":
+    """Create the LangGraph workflow"""
+    return build_workflow({
+        "router": router_node,
+        "summariser": summariser_node,
+        "rag_qa": rag_qa_node,
+        "clause_finder": clause_finder_node,
+        "risk_checker": risk_checker_node
+    })
+
+def create_async_workflow() -> "StateGraph":
+    """Create the LangGraph workflow with async nodes, for ainvoke/astream"""
+    return build_workflow({
+        "router": arouter_node,
+        "summariser": asummariser_node,
+        "rag_qa": arag_qa_node,
+        "clause_finder": aclause_finder_node,
+        "risk_checker": arisk_checker_node
+    })
+
+@lru_cache(maxsize=1)
+def get_workflow():
+    """Compiled workflow shared by every query in this process"""
+    return create_workflow()
+
+@lru_cache(maxsize=1)
+def get_async_workflow():
+    """Compiled async workflow shared by every concurrent analysis in this process"""
+    return create_async_workflow()